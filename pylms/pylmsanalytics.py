@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import logging
+import heapq
+import re
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class LMSLibraryAnalytics():
+    """Grouped counts, sums, top-N and histograms over library tracks
+    Tracks fields are loaded once in columns (NumPy arrays when available, lists otherwise)"""
+
+    #fields tracks can be grouped by ('decade' is computed from 'year')
+    GROUP_FIELDS = ['genre', 'year', 'decade', 'artist', 'album', 'bitrate', 'samplerate', 'samplesize', 'type']
+    #numeric fields that can be summed or histogrammed (unknown values count as 0)
+    NUMERIC_FIELDS = ['duration', 'filesize', 'year', 'bitrate', 'samplerate', 'samplesize']
+    #tags to request tracks fields to server
+    TRACKS_TAGS = 'aglydfrTIo'
+
+    __NUMBER = re.compile(r'\d+(\.\d+)?')
+
+    def __init__(self, tracks=None, use_numpy=True):
+        """constructor
+        tracks: tracks infos (dicts as returned by server)
+        use_numpy: use NumPy arrays if NumPy is installed"""
+        self.logger = logging.getLogger("LibraryAnalytics")
+        self.use_numpy = use_numpy and numpy is not None
+        self.count_tracks = 0
+        #group field -> (codes per track, labels per code)
+        self.__groups = {}
+        #numeric field -> values per track
+        self.__numbers = {}
+        self.load(tracks or [])
+
+    def __number(self, value):
+        """return number at start of value (0 if none)"""
+        if value is None:
+            return 0.0
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        match = self.__NUMBER.match(str(value).strip())
+        if match:
+            return float(match.group(0))
+        return 0.0
+
+    def load(self, tracks):
+        """load tracks fields in columns"""
+        self.count_tracks = len(tracks)
+        self.__groups = {}
+        self.__numbers = {}
+        for field in self.NUMERIC_FIELDS:
+            values = [self.__number(track.get(field)) for track in tracks]
+            if self.use_numpy:
+                values = numpy.array(values, dtype=numpy.float64)
+            self.__numbers[field] = values
+
+        for field in self.GROUP_FIELDS:
+            if field=='decade':
+                labels_values = [int(year // 10 * 10) if year > 0 else None for year in self.__numbers['year']]
+            else:
+                labels_values = [track.get(field) for track in tracks]
+            #dictionary encoding
+            codes_by_label = {}
+            codes = []
+            for label in labels_values:
+                code = codes_by_label.get(label)
+                if code is None:
+                    code = codes_by_label[label] = len(codes_by_label)
+                codes.append(code)
+            labels = [None] * len(codes_by_label)
+            for label, code in codes_by_label.items():
+                labels[code] = label
+            if self.use_numpy:
+                codes = numpy.array(codes, dtype=numpy.int64)
+            self.__groups[field] = (codes, labels)
+
+    def __get_group(self, by):
+        if by not in self.__groups:
+            raise ValueError('Unsupported group field "%s"' % by)
+        return self.__groups[by]
+
+    def __get_numbers(self, field):
+        if field not in self.__numbers:
+            raise ValueError('Unsupported numeric field "%s"' % field)
+        return self.__numbers[field]
+
+    def __totals(self, by, field=None):
+        """return (labels, totals per code): number of tracks or sum of field"""
+        (codes, labels) = self.__get_group(by)
+        values = self.__get_numbers(field) if field else None
+        if self.use_numpy:
+            if not len(codes):
+                return labels, []
+            return labels, numpy.bincount(codes, weights=values, minlength=len(labels)).tolist()
+        totals = [0] * len(labels)
+        if values is None:
+            for code in codes:
+                totals[code] += 1
+        else:
+            for code, value in zip(codes, values):
+                totals[code] += value
+        return labels, totals
+
+    def count(self, by):
+        """return dict group value -> number of tracks (None key for unknown value)"""
+        labels, totals = self.__totals(by)
+        return dict([(label, int(total)) for label, total in zip(labels, totals)])
+
+    def sum(self, field, by=None):
+        """return sum of numeric field over all tracks, or dict group value -> sum if by is specified"""
+        if by is None:
+            values = self.__get_numbers(field)
+            return float(values.sum()) if self.use_numpy else float(sum(values))
+        labels, totals = self.__totals(by, field)
+        return dict([(label, float(total)) for label, total in zip(labels, totals)])
+
+    def top(self, by, n=10, field=None):
+        """return n biggest groups as list of (group value, total) sorted by decreasing total
+        field: rank groups by sum of this numeric field instead of number of tracks
+        unknown group value is not ranked"""
+        labels, totals = self.__totals(by, field)
+        ranked = [(total, label) for label, total in zip(labels, totals) if label is not None]
+        return [(label, total if field else int(total)) for total, label in heapq.nlargest(n, ranked, key=lambda item: item[0])]
+
+    def histogram(self, field, bins=10, limits=None):
+        """return (bins edges, counts) histogram of numeric field
+        limits: (min, max) of histogram (values min and max by default), values outside limits are ignored"""
+        values = self.__get_numbers(field)
+        if self.use_numpy:
+            counts, edges = numpy.histogram(values, bins=bins, range=limits)
+            return edges.tolist(), counts.tolist()
+
+        if limits is None:
+            limits = (min(values), max(values)) if values else (0.0, 1.0)
+        (low, high) = (float(limits[0]), float(limits[1]))
+        if low==high:
+            low, high = low - 0.5, high + 0.5
+        width = (high - low) / bins
+        edges = [low + width * i for i in range(bins)] + [high]
+        counts = [0] * bins
+        for value in values:
+            if value < low or value > high:
+                continue
+            index = int((value - low) / width)
+            #last bin includes its right edge
+            counts[min(index, bins - 1)] += 1
+        return edges, counts
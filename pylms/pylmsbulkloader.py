@@ -0,0 +1,273 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from .pylmsserver import LMSServer
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import urllib.parse
+import threading
+import logging
+import queue
+
+
+def parse_page(response, columns, charset='utf-8'):
+    """parse raw listing response (see LMSServer.request_raw) in rows of columns values
+    Run in parsing processes: rows are sent back ready to be stored
+    return tuple (count, rows, error_occured), missing values are None"""
+    rows = []
+    try:
+        response_parts = response.decode(charset).split(' ')
+        if not response_parts[0].startswith('count'):
+            return 0, [], True
+        count = int(urllib.parse.unquote_plus(response_parts[0]).split(':',1)[1])
+
+        #first key is items separator
+        separator = None
+        item = None
+        for part in response_parts[1:]:
+            (key,val) = urllib.parse.unquote_plus(part).split(':',1)
+            if separator is None:
+                separator = key
+            if key==separator:
+                if item is not None:
+                    rows.append(tuple([item.get(column) for column in columns]))
+                item = {}
+            item[key] = val
+        if item is not None:
+            rows.append(tuple([item.get(column) for column in columns]))
+    except Exception:
+        #error parsing results (not correct?)
+        return 0, [], True
+    return count, rows, False
+
+
+class BulkLoaderWorker(threading.Thread):
+    """Fetch listing pages on its own server connection"""
+
+    def __init__(self, loader, tasks, results):
+        """init"""
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.logger = logging.getLogger("BulkLoaderWorker")
+        self.loader = loader
+        self.tasks = tasks
+        self.results = results
+        self.running = True
+        self.server = loader.create_server()
+
+    def stop(self):
+        """stop process"""
+        self.running = False
+
+    def run(self):
+        """process"""
+        while self.running:
+            try:
+                (query, start, columns) = self.tasks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if query is None:
+                #no more task
+                break
+            items = None
+            for attempt in range(self.loader.retries + 1):
+                items = self.__fetch(query % (start, self.loader.page_size), columns)
+                if items is not None:
+                    break
+                self.logger.warning('Page %d failed (attempt %d)' % (start, attempt + 1))
+            self.results.put((start, items))
+        self.server.disconnect()
+
+    def __fetch(self, command, columns):
+        """return page items (rows of columns values if columns are specified) or tuple
+        (future of page parsed in parsing processes, raw response), None if request failed"""
+        pool = self.loader.get_pool()
+        if pool and columns:
+            #only strip command echo here, page is decoded and parsed in parsing processes
+            response = self.server.request_raw(command)
+            if response is None or not response.startswith(b'count'):
+                return None
+            try:
+                #keep response to parse page again if parsing processes die
+                return pool.submit(parse_page, response, columns, self.server.charset), response
+            except (BrokenProcessPool, RuntimeError) as e:
+                #parsing processes died (or were shut down): parse pages in loader threads
+                self.logger.warning('Parsing processes unavailable: %s' % str(e))
+                self.loader.disable_pool()
+
+        count, items, error = self.server.request_with_results(command)
+        if error:
+            return None
+        if columns:
+            return [tuple([item.get(column) for column in columns]) for item in items]
+        return items
+
+
+class LMSBulkLoader():
+    """Download big listings (songs, albums...) by pages fetched concurrently over
+    several server connections. Pages are given back in order so loading can be resumed
+    from the last merged page
+    Pages of big listings can be parsed in a pool of processes to use several cores and
+    keep the calling process responsive"""
+
+    DEFAULT_CONNECTIONS = 4
+    DEFAULT_PAGE_SIZE = 1000
+    #number of parsing processes (0 to parse in loader threads)
+    DEFAULT_PROCESSES = 0
+    #min number of pages to load to start parsing processes
+    MIN_POOL_PAGES = 4
+    #parsing processes are started while loader threads run: don't fork them
+    POOL_START_METHOD = 'forkserver'
+    #number of retries of a failed page
+    RETRIES = 2
+
+    def __init__(self, hostname='localhost', port=9090, username='', password='', charset='utf-8',
+                 connections=DEFAULT_CONNECTIONS, page_size=DEFAULT_PAGE_SIZE, processes=DEFAULT_PROCESSES):
+        """constructor
+        processes: number of processes parsing pages (0 to parse in loader threads)"""
+        self.logger = logging.getLogger("LMSBulkLoader")
+
+        #members
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.charset = charset
+        self.connections = max(1, connections)
+        self.page_size = page_size
+        self.processes = processes
+        self.retries = self.RETRIES
+        self.__pool = None
+        self.__pool_lock = threading.Lock()
+        self.__running = False
+
+    def create_server(self):
+        """return new server connection"""
+        server = LMSServer(self.hostname, self.port, self.username, self.password, self.charset)
+        server.connect(update=False)
+        return server
+
+    def stop(self):
+        """stop current loading"""
+        self.__running = False
+
+    def get_pool(self):
+        """return parsing processes of current loading (None if pages are parsed in loader threads)"""
+        return self.__pool
+
+    def disable_pool(self):
+        """stop parsing processes, next pages are parsed in loader threads"""
+        with self.__pool_lock:
+            if self.__pool:
+                self.__pool.shutdown(wait=False, cancel_futures=True)
+                self.__pool = None
+
+    def load(self, query, total, page_callback, start=0, progress_callback=None, columns=None):
+        """load listing pages
+        query: listing query with placeholders for page start and size (ie 'songs %d %d tags:al')
+        total: number of items of listing
+        page_callback(start, items): called for each page, in pages order
+        columns: give items as tuples of these fields values instead of dicts
+                 (needed to parse pages in parsing processes)
+        start: first item to load (to resume an interrupted loading)
+        progress_callback(loaded, total): called after each merged page
+        return True if all pages were loaded"""
+        starts = list(range(start - start % self.page_size, total, self.page_size))
+        if not starts:
+            return True
+
+        if columns and self.processes>0 and len(starts)>=self.MIN_POOL_PAGES:
+            try:
+                start_method = self.POOL_START_METHOD
+                if start_method not in multiprocessing.get_all_start_methods():
+                    start_method = 'spawn'
+                self.__pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context(start_method))
+            except (OSError, NotImplementedError, ValueError) as e:
+                #multiprocessing not available: parse in loader threads
+                self.logger.warning('Unable to start parsing processes: %s' % str(e))
+                self.__pool = None
+
+        tasks = queue.Queue()
+        results = queue.Queue()
+        for page_start in starts:
+            tasks.put((query, page_start, columns))
+        workers = []
+        for i in range(min(self.connections, len(starts))):
+            tasks.put((None, None, None))
+            worker = BulkLoaderWorker(self, tasks, results)
+            worker.start()
+            workers.append(worker)
+
+        #merge pages in order
+        self.__running = True
+        pending = {}
+        next_index = 0
+        success = True
+        try:
+            while self.__running and next_index < len(starts):
+                try:
+                    (page_start, items) = results.get(timeout=1)
+                except queue.Empty:
+                    if not [worker for worker in workers if worker.is_alive()]:
+                        self.logger.error('All workers stopped')
+                        success = False
+                        break
+                    continue
+                if items is None:
+                    self.logger.error('Unable to load page %d' % page_start)
+                    success = False
+                    break
+                pending[page_start] = items
+                while next_index < len(starts) and starts[next_index] in pending:
+                    page_start = starts[next_index]
+                    items = pending.pop(page_start)
+                    if not isinstance(items, list):
+                        #page parsed in parsing processes
+                        (future, response) = items
+                        try:
+                            count, items, error = future.result()
+                        except (BrokenProcessPool, CancelledError) as e:
+                            #parsing processes died (or were shut down): parse page here
+                            self.logger.warning('Parsing processes unavailable: %s' % str(e))
+                            self.disable_pool()
+                            count, items, error = parse_page(response, columns, self.charset)
+                        except Exception as e:
+                            self.logger.error('Parsing process failed: %s' % str(e))
+                            error = True
+                        if error:
+                            self.logger.error('Unable to parse page %d' % page_start)
+                            success = False
+                            break
+                    page_callback(page_start, items)
+                    next_index += 1
+                    if progress_callback:
+                        progress_callback(min(page_start + self.page_size, total), total)
+                if not success:
+                    break
+        finally:
+            for worker in workers:
+                worker.stop()
+            self.disable_pool()
+
+        return success and next_index == len(starts)
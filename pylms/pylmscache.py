@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import OrderedDict
+import threading
+import sys
+
+def sizeof(value):
+    """return approximate memory size (in bytes) of value (containers are measured one level deep)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + sys.getsizeof(item)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += sys.getsizeof(item)
+    return size
+
+
+class LRUCache():
+    """Thread safe least recently used cache bounded by number of entries and by memory size"""
+
+    def __init__(self, max_entries=1000, max_size=None, evict_callback=None):
+        """constructor
+        max_entries: max number of entries
+        max_size: max approximate memory size (in bytes) of cached values (None for no limit)
+        evict_callback(key, value): called when entry is dropped from cache"""
+        self.__lock = threading.RLock()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.__evict_callback = evict_callback
+        #key -> (value, size)
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """return cached value (default if not cached)"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """cache value"""
+        size = sizeof(value)
+        with self.__lock:
+            self.__remove(key, False)
+            if self.max_size is not None and size > self.max_size:
+                #value would evict everything
+                return
+            self.__entries[key] = (value, size)
+            self.__size += size
+            while len(self.__entries) > self.max_entries or (self.max_size is not None and self.__size > self.max_size):
+                oldest = next(iter(self.__entries))
+                self.__remove(oldest, True)
+                self.__evictions += 1
+
+    def keys(self):
+        """return cached keys (least recently used first)"""
+        with self.__lock:
+            return list(self.__entries.keys())
+
+    def invalidate(self, key):
+        """drop cached value"""
+        with self.__lock:
+            self.__remove(key, True)
+
+    def clear(self):
+        """drop all cached values"""
+        with self.__lock:
+            for key in list(self.__entries.keys()):
+                self.__remove(key, True)
+
+    def __remove(self, key, notify):
+        """remove entry"""
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return
+        self.__size -= entry[1]
+        if notify and self.__evict_callback:
+            self.__evict_callback(key, entry[0])
+
+    def get_stats(self):
+        """return cache statistics (hits, misses, evictions, entries, size)"""
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'entries': len(self.__entries),
+                'size': self.__size
+            }
+
+    def reset_stats(self):
+        """reset hits, misses and evictions counters"""
+        with self.__lock:
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import threading
+import logging
+
+class LMSLibraryChangeFeed():
+    """Diff successive library states by item id and content hash and publish
+    added, removed and modified events to subscribers
+    Events are dicts (event, kind, id, item) delivered by batch: callback(events)
+    (item is None for removed events)"""
+
+    #item kinds with their listing name
+    KINDS = {'artist': 'artists', 'album': 'albums', 'genre': 'genres', 'track': 'tracks'}
+    EVENTS = ['added', 'removed', 'modified']
+
+    def __init__(self):
+        """constructor"""
+        self.logger = logging.getLogger("LibraryChangeFeed")
+        self.__lock = threading.RLock()
+        #kind -> {id: content hash}
+        self.__hashes = dict([(kind, {}) for kind in self.KINDS])
+        self.__primed = False
+        #list of (callback, kinds, events)
+        self.__subscribers = []
+
+    def __hash(self, item):
+        """return content hash of item"""
+        return hash(tuple(sorted([(key, str(value)) for key, value in item.items()])))
+
+    # subscribers
+
+    def subscribe(self, callback, kinds=None, events=None):
+        """subscribe to changes
+        callback(events): called with list of events after each library change
+        kinds: only receive events of these item kinds (all kinds by default)
+        events: only receive these events (all events by default)"""
+        with self.__lock:
+            self.__subscribers.append((callback, kinds, events))
+
+    def unsubscribe(self, callback):
+        """unsubscribe callback from changes"""
+        with self.__lock:
+            self.__subscribers = [subscriber for subscriber in self.__subscribers if subscriber[0]!=callback]
+
+    def publish(self, events):
+        """send events to subscribers"""
+        if not events:
+            return
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+        for callback, kinds, names in subscribers:
+            filtered = [event for event in events if (not kinds or event['kind'] in kinds) and (not names or event['event'] in names)]
+            if not filtered:
+                continue
+            try:
+                callback(filtered)
+            except Exception as e:
+                self.logger.error('Exception in change feed subscriber: %s' % str(e))
+
+    # state
+
+    def has_subscribers(self):
+        """return True if someone subscribed to changes"""
+        return len(self.__subscribers)>0
+
+    def reset(self):
+        """forget library state"""
+        with self.__lock:
+            self.__hashes = dict([(kind, {}) for kind in self.KINDS])
+            self.__primed = False
+
+    def is_primed(self):
+        """return True if feed knows a previous library state"""
+        return self.__primed
+
+    def prime(self, listings):
+        """set current library state without publishing events
+        listings: dict listing name (artists, albums, genres, tracks) -> items"""
+        with self.__lock:
+            for kind, name in self.KINDS.items():
+                if name in listings:
+                    self.__hashes[kind] = dict([(str(item['id']), self.__hash(item)) for item in listings[name] if 'id' in item])
+            self.__primed = True
+
+    def diff(self, listings, publish=True):
+        """compare full listings to previous state, update state and publish events
+        listings: dict listing name (artists, albums, genres, tracks) -> all items (missing listings are unchanged)
+        return list of events"""
+        events = []
+        with self.__lock:
+            for kind, name in self.KINDS.items():
+                if name in listings:
+                    events += self.__compare(kind, listings[name], None, True)
+            self.__primed = True
+        if publish:
+            self.publish(events)
+        return events
+
+    def apply(self, changes, publish=True):
+        """compare partial changes (see LMSLibraryStore.sync_incremental) to previous state, update state and publish events
+        genres are always fully listed in changes
+        return list of events"""
+        events = []
+        with self.__lock:
+            for kind, name in self.KINDS.items():
+                if kind=='genre':
+                    events += self.__compare(kind, changes.get(name, []), None, True)
+                else:
+                    events += self.__compare(kind, changes.get(name, []), changes.get('deleted_%s' % name, []), False)
+            self.__primed = True
+        if publish:
+            self.publish(events)
+        return events
+
+    def __compare(self, kind, items, removed_ids, full):
+        """update state of kind, return events
+        full: items are all items of kind (others are removed)"""
+        events = []
+        hashes = self.__hashes[kind]
+        seen = set()
+        for item in items:
+            if 'id' not in item:
+                continue
+            id = str(item['id'])
+            seen.add(id)
+            content_hash = self.__hash(item)
+            previous = hashes.get(id)
+            if previous is None:
+                events.append({'event': 'added', 'kind': kind, 'id': id, 'item': item})
+            elif previous!=content_hash:
+                events.append({'event': 'modified', 'kind': kind, 'id': id, 'item': item})
+            hashes[id] = content_hash
+
+        if full:
+            removed_ids = [id for id in hashes if id not in seen]
+        for id in removed_ids or []:
+            id = str(id)
+            if hashes.pop(id, None) is not None:
+                events.append({'event': 'removed', 'kind': kind, 'id': id, 'item': None})
+        return events
@@ -24,9 +24,21 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
 from .pylmsserver import LMSServer
+from .pylmslibrarystore import LMSLibraryStore
+from .pylmssearch import LMSSearchIndex
+from .pylmsbulkloader import LMSBulkLoader
+from .pylmslibrarygraph import LMSLibraryGraph
+from .pylmscache import LRUCache
+from .pylmssnapshot import LMSLibrarySnapshot
+from .pylmstrackstore import LMSTrackStore
+from .pylmsanalytics import LMSLibraryAnalytics
+from .pylmschangefeed import LMSLibraryChangeFeed
+from .pylmslistview import LMSListView
+from .pylmsprefetcher import LMSPrefetcher
 import threading
 import os
 import logging
+import time
 import urllib.request, urllib.parse, urllib.error
 
 class CacheCovers(threading.Thread):
@@ -81,15 +93,57 @@ class LMSLibrary():
     LIBRARY_EMPTY = 0
     LIBRARY_UPTODATE = 1
     LIBRARY_UPDATING = 2
+    #delay (in seconds) between two checks of local store freshness
+    STORE_CHECK_INTERVAL = 60
+    #number of server connections used to download library during full store sync
+    BULK_CONNECTIONS = 4
+    #number of processes parsing downloaded library pages during full store sync
+    BULK_PROCESSES = 2
+    #fields that can be requested to getters (fields argument) with their server tag
+    #only id and requested fields are returned (name must be requested like other fields)
+    FIELDS_TAGS = {
+        'album': {'album': 'l', 'year': 'y', 'artwork_track_id': 'j', 'title': 't', 'disc': 'i', 'disccount': 'q',
+                  'compilation': 'w', 'artist': 'a', 'artist_id': 'S', 'textkey': 's', 'album_replay_gain': 'X'},
+        'artist': {'artist': '', 'textkey': 's'},
+        'genre': {'genre': '', 'textkey': 's'},
+        'song': {'title': '', 'artist': 'a', 'coverid': 'c', 'compilation': 'C', 'duration': 'd', 'album_id': 'e',
+                 'filesize': 'f', 'genre': 'g', 'disc': 'i', 'samplesize': 'I', 'coverart': 'j', 'artwork_track_id': 'J',
+                 'comment': 'k', 'album': 'l', 'bpm': 'm', 'modificationTime': 'n', 'type': 'o', 'genre_id': 'p',
+                 'addedTime': 'D', 'lastUpdated': 'U', 'disccount': 'q', 'bitrate': 'r', 'rating': 'R', 'artist_id': 's',
+                 'tracknum': 't', 'samplerate': 'T', 'url': 'u', 'tagversion': 'v', 'lyrics': 'w', 'remote': 'x',
+                 'album_replay_gain': 'X', 'year': 'y', 'replay_gain': 'Y'},
+        'year': {'year': ''}
+    }
+    #types of requested fields values (other fields are strings)
+    FIELDS_TYPES = {
+        'id': int, 'year': int, 'artist_id': int, 'album_id': int, 'genre_id': int, 'disc': int, 'disccount': int,
+        'compilation': int, 'tracknum': int, 'filesize': int, 'samplesize': int, 'samplerate': int, 'coverart': int,
+        'bpm': int, 'rating': int, 'remote': int, 'addedTime': int, 'lastUpdated': int, 'duration': float,
+        'replay_gain': float, 'album_replay_gain': float
+    }
+    #song infos fields returned without fields argument
+    SONG_INFOS_TAGS = 'adefgIJlnortTuvyY'
+    #tags requested by list views (textkey is needed for alphabetical jumps)
+    LIST_VIEW_TAGS = {'albums': 'ljySs', 'artists': 's', 'genres': 's', 'years': ''}
+    #number of pipelined requests sent at once
+    PIPELINE_SIZE = 100
+    #song infos cache bounds (number of songs and approximate memory size)
+    SONG_INFOS_CACHE_ENTRIES = 2000
+    SONG_INFOS_CACHE_SIZE = 4 * 1024 * 1024
 
-    def __init__(self, server_ip, server_port=9090, server_user='', server_password=''):
-        """constructor"""
+    def __init__(self, server_ip, server_port=9090, server_user='', server_password='', use_store=True, use_graph=True):
+        """constructor
+        use_store: answer browse requests from local library store when it is up to date
+        use_graph: answer browse requests from in-memory library graph (built from up to date store
+                   or explicitly with build_graph)"""
         #init
         self.logger = logging.getLogger("Library")
         
         #members
         self.server_ip = server_ip
         self.server_port = server_port
+        self.__server_user = server_user
+        self.__server_password = server_password
         self.__cover_path = os.path.join(os.path.expanduser('~'), '.squeezedesktop', 'cache')
         if not os.path.exists(self.__cover_path):
             #create cache directory
@@ -99,20 +153,43 @@ class LMSLibrary():
         self.__artists_count = 0
         self.__genres_count = 0
         self.__years_count = 0
+        self.__store_path = os.path.join(os.path.expanduser('~'), '.squeezedesktop', 'library.db')
+        self.__store_checked_at = 0
+        self.__store_fresh = False
+        self.__snapshot_path = os.path.join(os.path.expanduser('~'), '.squeezedesktop', 'library.snapshot')
+        self.track_store_path = os.path.join(os.path.expanduser('~'), '.squeezedesktop', 'tracks.col')
         
         #objects
         self.server = LMSServer(server_ip, server_port, server_user, server_password)
         self.server.connect()
         self.cache_covers = None
+        self.search_index = LMSSearchIndex()
+        self.__search_index_built = False
+        self.song_infos_cache = LRUCache(self.SONG_INFOS_CACHE_ENTRIES, self.SONG_INFOS_CACHE_SIZE, self.__song_infos_evicted)
+        self.__song_infos_urls = {}
+        self.__analytics = None
+        self.prefetcher = None
+        self.change_feed = LMSLibraryChangeFeed()
+        self.graph = None
+        if use_graph:
+            self.graph = LMSLibraryGraph()
+        self.store = None
+        self.bulk_loader = None
+        if use_store:
+            self.store = LMSLibraryStore(self.__store_path)
+            self.bulk_loader = LMSBulkLoader(server_ip, server_port, server_user, server_password, connections=self.BULK_CONNECTIONS, processes=self.BULK_PROCESSES)
         
     def __del__(self):
         """destructor"""
         #only stop threads if runnings
         if self.cache_covers:
             self.cache_covers.stop()
+        if self.prefetcher:
+            self.prefetcher.stop()
             
-    def get_albums(self):
-        """return all albums"""
+    def get_albums(self, fields=None):
+        """return all albums
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         #     id 	Album ID. Item delimiter.
         #l 	  album 	Album name, including the server's added "(N of M)" if the server is set to group multi disc albums together. See tag "title" for the unmodified value.
         #y 	  year 	Album year. This is determined by the server based on the album tracks.
@@ -126,25 +203,37 @@ class LMSLibrary():
         #s 	  textkey 	The album's "textkey" is the first letter of the sorting key.
         #X 	  album_replay_gain 	The album's replay-gain. 
         #need at least j tag to find associated cover in cache
-        count, items, error = self.server.request_with_results('albums 0 %d tags:lj' % self.__albums_count)
+        if self.__is_local('albums', fields):
+            if self.__graph_is_ready():
+                return self.__project(self.graph.get_albums(), fields, shared=True)
+            if self.__store_is_fresh():
+                return self.__project(self.store.get_albums(), fields)
+        count, items, error = self.server.request_with_results('albums 0 %d tags:%s' % (self.__albums_count, self.__get_tags('album', fields, 'lj')))
         if error:
             return None
         else:
-            return items
+            return self.__project(items, fields)
             
-    def get_album(self, id):
-        """return album infos"""
+    def get_album(self, id, fields=None):
+        """return album infos
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('albums 0 1 album_id:%d tags:ljyS' % id)
+            if self.__is_local('albums', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_album(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_album(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('album', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_album_songs(self, id):
-        """return all songs from specified album id"""
+    def get_album_songs(self, id, fields=None):
+        """return all songs from specified album id
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         # rescan 	Returned with value 1 if the server is still scanning the database. The results may therefore be incomplete. Not returned if no scan is in progress.
         #    count 	Number of results returned by the query, that is, total number of elements to return for this song.
         #    id 	Track ID.
@@ -191,120 +280,450 @@ class LMSLibrary():
         #y 	year 	Song year. Only if known.
         #Y 	replay_gain 	Replay gain (in dB), if any 
         if id!=None:
-            count, items, error = self.server.request_with_results('songs 0 200 album_id:%deJ' % id)
+            if self.__is_local('tracks', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_album_songs(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_album_songs(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('album_songs', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_artists(self):
-        """return all artists"""
+    def get_artists(self, fields=None):
+        """return all artists
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         #   id 	Artist ID. Item delimiter.
         #   artist 	Artist name.
         #s 	  textkey 	The artist's "textkey" is the first letter of the sorting key. 
-        count, items, error = self.server.request_with_results('artists 0 %d' % self.__artists_count)
+        if self.__is_local('artists', fields):
+            if self.__graph_is_ready():
+                return self.__project(self.graph.get_artists(), fields, shared=True)
+            if self.__store_is_fresh():
+                return self.__project(self.store.get_artists(), fields)
+        count, items, error = self.server.request_with_results('artists 0 %d tags:%s' % (self.__artists_count, self.__get_tags('artist', fields, '')))
         if error:
             return None
         else:
-            return items
+            return self.__project(items, fields)
             
-    def get_artist(self, id):
-        """return artist infos"""
+    def get_artist(self, id, fields=None):
+        """return artist infos
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('artists 0 1 artist_id:%d' % id)
+            if self.__is_local('artists', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_artist(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_artist(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('artist', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_artist_albums(self, id):
-        """return albums from specified artist id"""
+    def get_artist_albums(self, id, fields=None):
+        """return albums from specified artist id
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('albums 0 %d artist_id:%d tags:ljyS' % (self.__albums_count, id))
+            if self.__is_local('albums', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_artist_albums(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_artist_albums(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('artist_albums', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_genres(self):
-        """return all genres"""
-        count, items, error = self.server.request_with_results('genres 0 %d' % self.__genres_count)
+    def get_genres(self, fields=None):
+        """return all genres
+        fields: only return id and these fields (see FIELDS_TAGS)"""
+        if self.__is_local('genres', fields):
+            if self.__graph_is_ready():
+                return self.__project(self.graph.get_genres(), fields, shared=True)
+            if self.__store_is_fresh():
+                return self.__project(self.store.get_genres(), fields)
+        count, items, error = self.server.request_with_results('genres 0 %d tags:%s' % (self.__genres_count, self.__get_tags('genre', fields, '')))
         if error:
             return None
         else:
-            return items
+            return self.__project(items, fields)
             
-    def get_genre(self, id):
-        """return genre infos"""
+    def get_genre(self, id, fields=None):
+        """return genre infos
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('genre 0 1 genre_id:%d' % id)
+            if self.__is_local('genres', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_genre(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_genre(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('genre', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_genre_albums(self, id):
-        """return albums from specified genre id"""
+    def get_genre_albums(self, id, fields=None):
+        """return albums from specified genre id
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('albums 0 %d genre_id:%d tags:ljyS' % (self.__albums_count, id))
+            if self.__is_local('albums', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_genre_albums(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_genre_albums(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('genre_albums', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_years(self):
-        """return all years"""
+    def get_years(self, fields=None):
+        """return all years
+        fields: only return id and these fields (see FIELDS_TAGS)"""
+        if self.__is_local('years', fields):
+            if self.__graph_is_ready():
+                return self.__project(self.graph.get_years(), fields, shared=True)
+            if self.__store_is_fresh():
+                return self.__project(self.store.get_years(), fields)
         count, items, error = self.server.request_with_results('years 0 %d' % self.__years_count)
         if error:
             return None
         else:
-            return items
+            return self.__project(items, fields)
             
-    def get_year_albums(self, id):
-        """return albums from specified year id"""
+    def get_year_albums(self, id, fields=None):
+        """return albums from specified year id
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('albums 0 %d year:%d tags:ljyS' % (self.__albums_count, id))
+            if self.__is_local('albums', fields):
+                if self.__graph_is_ready():
+                    return self.__project(self.graph.get_year_albums(id), fields, shared=True)
+                if self.__store_is_fresh():
+                    return self.__project(self.store.get_year_albums(id), fields)
+            count, items, error = self.__browse_request(self.__browse_command('year_albums', id, fields))
             if error:
                 return None
             else:
-                return items
+                return self.__project(items, fields)
         else:
             return None
             
-    def get_song_infos(self, id):
-        """return full song infos"""
+    def get_song_infos(self, id, fields=None):
+        """return full song infos
+        fields: only return id and these fields (see FIELDS_TAGS)"""
         if id!=None:
-            count, items, error = self.server.request_with_results('songinfo 0 50 track_id:%d tags:adefgIJlnortTuvyY' % id)
-            if not error and count==1:
-                return items[0]
-            else:
+            if not self.__is_song_infos(fields):
+                count, items, error = self.server.request_with_results('songinfo 0 50 track_id:%d tags:%s' % (int(id), self.__get_tags('song', fields, '')))
+                if not error and count==1:
+                    return self.__project(items, fields)[0]
                 return None
+            infos = self.song_infos_cache.get(str(id))
+            if infos is None:
+                infos = self.__get_song_infos(id)
+                self.__cache_song_infos(infos)
+            if infos:
+                if fields is not None:
+                    return self.__project([infos], fields)[0]
+                #returned infos can be updated by caller
+                return dict(infos)
+        return None
+
+    def __get_song_infos(self, id):
+        """return full song infos from graph, store or server"""
+        infos = self.__get_local_song_infos(id)
+        if infos:
+            return infos
+        count, items, error = self.server.request_with_results('songinfo 0 50 track_id:%d tags:%s' % (int(id), self.SONG_INFOS_TAGS))
+        if not error and count==1:
+            return items[0]
         else:
             return None
             
-    def get_song_infos_by_url(self, url):
-        """return full song infos"""
-        if id!=None:
-            count, items, error = self.server.request_with_results('songinfo 0 50 url:%s tags:adefgIJlnortTuvyY' % url)
-            self.logger.debug('count=%d' % count)
-            self.logger.debug('items=%s' % str(items))
-            self.logger.debug('error=%s' % str(error))
+    def __get_local_song_infos(self, id):
+        """return full song infos from graph or store (None if not available locally)"""
+        if self.__graph_is_ready():
+            infos = self.graph.get_song_infos(id)
+            if infos:
+                return infos
+        if self.__store_is_fresh():
+            infos = self.store.get_song_infos(id)
+            if infos:
+                return infos
+        return None
+
+    def get_songs_infos(self, ids, fields=None):
+        """return dict of songs infos by id
+        Songs not cached nor available locally are requested by pipelined batches
+        Unknown songs are not part of returned dict
+        fields: only return id and these fields (see FIELDS_TAGS)"""
+        songs = {}
+        missing = []
+        full = self.__is_song_infos(fields)
+        for id in ids:
+            if id in songs or id in missing:
+                continue
+            infos = None
+            if full:
+                infos = self.song_infos_cache.get(str(id))
+                if infos is None:
+                    infos = self.__get_local_song_infos(id)
+                    self.__cache_song_infos(infos)
+            if infos:
+                songs[id] = infos
+            else:
+                missing.append(id)
+
+        if full:
+            tags = self.SONG_INFOS_TAGS
+        else:
+            tags = self.__get_tags('song', fields, '')
+        commands = ['songinfo 0 50 track_id:%d tags:%s' % (int(id), tags) for id in missing]
+        for id, (count, items, error) in zip(missing, self.__request_many(commands)):
             if not error and count==1:
-                return items[0]
+                if full:
+                    self.__cache_song_infos(items[0])
+                songs[id] = items[0]
+
+        for id in songs:
+            if fields is not None:
+                songs[id] = self.__project([songs[id]], fields)[0]
             else:
+                #returned infos can be updated by caller
+                songs[id] = dict(songs[id])
+        return songs
+
+    def __request_many(self, commands):
+        """send commands by pipelined batches, return list of results"""
+        results = []
+        for i in range(0, len(commands), self.PIPELINE_SIZE):
+            results += self.server.request_many_with_results(commands[i:i+self.PIPELINE_SIZE])
+        return results
+
+    def get_song_infos_by_url(self, url, fields=None):
+        """return full song infos
+        fields: only return id and these fields (see FIELDS_TAGS)"""
+        if url!=None:
+            if not self.__is_song_infos(fields):
+                count, items, error = self.server.request_with_results('songinfo 0 50 url:%s tags:%s' % (url, self.__get_tags('song', fields, '')))
+                if not error and count==1:
+                    return self.__project(items, fields)[0]
                 return None
+            infos = self.song_infos_cache.get(self.__song_infos_urls.get(url))
+            if infos is None:
+                infos = self.__get_song_infos_by_url(url)
+                self.__cache_song_infos(infos)
+            if infos:
+                if fields is not None:
+                    return self.__project([infos], fields)[0]
+                #returned infos can be updated by caller
+                return dict(infos)
+        return None
+
+    def __get_song_infos_by_url(self, url):
+        """return full song infos from graph, store or server"""
+        if self.__graph_is_ready():
+            infos = self.graph.get_song_infos_by_url(url)
+            if infos:
+                return infos
+        if self.__store_is_fresh():
+            infos = self.store.get_song_infos_by_url(url)
+            if infos:
+                return infos
+        count, items, error = self.server.request_with_results('songinfo 0 50 url:%s tags:%s' % (url, self.SONG_INFOS_TAGS))
+        self.logger.debug('count=%d' % count)
+        self.logger.debug('items=%s' % str(items))
+        self.logger.debug('error=%s' % str(error))
+        if not error and count==1:
+            return items[0]
         else:
             return None
+
+    def __browse_command(self, name, id, fields=None):
+        """return server command of browse getter"""
+        if name=='album':
+            return 'albums 0 1 album_id:%d tags:%s' % (id, self.__get_tags('album', fields, 'ljyS'))
+        elif name=='album_songs':
+            return 'songs 0 200 album_id:%d tags:%s' % (id, self.__get_tags('song', fields, 'eJ'))
+        elif name=='artist':
+            return 'artists 0 1 artist_id:%d tags:%s' % (id, self.__get_tags('artist', fields, ''))
+        elif name=='artist_albums':
+            return 'albums 0 %d artist_id:%d tags:%s' % (self.__albums_count, id, self.__get_tags('album', fields, 'ljyS'))
+        elif name=='genre':
+            return 'genres 0 1 genre_id:%d tags:%s' % (id, self.__get_tags('genre', fields, ''))
+        elif name=='genre_albums':
+            return 'albums 0 %d genre_id:%d tags:%s' % (self.__albums_count, id, self.__get_tags('album', fields, 'ljyS'))
+        elif name=='year_albums':
+            return 'albums 0 %d year:%d tags:%s' % (self.__albums_count, id, self.__get_tags('album', fields, 'ljyS'))
+        raise ValueError('Unsupported browse request "%s"' % name)
+
+    def __browse_request(self, command):
+        """return result of browse command, prefetched if available"""
+        if self.prefetcher:
+            result = self.prefetcher.get(command)
+            if result is not None:
+                #prefetched items are kept in prefetcher cache
+                (count, items, error) = result
+                return count, [dict(item) for item in items], error
+        return self.server.request_with_results(command)
+
+    # prefetch
+
+    def enable_prefetch(self, budget=LMSPrefetcher.DEFAULT_BUDGET):
+        """speculatively load next browse levels in background (see prefetch_* functions)
+        budget: max number of background requests per second"""
+        if not self.prefetcher:
+            self.prefetcher = LMSPrefetcher(self.server_ip, self.server_port, self.__server_user, self.__server_password, budget=budget)
+            self.prefetcher.start()
+        self.prefetcher.budget = budget
+
+    def disable_prefetch(self):
+        """stop background prefetch"""
+        if self.prefetcher:
+            self.prefetcher.stop()
+            self.prefetcher = None
+
+    def __prefetch(self, requests):
+        """queue browse requests (name, id) in prefetcher, cancelling previous hints"""
+        if not self.prefetcher:
+            return
+        if self.__graph_is_ready() or self.__store_is_fresh():
+            #browse requests are already answered locally
+            return
+        self.prefetcher.prefetch([self.__browse_command(name, id) for name, id in requests])
+
+    def prefetch_artist(self, id):
+        """artist is under cursor: prefetch its albums"""
+        self.__prefetch([('artist_albums', id)])
+
+    def prefetch_album(self, id):
+        """album is focused: prefetch its infos and songs"""
+        self.__prefetch([('album_songs', id), ('album', id)])
+
+    def prefetch_genre(self, id):
+        """genre is under cursor: prefetch its albums"""
+        self.__prefetch([('genre_albums', id)])
+
+    def prefetch_year(self, year):
+        """year is under cursor: prefetch its albums"""
+        self.__prefetch([('year_albums', year)])
+
+    def prefetch_albums(self, ids):
+        """albums are visible: prefetch their songs (first ones first)"""
+        self.__prefetch([('album_songs', id) for id in ids])
+
+    def __get_tags(self, kind, fields, default):
+        """return minimal tags to request fields of kind of items (default tags if fields is None)"""
+        if fields is None:
+            return default
+        tags = set()
+        for field in fields:
+            if field=='id':
+                continue
+            try:
+                tags.add(self.FIELDS_TAGS[kind][field])
+            except KeyError:
+                raise ValueError('Unsupported %s field "%s"' % (kind, field))
+        return ''.join(sorted(tags))
+
+    def __is_local(self, table, fields):
+        """return True if fields are available in local graph and store"""
+        if fields is None:
+            return True
+        return set(fields).issubset(getattr(LMSLibraryStore, '%s_COLUMNS' % table.upper()))
+
+    def __is_song_infos(self, fields):
+        """return True if fields are part of (cached) full song infos"""
+        if fields is None:
+            return True
+        tags = self.__get_tags('song', fields, '')
+        return set(tags).issubset(self.SONG_INFOS_TAGS)
+
+    def __project(self, items, fields, shared=False):
+        """return items reduced to id and requested fields, with typed values
+        shared: items are kept by library (graph), all fields are returned in copies"""
+        if items is None:
+            return items
+        if fields is None:
+            #returned items can be updated by caller
+            return [dict(item) for item in items] if shared else items
+        fields = ['id'] + [field for field in fields if field!='id']
+        projected = []
+        for item in items:
+            values = {}
+            for field in fields:
+                if field in item:
+                    value = item[field]
+                    if field in self.FIELDS_TYPES:
+                        try:
+                            value = self.FIELDS_TYPES[field](value)
+                        except (TypeError, ValueError):
+                            pass
+                    values[field] = value
+            projected.append(values)
+        return projected
+
+    def __cache_song_infos(self, infos):
+        """put song infos in cache"""
+        if infos and 'id' in infos:
+            self.song_infos_cache.put(str(infos['id']), infos)
+            if infos.get('url'):
+                self.__song_infos_urls[infos['url']] = str(infos['id'])
+
+    def __song_infos_evicted(self, id, infos):
+        """song infos dropped from cache"""
+        url = infos.get('url')
+        if url and self.__song_infos_urls.get(url)==id:
+            del self.__song_infos_urls[url]
+
+    def invalidate_song_infos(self, ids=None):
+        """drop specified songs infos from cache (all songs and prefetched browse results if ids is None)
+        return ids of albums of dropped songs infos"""
+        album_ids = set()
+        if ids is None:
+            if self.prefetcher:
+                #prefetched browse results may be outdated too
+                self.prefetcher.invalidate()
+            self.song_infos_cache.clear()
+            self.__song_infos_urls.clear()
+        else:
+            for id in ids:
+                infos = self.song_infos_cache.get(str(id))
+                if infos and infos.get('album_id') is not None:
+                    album_ids.add(infos['album_id'])
+                self.song_infos_cache.invalidate(str(id))
+        return album_ids
+
+    def process_notification(self, items):
+        """process server notification (splitted and unquoted)"""
+        if len(items)>=2 and (items[0], items[1]) in (('rescan', 'done'), ('library', 'changed')):
+            #library content may have changed
+            if self.store and self.store.is_synced() and self.sync_store() is not None:
+                #only changed songs were dropped from caches
+                return
+            self.invalidate_song_infos()
+            self.__store_checked_at = 0
+        else:
+            #song updated by a client (ie rating): drop its infos and prefetched results of its album
+            ids = [item.split(':', 1)[1] for item in items if item.startswith('track_id:')]
+            if ids:
+                album_ids = self.invalidate_song_infos(ids)
+                if self.prefetcher:
+                    self.prefetcher.invalidate(album_ids)
         
             
     def get_cover_path(self, album_id, artwork_track_id):
@@ -321,14 +740,304 @@ class LMSLibrary():
         
         return cover_path
         
-    def search(self, term):
-        """search something on database"""
-        #TODO
-        pass
+    def search(self, term, limit=50, kinds=None):
+        """search term in artists, albums and tracks names using local index (server is only
+        requested to build index the first time)
+        kinds: restrict search to some entity kinds ('artist', 'album', 'track')
+        return ranked list of dicts (type, id, name, score)"""
+        if not self.__search_index_built:
+            self.build_search_index()
+        return self.search_index.search(term, limit, kinds)
+
+    def build_search_index(self):
+        """(re)build search index from library listings, return True if succeed"""
+        if self.__store_is_fresh():
+            artists = self.store.get_artists()
+            albums = self.store.get_albums()
+            tracks = self.store.select('SELECT id, title FROM tracks')
+        else:
+            try:
+                artists_count = int(self.server.request('info total artists ?'))
+                albums_count = int(self.server.request('info total albums ?'))
+                tracks_count = int(self.server.request('info total songs ?'))
+            except (TypeError, ValueError):
+                self.logger.error('Unable to get library totals')
+                return False
+            count, artists, error1 = self.server.request_with_results('artists 0 %d' % artists_count)
+            count, albums, error2 = self.server.request_with_results('albums 0 %d tags:l' % albums_count)
+            count, tracks, error3 = self.server.request_with_results('titles 0 %d tags:' % tracks_count)
+            if error1 or error2 or error3:
+                self.logger.error('Unable to get library listings')
+                return False
+        self.search_index.build(artists, albums, tracks)
+        self.__search_index_built = True
+        return True
+        
+    def sync_store(self, full=False, progress_callback=None):
+        """sync local library store with server
+        full: fully reload store instead of syncing only changes since last sync
+        progress_callback(table, loaded, total): full sync progress
+        return dict of changes (see LMSLibraryStore.sync_incremental) or None if sync failed
+        (changes of full sync only contain all albums)"""
+        if not self.store:
+            return None
+        if not self.change_feed.has_subscribers():
+            #nobody tracks changes
+            self.change_feed.reset()
+        elif not self.change_feed.is_primed() and self.store.is_synced():
+            #remember library state before sync
+            self.change_feed.prime(self.__get_store_listings())
+        if full or not self.store.is_synced():
+            changes = None
+            if self.store.sync(self.server, self.bulk_loader, progress_callback):
+                changes = {'full': True, 'albums': self.store.get_albums()}
+        else:
+            changes = self.store.sync_incremental(self.server)
+        self.__store_fresh = (changes is not None)
+        self.__store_checked_at = time.time()
+
+        if changes is not None:
+            if changes.get('full'):
+                self.invalidate_song_infos()
+            else:
+                self.invalidate_song_infos([track['id'] for track in changes['tracks'] if 'id' in track] + changes['deleted_tracks'])
+                if self.prefetcher and [key for key, value in changes.items() if value]:
+                    #prefetched browse results may be outdated too
+                    self.prefetcher.invalidate()
+            if changes.get('full') or changes['tracks'] or changes['deleted_tracks']:
+                self.__write_track_store()
+                self.__analytics = None
+            if self.change_feed.has_subscribers():
+                if changes.get('full'):
+                    self.change_feed.diff(self.__get_store_listings())
+                else:
+                    self.change_feed.apply(self.__get_stored_changes(changes))
+
+        if changes is not None and self.__search_index_built:
+            if changes.get('full'):
+                self.build_search_index()
+            else:
+                self.__update_search_index(changes)
+        if changes is not None and self.graph and self.graph.is_built():
+            if changes.get('full'):
+                self.build_graph()
+            else:
+                self.graph.update(changes)
+        return changes
+
+    def build_graph(self):
+        """(re)build in-memory library graph from local store when up to date, from server otherwise
+        return True if succeed"""
+        if not self.graph:
+            return False
+        if self.__store_is_fresh():
+            listings = self.__get_store_listings()
+            artists = listings['artists']
+            albums = listings['albums']
+            genres = listings['genres']
+            tracks = listings['tracks']
+        else:
+            try:
+                artists_count = int(self.server.request('info total artists ?'))
+                albums_count = int(self.server.request('info total albums ?'))
+                genres_count = int(self.server.request('info total genres ?'))
+                tracks_count = int(self.server.request('info total songs ?'))
+            except (TypeError, ValueError):
+                self.logger.error('Unable to get library totals')
+                return False
+            count, artists, error1 = self.server.request_with_results('artists 0 %d tags:%s' % (artists_count, LMSLibraryStore.ARTISTS_TAGS))
+            count, albums, error2 = self.server.request_with_results('albums 0 %d tags:%s' % (albums_count, LMSLibraryStore.ALBUMS_TAGS))
+            count, genres, error3 = self.server.request_with_results('genres 0 %d tags:%s' % (genres_count, LMSLibraryStore.GENRES_TAGS))
+            count, tracks, error4 = self.server.request_with_results('songs 0 %d tags:%s' % (tracks_count, LMSLibraryStore.TRACKS_TAGS))
+            if error1 or error2 or error3 or error4:
+                self.logger.error('Unable to get library listings')
+                return False
+        self.graph.build(artists, albums, genres, tracks)
+        return True
+
+    def __write_track_store(self):
+        """write columnar tracks store shared with other processes from local store"""
+        tracks = self.store.select('SELECT id, album_id, artist_id, genre_id, year, duration, title, album, artist, genre, url FROM tracks')
+        try:
+            LMSTrackStore(self.track_store_path).write(tracks, self.store.get_meta('lastscan'))
+        except (IOError, OSError) as e:
+            self.logger.error('Unable to write track store: %s' % str(e))
+
+    def open_track_store(self):
+        """return columnar tracks store written during store sync (mapped in memory), None if not available"""
+        track_store = LMSTrackStore(self.track_store_path)
+        if not track_store.open():
+            return None
+        return track_store
+
+    def get_list_view(self, kind, artist_id=None, genre_id=None, year=None,
+                      page_size=LMSListView.DEFAULT_PAGE_SIZE, cache_pages=LMSListView.DEFAULT_CACHE_PAGES):
+        """return windowed view (LMSListView) over sorted listing of albums, artists, genres or years
+        albums can be filtered by artist_id, genre_id or year, artists by genre_id
+        View is served from graph or store when up to date, by pages requested to server otherwise"""
+        if kind not in self.LIST_VIEW_TAGS:
+            raise ValueError('Unsupported listing "%s"' % kind)
+        items = self.__get_local_listing(kind, artist_id, genre_id, year)
+        if items is not None:
+            fetch = lambda start, count: (len(items), items[start:start+count])
+            fetch_textkeys = lambda: [item.get('textkey') for item in items]
+            return LMSListView(fetch, page_size, cache_pages, fetch_textkeys, local=True)
+
+        filters = ''
+        for name, value in (('artist_id', artist_id), ('genre_id', genre_id), ('year', year)):
+            if value is not None:
+                filters += ' %s:%s' % (name, value)
+
+        def fetch(start, count):
+            total, items, error = self.server.request_with_results('%s %d %d%s tags:%s' % (kind, start, count, filters, self.LIST_VIEW_TAGS[kind]))
+            if error:
+                return None
+            return total, items
+
+        def fetch_textkeys():
+            if kind=='years':
+                return None
+            total, items, error = self.server.request_with_results('%s 0 0%s' % (kind, filters))
+            if not error:
+                total, items, error = self.server.request_with_results('%s 0 %d%s tags:s' % (kind, total, filters))
+            if error:
+                return None
+            return [item.get('textkey') for item in items]
+
+        return LMSListView(fetch, page_size, cache_pages, fetch_textkeys)
+
+    def __get_local_listing(self, kind, artist_id, genre_id, year):
+        """return full listing from graph or store (None if not available locally)"""
+        if not self.__graph_is_ready() and not self.__store_is_fresh():
+            return None
+        filters = [name for name, value in (('artist', artist_id), ('genre', genre_id), ('year', year)) if value is not None]
+        if kind=='albums' and not filters:
+            return self.get_albums()
+        elif kind=='albums' and filters==['artist']:
+            return self.get_artist_albums(artist_id)
+        elif kind=='albums' and filters==['genre']:
+            return self.get_genre_albums(genre_id)
+        elif kind=='albums' and filters==['year']:
+            return self.get_year_albums(year)
+        elif kind=='artists' and not filters:
+            return self.get_artists()
+        elif kind=='genres' and not filters:
+            return self.get_genres()
+        elif kind=='years' and not filters:
+            return self.get_years()
+        return None
+
+    def get_analytics(self):
+        """return library statistics (LMSLibraryAnalytics) over all tracks, None if tracks can't be loaded
+        Statistics are computed from graph or store when up to date, from server otherwise, and kept until library changes"""
+        if self.__analytics is None:
+            if self.__graph_is_ready():
+                tracks = self.graph.get_listings()['tracks']
+            elif self.__store_is_fresh():
+                tracks = self.store.select('SELECT genre, year, artist, album, bitrate, samplerate, samplesize, type, duration, filesize FROM tracks')
+            else:
+                try:
+                    tracks_count = int(self.server.request('info total songs ?'))
+                except (TypeError, ValueError):
+                    self.logger.error('Unable to get library totals')
+                    return None
+                count, tracks, error = self.server.request_with_results('songs 0 %d tags:%s' % (tracks_count, LMSLibraryAnalytics.TRACKS_TAGS))
+                if error:
+                    self.logger.error('Unable to get tracks')
+                    return None
+            self.__analytics = LMSLibraryAnalytics(tracks)
+        return self.__analytics
+
+    def save_snapshot(self, path=None):
+        """save in-memory library graph (built if necessary) to a binary snapshot
+        return True if succeed"""
+        if not self.graph:
+            return False
+        if not self.graph.is_built() and not self.build_graph():
+            return False
+        lastscan = self.server.get_last_scan()
+        if lastscan is None:
+            self.logger.error('Unable to get server last scan')
+            return False
+        try:
+            LMSLibrarySnapshot(path or self.__snapshot_path).save(lastscan, self.graph.get_listings())
+        except (IOError, OSError) as e:
+            self.logger.error('Unable to save snapshot: %s' % str(e))
+            return False
+        return True
+
+    def load_snapshot(self, path=None):
+        """build in-memory library graph from snapshot saved by save_snapshot
+        Snapshot is only loaded if server wasn't rescanned since it was saved
+        return True if succeed"""
+        if not self.graph:
+            return False
+        lastscan = self.server.get_last_scan()
+        if lastscan is None:
+            self.logger.error('Unable to get server last scan')
+            return False
+        tables = LMSLibrarySnapshot(path or self.__snapshot_path).load(lastscan)
+        if tables is None:
+            return False
+        self.graph.build(tables.get('artists', []), tables.get('albums', []), tables.get('genres', []), tables.get('tracks', []))
+        return True
+
+    def __get_store_listings(self):
+        """return dict of all local store items by listing (artists, albums, genres, tracks)"""
+        return {
+            'artists': self.store.get_artists(),
+            'albums': self.store.get_albums(),
+            'genres': self.store.get_genres(),
+            'tracks': self.store.select('SELECT * FROM tracks')
+        }
+
+    def __get_stored_changes(self, changes):
+        """return changes with items read back from local store
+        (change feed state is primed from store rows: server values would not hash the same)"""
+        stored = dict(changes)
+        for name in ('artists', 'albums', 'genres', 'tracks'):
+            stored[name] = self.store.get_items(name, [item['id'] for item in changes.get(name, []) if 'id' in item])
+        return stored
+
+    def __graph_is_ready(self):
+        """return True if browse requests can be answered by in-memory graph"""
+        if not self.graph:
+            return False
+        if self.store:
+            if not self.__store_is_fresh():
+                #graph is as old as store
+                return False
+            if not self.graph.is_built():
+                self.build_graph()
+        return self.graph.is_built()
+
+    def __update_search_index(self, changes):
+        """update search index with library changes"""
+        for kind, field, items in (('track', 'title', 'tracks'), ('album', 'album', 'albums'), ('artist', 'artist', 'artists')):
+            for item in changes[items]:
+                if 'id' in item and item.get(field):
+                    self.search_index.add(kind, item['id'], item[field])
+            for id in changes['deleted_%s' % items]:
+                self.search_index.remove(kind, id)
+
+    def __store_is_fresh(self):
+        """return True if browse requests can be answered by local store"""
+        if not self.store:
+            return False
+        now = time.time()
+        if now - self.__store_checked_at > self.STORE_CHECK_INTERVAL:
+            #only check server last scan from time to time
+            fresh = not self.store.is_stale(self.server)
+            if self.__store_fresh and not fresh:
+                #server was rescanned: cached song infos may be outdated
+                self.invalidate_song_infos()
+            self.__store_fresh = fresh
+            self.__store_checked_at = now
+        return self.__store_fresh
         
     def check_update(self):
         """check if library needs update, return True if database needs update followed by number of albums, artists, and genres"""
-        #get stats
+        #get stats (always needed: server fallbacks request whole lists with them)
         lms_genres_count = int(self.server.request('info total genres ?'))
         self.__genres_count = lms_genres_count
         lms_artists_count = int(self.server.request('info total artists ?'))
@@ -336,6 +1045,13 @@ class LMSLibrary():
         lms_albums_count = int(self.server.request('info total albums ?'))
         self.__albums_count = lms_albums_count
         self.logger.debug('LMS total artists=%d albums=%d genres=%d' % (lms_artists_count, lms_albums_count, lms_genres_count))
+
+        if self.store and self.store.is_synced():
+            #only sync changes and cache covers of changed albums
+            changes = self.sync_store()
+            if changes and changes['albums']:
+                self.__cache_albums_covers(changes['albums'])
+            return
         
         #check if fresh install
         if not os.path.exists(self.__server_infos_path):
@@ -371,17 +1087,25 @@ class LMSLibrary():
                 #need update
                 self.logger.debug('Need update')
                 self.__cache_covers(lms_albums_count)
+
+        #first local store sync
+        if self.store:
+            self.sync_store(full=True)
                     
     def __cache_covers(self, albums_count):
         """cache covers for thumbnails"""
         count, albums, error = self.server.request_with_results('albums 0 %d tags:j' % albums_count)
         if not error:
-            self.logger.debug('Updating...')
-            self.cache_covers = CacheCovers(self.server_ip, self.server_port, self.__cover_path, albums)
-            self.cache_covers.start()
+            self.__cache_albums_covers(albums)
         else:
             #error
             self.logger.error('Unable to get albums list')
+
+    def __cache_albums_covers(self, albums):
+        """cache covers of specified albums"""
+        self.logger.debug('Updating...')
+        self.cache_covers = CacheCovers(self.server_ip, self.server_port, self.__cover_path, albums)
+        self.cache_covers.start()
         
 
 """TESTS"""
@@ -0,0 +1,362 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import threading
+
+class LibraryItem():
+    """library entity built from item infos as returned by server"""
+    __slots__ = ('id', 'name', 'infos')
+    #infos field holding entity name
+    NAME_FIELD = None
+
+    def __init__(self, infos):
+        """constructor"""
+        self.id = str(infos['id'])
+        self.name = infos.get(self.NAME_FIELD, '')
+        self.infos = infos
+
+    def __repr__(self):
+        return '<%s %s "%s">' % (self.__class__.__name__, self.id, self.name)
+
+
+class Artist(LibraryItem):
+    """library artist"""
+    __slots__ = ()
+    NAME_FIELD = 'artist'
+
+
+class Genre(LibraryItem):
+    """library genre"""
+    __slots__ = ()
+    NAME_FIELD = 'genre'
+
+
+class Album(LibraryItem):
+    """library album"""
+    __slots__ = ('year', 'artist_id')
+    NAME_FIELD = 'album'
+
+    def __init__(self, infos):
+        LibraryItem.__init__(self, infos)
+        self.year = infos.get('year')
+        self.artist_id = infos.get('artist_id')
+
+
+class Track(LibraryItem):
+    """library track"""
+    __slots__ = ('album_id', 'artist_id', 'genre_id', 'url')
+    NAME_FIELD = 'title'
+
+    def __init__(self, infos):
+        LibraryItem.__init__(self, infos)
+        self.album_id = infos.get('album_id')
+        self.artist_id = infos.get('artist_id')
+        self.genre_id = infos.get('genre_id')
+        self.url = infos.get('url')
+
+
+class LMSLibraryGraph():
+    """In-memory graph of library artists, albums, genres and tracks with relationship indexes
+    Getters return item infos (dicts of strings like server results) shared with the graph:
+    they must not be modified"""
+
+    def __init__(self):
+        """constructor"""
+        self.__lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """empty graph"""
+        with self.__lock:
+            self.__built = False
+            #id -> entity
+            self.artists = {}
+            self.albums = {}
+            self.genres = {}
+            self.tracks = {}
+            #adjacency indexes: id -> {album id: number of references}
+            self.artist_albums = {}
+            self.genre_albums = {}
+            #year -> set of album ids
+            self.year_albums = {}
+            #album id -> set of track ids
+            self.album_tracks = {}
+            #url -> track
+            self.url_tracks = {}
+            #sorted listings cache
+            self.__sorted = {}
+
+    def is_built(self):
+        """return True if graph was built"""
+        return self.__built
+
+    def build(self, artists, albums, genres, tracks):
+        """(re)build graph from library listings"""
+        with self.__lock:
+            self.clear()
+            for infos in artists:
+                self.add_artist(infos)
+            for infos in genres:
+                self.add_genre(infos)
+            for infos in albums:
+                self.add_album(infos)
+            for infos in tracks:
+                self.add_track(infos)
+            self.__built = True
+
+    def update(self, changes):
+        """apply library changes (see LMSLibraryStore.sync_incremental)"""
+        with self.__lock:
+            for id in changes.get('deleted_tracks', []):
+                self.remove_track(id)
+            for id in changes.get('deleted_albums', []):
+                self.remove_album(id)
+            for id in changes.get('deleted_artists', []):
+                self.remove_artist(id)
+            for infos in changes.get('artists', []):
+                self.add_artist(infos)
+            for infos in changes.get('albums', []):
+                self.add_album(infos)
+            for infos in changes.get('tracks', []):
+                self.add_track(infos)
+            if changes.get('genres'):
+                #genres are always fully listed
+                self.genres = {}
+                for infos in changes['genres']:
+                    self.add_genre(infos)
+            self.__sorted = {}
+
+    def __link(self, index, key, album_id):
+        """reference album in index"""
+        if key is None:
+            return
+        refs = index.setdefault(key, {})
+        refs[album_id] = refs.get(album_id, 0) + 1
+
+    def __unlink(self, index, key, album_id):
+        """dereference album from index"""
+        refs = index.get(key)
+        if refs is None:
+            return
+        count = refs.get(album_id, 0) - 1
+        if count > 0:
+            refs[album_id] = count
+        else:
+            refs.pop(album_id, None)
+            if not refs:
+                del index[key]
+
+    # entities
+
+    def add_artist(self, infos):
+        """add or replace artist"""
+        artist = Artist(infos)
+        with self.__lock:
+            self.artists[artist.id] = artist
+            self.__sorted.pop('artists', None)
+        return artist
+
+    def remove_artist(self, id):
+        """remove artist"""
+        with self.__lock:
+            self.artists.pop(str(id), None)
+            self.__sorted.pop('artists', None)
+
+    def add_genre(self, infos):
+        """add or replace genre"""
+        genre = Genre(infos)
+        with self.__lock:
+            self.genres[genre.id] = genre
+            self.__sorted.pop('genres', None)
+        return genre
+
+    def remove_genre(self, id):
+        """remove genre"""
+        with self.__lock:
+            self.genres.pop(str(id), None)
+            self.__sorted.pop('genres', None)
+
+    def add_album(self, infos):
+        """add or replace album"""
+        album = Album(infos)
+        with self.__lock:
+            self.remove_album(album.id)
+            self.albums[album.id] = album
+            self.__link(self.artist_albums, album.artist_id, album.id)
+            if album.year is not None:
+                self.year_albums.setdefault(album.year, set()).add(album.id)
+        return album
+
+    def remove_album(self, id):
+        """remove album (its tracks are kept until removed)"""
+        id = str(id)
+        with self.__lock:
+            album = self.albums.pop(id, None)
+            self.__sorted.pop('albums', None)
+            if album is None:
+                return
+            self.__unlink(self.artist_albums, album.artist_id, id)
+            albums = self.year_albums.get(album.year)
+            if albums is not None:
+                albums.discard(id)
+                if not albums:
+                    del self.year_albums[album.year]
+
+    def add_track(self, infos):
+        """add or replace track"""
+        track = Track(infos)
+        with self.__lock:
+            self.remove_track(track.id)
+            self.tracks[track.id] = track
+            if track.album_id is not None:
+                self.album_tracks.setdefault(track.album_id, set()).add(track.id)
+                self.__link(self.artist_albums, track.artist_id, track.album_id)
+                self.__link(self.genre_albums, track.genre_id, track.album_id)
+            if track.url is not None:
+                self.url_tracks[track.url] = track
+        return track
+
+    def remove_track(self, id):
+        """remove track"""
+        id = str(id)
+        with self.__lock:
+            track = self.tracks.pop(id, None)
+            if track is None:
+                return
+            if track.album_id is not None:
+                tracks = self.album_tracks.get(track.album_id)
+                if tracks is not None:
+                    tracks.discard(id)
+                    if not tracks:
+                        del self.album_tracks[track.album_id]
+                self.__unlink(self.artist_albums, track.artist_id, track.album_id)
+                self.__unlink(self.genre_albums, track.genre_id, track.album_id)
+            if self.url_tracks.get(track.url) is track:
+                del self.url_tracks[track.url]
+
+    def get_listings(self):
+        """return dict of all items infos by table (artists, albums, genres, tracks)"""
+        with self.__lock:
+            return {
+                'artists': [artist.infos for artist in self.artists.values()],
+                'albums': [album.infos for album in self.albums.values()],
+                'genres': [genre.infos for genre in self.genres.values()],
+                'tracks': [track.infos for track in self.tracks.values()]
+            }
+
+    # sorting
+
+    def __number(self, value):
+        """return value as number to sort numeric fields (missing values first)"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return -1
+
+    def __sorted_albums(self, ids):
+        """return infos of albums sorted by textkey and name"""
+        albums = [self.albums[id] for id in ids if id in self.albums]
+        albums.sort(key=lambda album: (album.infos.get('textkey', ''), album.name))
+        return [album.infos for album in albums]
+
+    def __sorted_listing(self, name, items):
+        """return cached infos of all items sorted by textkey and name"""
+        listing = self.__sorted.get(name)
+        if listing is None:
+            listing = sorted(items.values(), key=lambda item: (item.infos.get('textkey', ''), item.name))
+            listing = self.__sorted[name] = [item.infos for item in listing]
+        return list(listing)
+
+    # queries
+
+    def get_albums(self):
+        """return all albums"""
+        with self.__lock:
+            return self.__sorted_listing('albums', self.albums)
+
+    def get_album(self, id):
+        """return album infos"""
+        album = self.albums.get(str(id))
+        return [album.infos] if album else []
+
+    def get_album_songs(self, id):
+        """return all songs from specified album id"""
+        with self.__lock:
+            tracks = [self.tracks[track_id] for track_id in self.album_tracks.get(str(id), ())]
+        tracks.sort(key=lambda track: (self.__number(track.infos.get('disc')), self.__number(track.infos.get('tracknum')), track.name))
+        return [track.infos for track in tracks]
+
+    def get_artists(self):
+        """return all artists"""
+        with self.__lock:
+            return self.__sorted_listing('artists', self.artists)
+
+    def get_artist(self, id):
+        """return artist infos"""
+        artist = self.artists.get(str(id))
+        return [artist.infos] if artist else []
+
+    def get_artist_albums(self, id):
+        """return albums from specified artist id"""
+        with self.__lock:
+            return self.__sorted_albums(list(self.artist_albums.get(str(id), ())))
+
+    def get_genres(self):
+        """return all genres"""
+        with self.__lock:
+            return self.__sorted_listing('genres', self.genres)
+
+    def get_genre(self, id):
+        """return genre infos"""
+        genre = self.genres.get(str(id))
+        return [genre.infos] if genre else []
+
+    def get_genre_albums(self, id):
+        """return albums from specified genre id"""
+        with self.__lock:
+            return self.__sorted_albums(list(self.genre_albums.get(str(id), ())))
+
+    def get_years(self):
+        """return all years"""
+        with self.__lock:
+            years = sorted(self.year_albums.keys(), key=self.__number, reverse=True)
+        return [{'year': year} for year in years]
+
+    def get_year_albums(self, id):
+        """return albums from specified year"""
+        with self.__lock:
+            return self.__sorted_albums(list(self.year_albums.get(str(id), ())))
+
+    def get_song_infos(self, id):
+        """return full song infos (None if unknown)"""
+        track = self.tracks.get(str(id))
+        if track:
+            return track.infos
+        return None
+
+    def get_song_infos_by_url(self, url):
+        """return full song infos (None if unknown)"""
+        track = self.url_tracks.get(url)
+        if track:
+            return track.infos
+        return None
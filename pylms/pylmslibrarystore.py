@@ -0,0 +1,480 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import sqlite3
+import threading
+import logging
+import time
+
+class LMSLibraryStore():
+    """Local SQLite mirror of LMS library"""
+
+    #tables columns (first one is primary key)
+    ARTISTS_COLUMNS = ['id', 'artist', 'textkey']
+    ALBUMS_COLUMNS = ['id', 'album', 'year', 'artwork_track_id', 'artist', 'artist_id', 'textkey']
+    GENRES_COLUMNS = ['id', 'genre', 'textkey']
+    YEARS_COLUMNS = ['year']
+    TRACKS_COLUMNS = ['id', 'title', 'artist', 'artist_id', 'album', 'album_id', 'genre', 'genre_id',
+                      'year', 'duration', 'tracknum', 'disc', 'url', 'filesize', 'bitrate', 'samplerate',
+                      'samplesize', 'type', 'tagversion', 'artwork_track_id', 'replay_gain',
+                      'modificationTime', 'addedTime', 'lastUpdated']
+
+    #tags requested to server
+    ARTISTS_TAGS = 's'
+    ALBUMS_TAGS = 'lyjaSs'
+    GENRES_TAGS = 's'
+    TRACKS_TAGS = 'asleptgiydfrTIouvJYnDU'
+    #tags of tracks stamps listing used by incremental sync
+    STAMPS_TAGS = 'U'
+    #number of pipelined requests sent at once
+    PIPELINE_SIZE = 100
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS artists (id INTEGER PRIMARY KEY, artist TEXT, textkey TEXT);
+        CREATE TABLE IF NOT EXISTS albums (id INTEGER PRIMARY KEY, album TEXT, year NUMERIC,
+            artwork_track_id TEXT, artist TEXT, artist_id INTEGER, textkey TEXT);
+        CREATE TABLE IF NOT EXISTS genres (id INTEGER PRIMARY KEY, genre TEXT, textkey TEXT);
+        CREATE TABLE IF NOT EXISTS years (year INTEGER PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, title TEXT, artist TEXT,
+            artist_id INTEGER, album TEXT, album_id INTEGER, genre TEXT, genre_id INTEGER, year NUMERIC,
+            duration NUMERIC, tracknum NUMERIC, disc NUMERIC, url TEXT, filesize NUMERIC, bitrate TEXT,
+            samplerate NUMERIC, samplesize NUMERIC, type TEXT, tagversion TEXT, artwork_track_id TEXT,
+            replay_gain TEXT, modificationTime TEXT, addedTime NUMERIC, lastUpdated NUMERIC);
+        CREATE INDEX IF NOT EXISTS artists_artist ON artists (artist);
+        CREATE INDEX IF NOT EXISTS albums_album ON albums (album);
+        CREATE INDEX IF NOT EXISTS albums_artist ON albums (artist_id);
+        CREATE INDEX IF NOT EXISTS albums_year ON albums (year);
+        CREATE INDEX IF NOT EXISTS genres_genre ON genres (genre);
+        CREATE INDEX IF NOT EXISTS tracks_artist ON tracks (artist_id);
+        CREATE INDEX IF NOT EXISTS tracks_album ON tracks (album_id);
+        CREATE INDEX IF NOT EXISTS tracks_genre ON tracks (genre_id);
+        CREATE INDEX IF NOT EXISTS tracks_year ON tracks (year);
+        CREATE INDEX IF NOT EXISTS tracks_url ON tracks (url);
+    """
+
+    def __init__(self, path):
+        """constructor"""
+        self.logger = logging.getLogger("LibraryStore")
+
+        #members
+        self.path = path
+        self.__lock = threading.RLock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.row_factory = sqlite3.Row
+        self.__db.execute('PRAGMA journal_mode=WAL')
+        self.__db.execute('PRAGMA synchronous=NORMAL')
+        self.__db.executescript(self.SCHEMA)
+        self.__db.commit()
+
+    def close(self):
+        """close database"""
+        with self.__lock:
+            if self.__db:
+                self.__db.close()
+                self.__db = None
+
+    # meta
+
+    def get_meta(self, key, default=None):
+        """return meta value"""
+        with self.__lock:
+            row = self.__db.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return default
+        return row[0]
+
+    def set_meta(self, key, value, commit=True):
+        """set meta value"""
+        with self.__lock:
+            self.__db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+            if commit:
+                self.__db.commit()
+
+    def is_synced(self):
+        """return True if store was synced at least once"""
+        return self.get_meta('synced_at') is not None
+
+    def is_stale(self, server=None, max_age=None):
+        """return True if store must be synced again
+        server: compare server last scan with last scan stored during sync
+        max_age: max delay (in seconds) since last sync"""
+        synced_at = self.get_meta('synced_at')
+        if synced_at is None:
+            return True
+        if max_age is not None and time.time() - float(synced_at) > max_age:
+            return True
+        if server:
+            lastscan = server.get_last_scan()
+            if lastscan is None or str(lastscan) != self.get_meta('lastscan'):
+                return True
+        return False
+
+    # sync
+
+    def sync(self, server, loader=None, progress_callback=None):
+        """fully sync store from server
+        loader: LMSBulkLoader instance used to download albums and tracks by pages over several connections
+        progress_callback(table, loaded, total): called after each page stored (only with loader)
+        return True if sync succeed"""
+        lastscan = server.get_last_scan()
+        try:
+            albums_count = int(server.request('info total albums ?'))
+            artists_count = int(server.request('info total artists ?'))
+            genres_count = int(server.request('info total genres ?'))
+            tracks_count = int(server.request('info total songs ?'))
+        except (TypeError, ValueError):
+            self.logger.error('Unable to get library totals')
+            return False
+
+        if loader:
+            return self.__sync_bulk(server, loader, lastscan, albums_count, artists_count, genres_count, tracks_count, progress_callback)
+
+        queries = [
+            ('artists', 'artists 0 %d tags:%s' % (artists_count, self.ARTISTS_TAGS)),
+            ('albums', 'albums 0 %d tags:%s' % (albums_count, self.ALBUMS_TAGS)),
+            ('genres', 'genres 0 %d tags:%s' % (genres_count, self.GENRES_TAGS)),
+            ('years', 'years 0 %d' % (albums_count)),
+            ('tracks', 'songs 0 %d tags:%s' % (tracks_count, self.TRACKS_TAGS)),
+        ]
+        results = {}
+        for table, query in queries:
+            count, items, error = server.request_with_results(query)
+            if error:
+                self.logger.error('Unable to get %s from server' % table)
+                return False
+            results[table] = items
+
+        with self.__lock:
+            try:
+                for table in results:
+                    self.__db.execute('DELETE FROM %s' % table)
+                    self.insert(table, results[table], commit=False)
+                self.set_meta('lastscan', lastscan, commit=False)
+                self.set_meta('synced_at', time.time(), commit=False)
+                self.__db.commit()
+            except Exception as e:
+                self.__db.rollback()
+                self.logger.error('Unable to store library: %s' % str(e))
+                return False
+        self.logger.debug('Library synced: %d tracks' % len(results['tracks']))
+        return True
+
+    def __sync_bulk(self, server, loader, lastscan, albums_count, artists_count, genres_count, tracks_count, progress_callback):
+        """sync store downloading big listings by pages
+        Each page is committed as soon as received so an interrupted sync is resumed from last stored page"""
+        with self.__lock:
+            if lastscan is None or self.get_meta('bulk_lastscan') != str(lastscan):
+                #new bulk sync: store is incomplete until end of sync
+                self.__db.execute('DELETE FROM albums')
+                self.__db.execute('DELETE FROM tracks')
+                self.__db.execute("DELETE FROM meta WHERE key IN ('synced_at', 'bulk_albums_offset', 'bulk_tracks_offset')")
+                self.set_meta('bulk_lastscan', lastscan, commit=False)
+                self.__db.commit()
+            else:
+                self.logger.debug('Resume library sync')
+
+        listings = [
+            ('albums', 'albums %%d %%d tags:%s' % self.ALBUMS_TAGS, albums_count),
+            ('tracks', 'songs %%d %%d tags:%s' % self.TRACKS_TAGS, tracks_count),
+        ]
+        for table, query, count in listings:
+            offset_key = 'bulk_%s_offset' % table
+
+            def store_page(start, rows):
+                with self.__lock:
+                    self.insert_rows(table, rows, commit=False)
+                    self.set_meta(offset_key, start + len(rows), commit=False)
+                    self.__db.commit()
+
+            def page_progress(loaded, total):
+                if progress_callback:
+                    progress_callback(table, loaded, total)
+
+            start = int(self.get_meta(offset_key, 0))
+            #pages are given as rows (table columns values), they can be parsed in other processes
+            if not loader.load(query, count, store_page, start, page_progress, self.__columns(table)):
+                self.logger.error('Unable to get %s from server' % table)
+                return False
+
+        #small listings
+        queries = [
+            ('artists', 'artists 0 %d tags:%s' % (artists_count, self.ARTISTS_TAGS)),
+            ('genres', 'genres 0 %d tags:%s' % (genres_count, self.GENRES_TAGS)),
+            ('years', 'years 0 %d' % (albums_count)),
+        ]
+        results = {}
+        for table, query in queries:
+            count, items, error = server.request_with_results(query)
+            if error:
+                self.logger.error('Unable to get %s from server' % table)
+                return False
+            results[table] = items
+
+        with self.__lock:
+            try:
+                for table in results:
+                    self.__db.execute('DELETE FROM %s' % table)
+                    self.insert(table, results[table], commit=False)
+                self.__db.execute("DELETE FROM meta WHERE key IN ('bulk_lastscan', 'bulk_albums_offset', 'bulk_tracks_offset')")
+                self.set_meta('lastscan', lastscan, commit=False)
+                self.set_meta('synced_at', time.time(), commit=False)
+                self.__db.commit()
+            except Exception as e:
+                self.__db.rollback()
+                self.logger.error('Unable to store library: %s' % str(e))
+                return False
+        self.logger.debug('Library synced: %d tracks' % tracks_count)
+        return True
+
+    def sync_incremental(self, server):
+        """sync only tracks, albums and artists changed since last sync
+        return dict of changes (see below) or None if sync failed
+            tracks, albums, artists, genres: new or updated items
+            deleted_tracks, deleted_albums, deleted_artists: ids of deleted items"""
+        changes = {'tracks': [], 'albums': [], 'artists': [], 'genres': [],
+                   'deleted_tracks': [], 'deleted_albums': [], 'deleted_artists': []}
+        lastscan = server.get_last_scan()
+        if lastscan is not None and str(lastscan) == self.get_meta('lastscan'):
+            #nothing changed on server since last sync
+            self.set_meta('synced_at', time.time())
+            return changes
+
+        #server can't filter tracks by update time: get compact listing of tracks stamps
+        try:
+            tracks_count = int(server.request('info total songs ?'))
+        except (TypeError, ValueError):
+            self.logger.error('Unable to get library totals')
+            return None
+        count, stamps, error = server.request_with_results('songs 0 %d tags:%s' % (tracks_count, self.STAMPS_TAGS))
+        if error:
+            self.logger.error('Unable to get tracks stamps')
+            return None
+
+        with self.__lock:
+            local_stamps = {}
+            for row in self.__db.execute('SELECT id, lastUpdated, album_id, artist_id FROM tracks'):
+                local_stamps[str(row[0])] = row
+
+        #new or updated tracks
+        changed_ids = []
+        server_ids = set()
+        for stamp in stamps:
+            id = stamp.get('id')
+            server_ids.add(id)
+            local = local_stamps.get(id)
+            if local is None or str(local[1]) != stamp.get('lastUpdated', ''):
+                changed_ids.append(id)
+        deleted_ids = [id for id in local_stamps if id not in server_ids]
+
+        commands = ['songinfo 0 100 track_id:%s tags:%s' % (id, self.TRACKS_TAGS) for id in changed_ids]
+        for (count, items, error) in self.__request_many(server, commands):
+            if error or not items:
+                self.logger.error('Unable to get changed track infos')
+                return None
+            changes['tracks'].append(items[0])
+        changes['deleted_tracks'] = deleted_ids
+
+        #albums and artists of changed or deleted tracks
+        album_ids = set()
+        artist_ids = set()
+        for track in changes['tracks']:
+            album_ids.add(track.get('album_id'))
+            artist_ids.add(track.get('artist_id'))
+        for id in deleted_ids:
+            album_ids.add(str(local_stamps[id][2]))
+            artist_ids.add(str(local_stamps[id][3]))
+        album_ids.discard(None)
+        artist_ids.discard(None)
+        album_ids = sorted(album_ids)
+        artist_ids = sorted(artist_ids)
+
+        commands = ['albums 0 1 album_id:%s tags:%s' % (id, self.ALBUMS_TAGS) for id in album_ids]
+        for id, (count, items, error) in zip(album_ids, self.__request_many(server, commands)):
+            if error:
+                self.logger.error('Unable to get changed album infos')
+                return None
+            if items:
+                changes['albums'].append(items[0])
+            else:
+                changes['deleted_albums'].append(id)
+
+        commands = ['artists 0 1 artist_id:%s tags:%s' % (id, self.ARTISTS_TAGS) for id in artist_ids]
+        for id, (count, items, error) in zip(artist_ids, self.__request_many(server, commands)):
+            if error:
+                self.logger.error('Unable to get changed artist infos')
+                return None
+            if items:
+                changes['artists'].append(items[0])
+            else:
+                changes['deleted_artists'].append(id)
+
+        #genres and years are small listings
+        count, genres, error1 = server.request_with_results('genres 0 %d tags:%s' % (tracks_count, self.GENRES_TAGS))
+        count, years, error2 = server.request_with_results('years 0 %d' % (tracks_count))
+        if error1 or error2:
+            self.logger.error('Unable to get genres or years')
+            return None
+        changes['genres'] = genres
+
+        with self.__lock:
+            try:
+                self.delete('tracks', changes['deleted_tracks'], commit=False)
+                self.delete('albums', changes['deleted_albums'], commit=False)
+                self.delete('artists', changes['deleted_artists'], commit=False)
+                self.insert('tracks', changes['tracks'], commit=False)
+                self.insert('albums', changes['albums'], commit=False)
+                self.insert('artists', changes['artists'], commit=False)
+                self.__db.execute('DELETE FROM genres')
+                self.insert('genres', genres, commit=False)
+                self.__db.execute('DELETE FROM years')
+                self.insert('years', years, commit=False)
+                self.set_meta('lastscan', lastscan, commit=False)
+                self.set_meta('synced_at', time.time(), commit=False)
+                self.__db.commit()
+            except Exception as e:
+                self.__db.rollback()
+                self.logger.error('Unable to store library changes: %s' % str(e))
+                return None
+        self.logger.debug('Library synced: %d tracks changed, %d deleted' % (len(changes['tracks']), len(deleted_ids)))
+        return changes
+
+    def __request_many(self, server, commands):
+        """send commands by pipelined batches, return list of results"""
+        results = []
+        for i in range(0, len(commands), self.PIPELINE_SIZE):
+            results += server.request_many_with_results(commands[i:i+self.PIPELINE_SIZE])
+        return results
+
+    def insert(self, table, items, commit=True):
+        """insert or replace items (dicts as returned by server) in table"""
+        columns = self.__columns(table)
+        self.insert_rows(table, [tuple([item.get(column) for column in columns]) for item in items], commit)
+
+    def insert_rows(self, table, rows, commit=True):
+        """insert or replace rows (tuples of table columns values) in table"""
+        columns = self.__columns(table)
+        query = 'INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (table, ', '.join(columns), ', '.join(['?'] * len(columns)))
+        with self.__lock:
+            self.__db.executemany(query, rows)
+            if commit:
+                self.__db.commit()
+
+    def delete(self, table, ids, commit=True):
+        """delete items from table"""
+        key = self.__columns(table)[0]
+        with self.__lock:
+            self.__db.executemany('DELETE FROM %s WHERE %s=?' % (table, key), [(id,) for id in ids])
+            if commit:
+                self.__db.commit()
+
+    def __columns(self, table):
+        """return table columns"""
+        return getattr(self, '%s_COLUMNS' % table.upper())
+
+    # queries
+
+    def select(self, query, params=()):
+        """return rows of query as dicts of strings (like server results)"""
+        with self.__lock:
+            rows = self.__db.execute(query, params).fetchall()
+        items = []
+        for row in rows:
+            item = {}
+            for key in row.keys():
+                if row[key] is not None:
+                    item[key] = str(row[key])
+            items.append(item)
+        return items
+
+    def get_items(self, table, ids):
+        """return items of table with specified ids (unknown ids are ignored)"""
+        key = self.__columns(table)[0]
+        items = []
+        #stay below sqlite variables limit
+        for i in range(0, len(ids), 500):
+            chunk = list(ids[i:i+500])
+            items += self.select('SELECT * FROM %s WHERE %s IN (%s)' % (table, key, ', '.join(['?'] * len(chunk))), chunk)
+        return items
+
+    def get_albums(self):
+        """return all albums"""
+        return self.select('SELECT * FROM albums ORDER BY textkey, album')
+
+    def get_album(self, id):
+        """return album infos"""
+        return self.select('SELECT * FROM albums WHERE id=?', (id,))
+
+    def get_album_songs(self, id):
+        """return all songs from specified album id"""
+        return self.select('SELECT * FROM tracks WHERE album_id=? ORDER BY disc, tracknum, title', (id,))
+
+    def get_artists(self):
+        """return all artists"""
+        return self.select('SELECT * FROM artists ORDER BY textkey, artist')
+
+    def get_artist(self, id):
+        """return artist infos"""
+        return self.select('SELECT * FROM artists WHERE id=?', (id,))
+
+    def get_artist_albums(self, id):
+        """return albums from specified artist id"""
+        return self.select('SELECT * FROM albums WHERE artist_id=:id OR id IN '
+                           '(SELECT DISTINCT album_id FROM tracks WHERE artist_id=:id) '
+                           'ORDER BY textkey, album', {'id': id})
+
+    def get_genres(self):
+        """return all genres"""
+        return self.select('SELECT * FROM genres ORDER BY textkey, genre')
+
+    def get_genre(self, id):
+        """return genre infos"""
+        return self.select('SELECT * FROM genres WHERE id=?', (id,))
+
+    def get_genre_albums(self, id):
+        """return albums from specified genre id"""
+        return self.select('SELECT * FROM albums WHERE id IN '
+                           '(SELECT DISTINCT album_id FROM tracks WHERE genre_id=?) '
+                           'ORDER BY textkey, album', (id,))
+
+    def get_years(self):
+        """return all years"""
+        return self.select('SELECT * FROM years ORDER BY year DESC')
+
+    def get_year_albums(self, id):
+        """return albums from specified year"""
+        return self.select('SELECT * FROM albums WHERE year=? ORDER BY textkey, album', (id,))
+
+    def get_song_infos(self, id):
+        """return full song infos (None if unknown)"""
+        items = self.select('SELECT * FROM tracks WHERE id=?', (id,))
+        if items:
+            return items[0]
+        return None
+
+    def get_song_infos_by_url(self, url):
+        """return full song infos (None if unknown)"""
+        items = self.select('SELECT * FROM tracks WHERE url=?', (url,))
+        if items:
+            return items[0]
+        return None
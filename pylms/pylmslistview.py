@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from .pylmscache import LRUCache
+import threading
+import logging
+import queue
+
+class LMSListView():
+    """Windowed access to a sorted library listing for virtualized lists
+    Items are fetched by fixed-size pages kept in a LRU cache. Pages following the
+    scroll direction are prefetched in background
+    View can be used as context manager to stop prefetching when done"""
+
+    DEFAULT_PAGE_SIZE = 100
+    DEFAULT_CACHE_PAGES = 50
+    #number of pages prefetched in scroll direction
+    PREFETCH_PAGES = 2
+    #delay (in seconds) after which idle prefetch thread ends
+    PREFETCH_IDLE_TIMEOUT = 5
+
+    def __init__(self, fetch, page_size=DEFAULT_PAGE_SIZE, cache_pages=DEFAULT_CACHE_PAGES, fetch_textkeys=None, local=False):
+        """constructor
+        fetch(start, count): return (total count, items) of listing, None if request failed
+        fetch_textkeys(): return textkeys of all listing items in order, None if request failed
+        local: fetch is cheap (listing already in memory), pages are neither cached nor prefetched"""
+        self.logger = logging.getLogger("LMSListView")
+        self.page_size = page_size
+        self.__fetch = fetch
+        self.__fetch_textkeys = fetch_textkeys
+        self.__local = local
+        self.__pages = None
+        if not local:
+            self.__pages = LRUCache(cache_pages)
+        self.__lock = threading.Lock()
+        self.__count = None
+        self.__textkeys = None
+        self.__last_page = None
+        self.__prefetch_queue = queue.Queue()
+        self.__prefetch_pending = set()
+        self.__prefetch_thread = None
+        self.__running = True
+
+    def __del__(self):
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __len__(self):
+        return self.get_count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            (start, stop, step) = index.indices(self.get_count())
+            return self.get_window(start, stop)[::step]
+        if index < 0:
+            index += self.get_count()
+        items = self.get_window(index, index + 1)
+        if not items:
+            raise IndexError('list view index out of range')
+        return items[0]
+
+    def get_count(self):
+        """return number of items of listing"""
+        if self.__count is None:
+            result = self.__fetch(0, 0)
+            if result is None:
+                return 0
+            self.__count = result[0]
+        return self.__count
+
+    def get_window(self, start, end):
+        """return items from position start to end (excluded)"""
+        start = max(0, start)
+        end = min(end, self.get_count())
+        if start >= end:
+            return []
+        first_page = start // self.page_size
+        last_page = (end - 1) // self.page_size
+        items = []
+        for page in range(first_page, last_page + 1):
+            page_items = self.__get_page(page)
+            if page_items is None:
+                break
+            items += page_items
+        offset = start - first_page * self.page_size
+        window = items[offset:offset + end - start]
+
+        #prefetch next pages in scroll direction
+        if self.__last_page is not None and first_page < self.__last_page:
+            pages = range(first_page - 1, first_page - 1 - self.PREFETCH_PAGES, -1)
+        else:
+            pages = range(last_page + 1, last_page + 1 + self.PREFETCH_PAGES)
+        self.__last_page = first_page
+        for page in pages:
+            self.__prefetch(page)
+        return window
+
+    def __get_page(self, page):
+        """return items of page (fetched if not cached), None if request failed"""
+        if self.__local:
+            result = self.__fetch(page * self.page_size, self.page_size)
+            return result[1] if result else None
+        items = self.__pages.get(page)
+        if items is None:
+            result = self.__fetch(page * self.page_size, self.page_size)
+            if result is None:
+                self.logger.error('Unable to get listing page %d' % page)
+                return None
+            (self.__count, items) = result
+            self.__pages.put(page, items)
+        return items
+
+    def __prefetch(self, page):
+        """queue page for background fetching"""
+        if self.__local or page < 0 or page * self.page_size >= self.get_count() or page in self.__pages:
+            return
+        with self.__lock:
+            if page in self.__prefetch_pending or not self.__running:
+                return
+            self.__prefetch_pending.add(page)
+            self.__prefetch_queue.put(page)
+            if not self.__prefetch_thread:
+                self.__prefetch_thread = threading.Thread(target=self.__prefetch_pages)
+                self.__prefetch_thread.daemon = True
+                self.__prefetch_thread.start()
+
+    def __prefetch_pages(self):
+        """prefetch thread (ends when idle so unused view can be released)"""
+        while self.__running:
+            try:
+                page = self.__prefetch_queue.get(timeout=self.PREFETCH_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self.__lock:
+                    if self.__prefetch_queue.empty():
+                        self.__prefetch_thread = None
+                        return
+                continue
+            if page is None:
+                break
+            if page not in self.__pages:
+                self.__get_page(page)
+            with self.__lock:
+                self.__prefetch_pending.discard(page)
+        with self.__lock:
+            self.__prefetch_thread = None
+
+    def is_prefetching(self):
+        """return True if background prefetching thread is running"""
+        return self.__prefetch_thread is not None
+
+    def stop(self):
+        """stop background prefetching"""
+        self.__running = False
+        self.__prefetch_queue.put(None)
+
+    def invalidate(self):
+        """forget cached pages, count and textkeys (listing changed)"""
+        if self.__pages is not None:
+            self.__pages.clear()
+        self.__count = None
+        self.__textkeys = None
+
+    # alphabetical jumps
+
+    def get_textkeys(self):
+        """return list of (textkey, position of first item with this textkey) in listing order"""
+        if self.__textkeys is None:
+            if not self.__fetch_textkeys:
+                return []
+            textkeys = self.__fetch_textkeys()
+            if textkeys is None:
+                return []
+            index = []
+            previous = None
+            for position, textkey in enumerate(textkeys):
+                if textkey != previous:
+                    index.append((textkey, position))
+                    previous = textkey
+            self.__textkeys = index
+        return self.__textkeys
+
+    def find_textkey(self, textkey):
+        """return position of first item with textkey (or with first following textkey), None if none"""
+        textkey = textkey.upper()
+        following = None
+        for key, position in self.get_textkeys():
+            if key is None:
+                continue
+            key = key.upper()
+            if key == textkey:
+                return position
+            if key > textkey and (following is None or key < following[0]):
+                following = (key, position)
+        if following:
+            return following[1]
+        return None
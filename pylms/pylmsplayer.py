@@ -23,31 +23,92 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+import time
+import threading
+
+def _lazy_info(name, doc):
+    """Build property loading player infos from server on first access"""
+    member = "_" + name
+
+    def getter(self):
+        if not self._infos_loaded:
+            self.load_infos()
+        return getattr(self, member)
+
+    def setter(self, value):
+        setattr(self, member, value)
+
+    return property(getter, setter, doc=doc)
+
+
 class Player(object):
     
     """
     Player
     """
+
+    __slots__ = (
+        "server", "logger", "index", "charset", "mac",
+        "_infos_loaded", "_name", "_uuid", "_model", "_ip_address", "_is_connected",
+        "_is_player", "_display_type", "_can_power_off",
+        "wifi_signal_strength", "mode", "time", "power_state", "ir_state", "muting",
+        "volume", "bass", "treble", "pitch", "rate", "mixing",
+        "track_genre", "track_artist", "track_album", "track_title", "track_duration",
+        "track_remote", "track_current_title", "track_path", "is_on",
+        "fire_and_forget", "coalescer", "clock_resync_interval", "_prefs", "_permissions",
+        "display_queue",
+        "_clock_position", "_clock_sampled_at", "_clock_mode", "_clock_rate", "_clock_retry_at",
+    )
     
+    #default delay (in seconds) after which local playback clock is resynced with server
+    CLOCK_RESYNC_INTERVAL = 10
+    #delay (in seconds) before retrying a failed playback clock resync
+    CLOCK_RETRY_DELAY = 2
+    #number of playlist tracks requested at once
+    PLAYLIST_PAGE_SIZE = 100
+    #mixer values bounds
+    MIXER_RANGES = {
+        "volume": (0, 100),
+        "bass": (-100, 100),
+        "treble": (-100, 100),
+        "pitch": (80, 120),
+        "rate": (-4, 4),
+    }
+
+    #player infos loaded on first access (all with a single request)
+    name = _lazy_info("name", "Player name")
+    uuid = _lazy_info("uuid", "Player UUID")
+    model = _lazy_info("model", "Player model")
+    ip_address = _lazy_info("ip_address", "Player IP address")
+    is_connected = _lazy_info("is_connected", "Player is connected to server")
+    is_player = _lazy_info("is_player", "Device is a player")
+    display_type = _lazy_info("display_type", "Player display type")
+    can_power_off = _lazy_info("can_power_off", "Player can be powered off")
+
     # internals
     
-    def __init__(self, server=None, index=None, update=True, charset="utf8"):
+    def __init__(self, server=None, index=None, update=True, charset="utf8", mac=None, infos=None):
         """
         Constructor
+        index: player index on server
+        mac: player id, used when index is not specified
+        infos: player infos as returned by LMSServer.get_players_infos (no request needed)
+        update: load player infos now instead of on first access
         """
         self.server = server
         self.logger = None
-        self.index = None
+        self.index = index
         self.charset = charset
-        self.mac = None
-        self.uuid = None
-        self.name = None
-        self.model = None
-        self.ip_address = None
-        self.is_connected = None
-        self.is_player = None
-        self.display_type = None
-        self.can_power_off = None
+        self.mac = mac
+        self._infos_loaded = False
+        self._uuid = None
+        self._name = None
+        self._model = None
+        self._ip_address = None
+        self._is_connected = None
+        self._is_player = None
+        self._display_type = None
+        self._can_power_off = None
         self.wifi_signal_strength = None        
         self.mode = None
         self.time = None
@@ -69,7 +130,21 @@ class Player(object):
         self.track_current_title = None
         self.track_path = None
         self.is_on = None
-        self.update(index, update=update)
+        self.fire_and_forget = False
+        self.coalescer = None
+        self._prefs = {}
+        self._permissions = {}
+        self.display_queue = None
+        self.clock_resync_interval = self.CLOCK_RESYNC_INTERVAL
+        self._clock_position = None
+        self._clock_sampled_at = None
+        self._clock_mode = None
+        self._clock_rate = None
+        self._clock_retry_at = None
+        if infos:
+            self.set_infos(infos)
+        elif update or self.mac is None:
+            self.update(index, update=update)
 
     def __repr__(self):
         return "Player: %s" % (self.mac)
@@ -78,40 +153,53 @@ class Player(object):
         """Executes Telnet Request via Server"""
         return self.server.request("%s %s" % (self.mac, command_string), not preserve_encoding)
     
-    def update(self, index, update=True):
-        """Update Player Properties from Server"""
-        self.index = index
-        self.mac = str(self.__unquote(
-            self.server.request("player id %i ?" % index)
-        ))        
-        self.name = str(self.__unquote(
-            self.server.request("player name %i ?" % index)
-        )) 
-        if update:
-            self.uuid = str(self.__unquote(
-                self.server.request("player uuid %i ?" % index)
-            ))
-            self.ip_address = str(self.__unquote(
-                self.server.request("player ip %i ?" % index)
-            ))    
-            self.model = str(self.__unquote(
-                self.server.request("player model %i ?" % index)
-            ))   
-            self.display_type = str(self.__unquote(
-                self.server.request("player displaytype %i ?" % index)
-            ))
-            self.can_power_off = bool(self.__unquote(
-                self.server.request("player canpoweroff %i ?" % index)
-            )) 
-            self.is_player = bool(self.__unquote(
-                self.server.request("player isplayer %i ?" % index)
-            )) 
-            self.is_connected = bool(self.__unquote(
-                self.server.request("player connected %i ?" % index)
-            )) 
-            self.is_on = bool(self.__unquote(
-                self.server.request("%s power ?" % self.mac)
-            )) 
+    def update(self, index=None, update=True):
+        """Update Player Properties from Server
+        All properties are loaded with a single request (update is kept for compatibility)"""
+        if index is not None:
+            self.index = index
+        return self.load_infos()
+
+    def load_infos(self):
+        """Load player infos (name, uuid, model...) from server
+        Return True if player was found on server"""
+        for infos in self.server.get_players_infos():
+            if self.mac:
+                found = (str(infos.get("playerid", "")).lower() == self.mac.lower())
+            else:
+                found = (str(infos.get("playerindex")) == str(self.index))
+            if found:
+                self.set_infos(infos)
+                #index uuid and name in server players registry
+                self.server.reindex_player(self)
+                return True
+        return False
+
+    def set_infos(self, infos):
+        """Set player infos from a players query item"""
+        if "playerindex" in infos:
+            self.index = int(infos["playerindex"])
+        if "playerid" in infos:
+            self.mac = str(infos["playerid"])
+        self._name = str(infos.get("name", ""))
+        self._uuid = str(infos.get("uuid", ""))
+        self._ip_address = str(infos.get("ip", ""))
+        self._model = str(infos.get("model", ""))
+        self._display_type = str(infos.get("displaytype", ""))
+        self._can_power_off = self.__flag(infos.get("canpoweroff"))
+        self._is_player = self.__flag(infos.get("isplayer"))
+        self._is_connected = self.__flag(infos.get("connected"))
+        if "power" in infos:
+            self.power_state = self.__flag(infos["power"])
+            self.is_on = self.power_state
+        self._infos_loaded = True
+
+    def __flag(self, value):
+        """Convert server flag ("0"/"1") to bool"""
+        try:
+            return int(value) != 0
+        except (TypeError, ValueError):
+            return False
 
 
     ## getters/setters
@@ -132,6 +220,8 @@ class Player(object):
         """Set Player Name"""
         self.request("name %s" % (name))
         self.update(self.index)
+        #player name is indexed by server
+        self.server.register_player(self)
     
     def get_ip_address(self):
         """Get Player IP Address"""
@@ -150,54 +240,137 @@ class Player(object):
         self.wifi_signal_strength = self.request("signalstrength ?")
         return self.wifi_signal_strength
 
-    def has_permission(self, request_terms):
-        """Check Player User Permissions"""
-        request_terms = self.__quote(request_terms)
-        granted = int(self.request("can %s ?" % (request_terms)))
-        return (granted == 1)
+    def has_permission(self, request_terms, cached=True):
+        """Check Player User Permissions
+        cached: use permissions cache (see load_permissions)"""
+        if cached and request_terms in self._permissions:
+            return self._permissions[request_terms]
+        return self.load_permissions([request_terms])[request_terms]
+
+    def load_permissions(self, requests_terms):
+        """Check Player User Permissions of many requests with a single round trip
+        Return dict request terms -> granted"""
+        commands = ["%s can %s ?" % (self.mac, self.__quote(terms)) for terms in requests_terms]
+        results = self.server.request_many(commands)
+        permissions = {}
+        for terms, granted in zip(requests_terms, results):
+            try:
+                permissions[terms] = (int(granted) == 1)
+            except (TypeError, ValueError):
+                permissions[terms] = False
+                continue
+            self._permissions[terms] = permissions[terms]
+        return permissions
+
+    def invalidate_permissions(self):
+        """Clear Player User Permissions cache"""
+        self._permissions = {}
     
-    def get_pref_value(self, name, namespace=None):
-        """Get Player Preference Value"""
-        pref_string = ""
-        if namespace:
-            pref_string += namespace + ":"
-        pref_string += name
-        value = self.request("playerpref %s ?" % (pref_string))
-        return value
+    def get_pref_value(self, name, namespace=None, cached=True):
+        """Get Player Preference Value
+        cached: use preferences cache (see load_prefs)"""
+        pref_string = self.__pref_string(name, namespace)
+        if cached and pref_string in self._prefs:
+            return self._prefs[pref_string]
+        return self.load_prefs([name], namespace)[name]
+
+    def load_prefs(self, names, namespace=None):
+        """Get Player Preferences Values of a namespace with a single round trip
+        Values are stored in preferences cache
+        Return dict name -> value"""
+        pref_strings = [self.__pref_string(name, namespace) for name in names]
+        commands = ["%s playerpref %s ?" % (self.mac, pref_string) for pref_string in pref_strings]
+        results = self.server.request_many(commands)
+        values = {}
+        for name, pref_string, value in zip(names, pref_strings, results):
+            values[name] = value
+            if value is not None:
+                self._prefs[pref_string] = value
+        return values
 
     def set_pref_value(self, name, value, namespace=None):
         """Set Player Preference Value"""
+        return self.set_pref_values({name: value}, namespace)[name]
+
+    def set_pref_values(self, values, namespace=None):
+        """Set Player Preferences Values of a namespace
+        All values are validated with a single round trip, then valid ones are set with another one
+        Return dict name -> value set"""
+        names = list(values.keys())
+        pref_strings = {}
+        quoted = {}
+        for name in names:
+            pref_strings[name] = self.__pref_string(name, namespace)
+            quoted[name] = self.__quote(str(values[name]))
+
+        commands = ["%s playerpref validate %s %s" % (self.mac, pref_strings[name], quoted[name]) for name in names]
+        results = self.server.request_many(commands)
+        valid_names = [name for name, valid in zip(names, results) if valid and "valid:1" in valid]
+
+        commands = ["%s playerpref %s %s" % (self.mac, pref_strings[name], quoted[name]) for name in valid_names]
+        results = self.server.request_many(commands)
+        done = dict([(name, False) for name in names])
+        for name, result in zip(valid_names, results):
+            if result is not None:
+                done[name] = True
+                self._prefs[pref_strings[name]] = str(values[name])
+            else:
+                #unknown value now
+                self._prefs.pop(pref_strings[name], None)
+        return done
+
+    def invalidate_prefs(self, name=None, namespace=None):
+        """Clear Player Preferences cache (only specified preference if name is given)"""
+        if name is None:
+            self._prefs = {}
+        else:
+            self._prefs.pop(self.__pref_string(name, namespace), None)
+
+    def __pref_string(self, name, namespace=None):
+        """Return preference reference"""
         pref_string = ""
         if namespace:
             pref_string += namespace + ":"
         pref_string += name
-        value = self.__quote(value)
-        valid = self.request("playerpref validate %s %s" % 
-            (pref_string, value))
-        if "valid:1" in valid:
-            self.request("playerpref %s %s" % (pref_string, value))
-            return True
-        else:
-            return False
+        return pref_string
     
     def get_mode(self):
         """Get Player Mode"""
         self.mode = str(self.request("mode ?"))
         return self.mode
     
-    def get_time_elapsed(self):
-        """Get Player Time Elapsed"""
-        try:
-            self.time = float(self.request("time ?"))
-        except TypeError:
-            self.time = float(0)
+    def get_time_elapsed(self, extrapolate=True):
+        """Get Player Time Elapsed
+        extrapolate: compute time from local playback clock instead of requesting server"""
+        if not extrapolate:
+            try:
+                self.time = float(self.request("time ?"))
+            except TypeError:
+                self.time = float(0)
+            return self.time
+
+        if self.clock_needs_sync():
+            self.sync_clock()
+        self.time = self._clock_position
+        if self._clock_mode == "play" and self._clock_sampled_at is not None:
+            self.time += (time.time() - self._clock_sampled_at) * self._clock_rate
+            if self.track_duration:
+                self.time = min(self.time, self.track_duration)
         return self.time
     
-    def get_time_remaining(self):
-        """Get Player Time Remaining"""
-        if self.get_mode() == "play":
-            remaining = self.get_track_duration() - self.get_time_elapsed()
-            return remaining
+    def get_time_remaining(self, extrapolate=True):
+        """Get Player Time Remaining
+        extrapolate: compute time from local playback clock instead of requesting server"""
+        if not extrapolate:
+            if self.get_mode() == "play":
+                remaining = self.get_track_duration() - self.get_time_elapsed(False)
+                return remaining
+            else:
+                return 0
+
+        elapsed = self.get_time_elapsed()
+        if self._clock_mode == "play" and self.track_duration:
+            return max(self.track_duration - elapsed, 0)
         else:
             return 0
     
@@ -209,8 +382,10 @@ class Player(object):
     
     def set_power_state(self, state):
         """Set Player Power State"""
-        self.request("power %i" % (int(state)))
-        self.get_power_state()    
+        state = bool(int(state))
+        self.__set("power %i" % (int(state)), 
+            {"power_state": state, "is_on": state}, self.get_power_state)
+        self.invalidate_clock()
 
     def get_ir_state(self):
         """Get Player Infrared State"""
@@ -220,8 +395,8 @@ class Player(object):
 
     def set_ir_state(self, state):
         """Set Player Power State"""
-        self.request("irenable %i" % (int(state)))
-        self.get_ir_state()   
+        state = bool(int(state))
+        self.__set("irenable %i" % (int(state)), {"ir_state": state}, self.get_ir_state)
                
     def get_volume(self):
         """Get Player Volume"""
@@ -261,8 +436,8 @@ class Player(object):
 
     def set_muting(self, state):
         """Set Player Muting Status"""
-        self.request("mixer muting %i" % (int(state)))
-        self.get_muting()
+        state = bool(int(state))
+        self.__set("mixer muting %i" % (int(state)), {"muting": state}, self.get_muting)
     
     def get_track_genre(self):
         """Get Players Current Track Genre"""
@@ -314,6 +489,117 @@ class Player(object):
         return self.is_on
 
     
+    # playback clock
+
+    def get_status(self, tags=""):
+        """Get Player Status (single request)
+        Return dict of status fields or None if request failed"""
+        command = "%s status - 1" % (self.mac)
+        if tags:
+            command += " tags:%s" % (tags)
+        count, items, error = self.server.request_with_results(command)
+        if error or not items:
+            return None
+        return items[0]
+
+    def sync_clock(self):
+        """Resync local playback clock with server"""
+        status = self.get_status()
+        if status is None:
+            #keep last sample and retry later (not on each time request)
+            self._clock_retry_at = time.time() + self.CLOCK_RETRY_DELAY
+            if self._clock_position is None:
+                self._clock_position = float(0)
+            return False
+        self.update_status(status)
+        return True
+
+    def invalidate_clock(self):
+        """Force local playback clock resync on next time request"""
+        self._clock_sampled_at = None
+        self._clock_retry_at = None
+
+    def clock_needs_sync(self):
+        """Return True if local playback clock must be resynced with server"""
+        if self._clock_retry_at is not None and time.time() < self._clock_retry_at:
+            #last resync failed
+            return False
+        if self._clock_sampled_at is None:
+            return True
+        if self.clock_resync_interval is None:
+            return False
+        return (time.time() - self._clock_sampled_at) >= self.clock_resync_interval
+
+    def update_status(self, status):
+        """Update player members and playback clock from status fields (as returned by get_status)"""
+        sampled_at = time.time()
+        if "mode" in status:
+            self.mode = str(status["mode"])
+        try:
+            self.time = float(status.get("time", 0))
+        except ValueError:
+            self.time = float(0)
+        try:
+            self.track_duration = float(status["duration"])
+        except (KeyError, ValueError):
+            self.track_duration = None
+        try:
+            rate = float(status.get("rate", 1))
+        except ValueError:
+            rate = float(1)
+        if "power" in status:
+            self.power_state = (status["power"] != "0")
+        if "mixer volume" in status:
+            try:
+                self.volume = int(status["mixer volume"])
+            except ValueError:
+                pass
+        self._clock_position = self.time
+        self._clock_mode = self.mode
+        self._clock_rate = rate
+        self._clock_sampled_at = sampled_at
+        self._clock_retry_at = None
+
+    def process_notification(self, items):
+        """Process server notification related to this player
+        items: unquoted notification items as sent by LMSServerNotifications"""
+        if len(items) < 2:
+            return
+        command = items[1]
+        if command in ("time", "pause", "play", "stop", "mode", "power"):
+            #playback position or state changed
+            self.invalidate_clock()
+        if command == "prefset" and len(items) > 4:
+            #00:04:20:12:47:33 prefset server volume 50
+            namespace = items[2]
+            if namespace == "server":
+                namespace = None
+            self._prefs[self.__pref_string(items[3], namespace)] = items[4]
+        elif command == "power" and len(items) > 2 and items[2] in ("0", "1"):
+            #confirm power state
+            self.power_state = (items[2] == "1")
+            self.is_on = self.power_state
+        elif command == "mixer" and len(items) > 3:
+            #confirm mixer value
+            name = items[2]
+            value = items[3]
+            try:
+                if name == "muting":
+                    self.muting = (int(value) != 0)
+                elif name in self.MIXER_RANGES:
+                    if value.startswith("+") or value.startswith("-"):
+                        #relative change
+                        value = self.__shift(name, int(value))
+                    else:
+                        value = int(value)
+                    if value is not None:
+                        setattr(self, name, value)
+            except ValueError:
+                pass
+        elif command == "playlist" and len(items) > 2:
+            if items[2] in ("newsong", "pause", "stop", "jump", "index", "clear", "loadtracks"):
+                self.invalidate_clock()
+
     # playlist
     
     def playlist_play(self, item):
@@ -358,8 +644,36 @@ class Player(object):
     
     def playlist_get_info(self):
         """Get info about the tracks in the current playlist"""
-        amount = self.playlist_track_count()
-        response = self.request('status 0 %i' % amount, True)
+        return list(self.iter_playlist())
+
+    def playlist_window(self, start=0, count=PLAYLIST_PAGE_SIZE, tags=None):
+        """Get info about count tracks of the current playlist from position start
+        tags: songinfo tags requested for each track (server defaults if not specified)
+        Return None if request failed"""
+        command = 'status %i %i' % (start, count)
+        if tags:
+            command += ' tags:%s' % (tags)
+        response = self.request(command, True)
+        if response is None:
+            return None
+        return self.__parse_playlist(response)
+
+    def iter_playlist(self, page_size=PLAYLIST_PAGE_SIZE, tags=None):
+        """Iterate over tracks of the current playlist, requesting server one page at a time
+        Raise IOError if a page request failed (instead of ending on a truncated playlist)"""
+        start = 0
+        while True:
+            window = self.playlist_window(start, page_size, tags)
+            if window is None:
+                raise IOError('Unable to get playlist tracks from position %d' % start)
+            for item in window:
+                yield item
+            if len(window) < page_size:
+                break
+            start += page_size
+
+    def __parse_playlist(self, response):
+        """Parse playlist items of a (not decoded) status response"""
         encoded_list = response.split('playlist%20index')[1:]
         playlist = []
         for encoded in encoded_list:
@@ -371,8 +685,10 @@ class Player(object):
                 if key:
                     item[key] = ':'.join(info)
             item['position'] = int(item['position'])
-            item['id'] = int(item['id'])
-            item['duration'] = float(item['duration'])
+            if 'id' in item:
+                item['id'] = int(item['id'])
+            if 'duration' in item:
+                item['duration'] = float(item['duration'])
             playlist.append(item)
         return playlist
     
@@ -392,7 +708,7 @@ class Player(object):
         line1, line2 = self.__quote(line1), self.__quote(line2)
         req_string = "show line1:%s line2:%s duration:%s "
         req_string += "brightness:%s font:%s centered:%i"
-        self.request(req_string % 
+        self.__display(req_string % 
                      (line1, line2, str(duration), str(brightness), font, int(centered)))
 
     def display(self, line1="",
@@ -400,36 +716,67 @@ class Player(object):
                       duration=3):
         line1, line2 = self.__quote(line1), self.__quote(line2)
         req_string = "display %s %s %s"
-        self.request(req_string % 
+        self.__display(req_string % 
                      (line1, line2, str(duration)))
 
+    def __display(self, command_string):
+        """Send display command (through display queue if enabled)"""
+        if self.display_queue:
+            self.display_queue.put(command_string)
+        else:
+            self.request(command_string)
+
+    def enable_display_queue(self, min_interval=None):
+        """Send display messages through a rate limited queue: messages not sent yet
+        are replaced by latest one and messages are sent without waiting server echo
+        min_interval: min delay (in seconds) between two messages"""
+        if not self.display_queue:
+            self.display_queue = DisplayQueue(self, min_interval)
+            self.display_queue.start()
+        elif min_interval is not None:
+            self.display_queue.min_interval = min_interval
+        return self.display_queue
+
+    def disable_display_queue(self):
+        """Stop display queue (pending message is dropped)"""
+        if self.display_queue:
+            self.display_queue.stop()
+            self.display_queue = None
+
     def play(self):
         """Play"""
         self.request("play")
+        self.invalidate_clock()
 
     def stop(self):
         """Stop"""
         self.request("stop")
+        self.invalidate_clock()
 
     def pause(self):
         """Pause On"""
         self.request("pause 1")
+        self.invalidate_clock()
 
     def unpause(self):
         """Pause Off"""
         self.request("pause 0")
+        self.invalidate_clock()
 
     def toggle(self):
         """Play/Pause Toggle"""
         self.request("pause")
+        self.invalidate_clock()
 
     def __next__(self):
         """Next Track"""
         self.request("playlist jump +1")
+        self.invalidate_clock()
 
     def prev(self):
         """Previous Track"""
         self.request("playlist jump -1")
+        self.invalidate_clock()
     
     def set_volume(self, volume):
         """Set Player Volume"""
@@ -439,7 +786,7 @@ class Player(object):
                 volume = 0
             if volume > 100: 
                 volume = 100
-            self.request("mixer volume %i" % (volume))
+            self.__set("mixer volume %i" % (volume), {"volume": volume})
         except TypeError:
             pass
 
@@ -451,21 +798,28 @@ class Player(object):
                 bass = -100
             if bass > 100: 
                 bass = 100
-            self.request("mixer bass %i" % (bass))
+            self.__set("mixer bass %i" % (bass), {"bass": bass})
         except TypeError:
             pass
 
     def bass_up(self, amount=5):
         """Increase Player Bass"""
-        self.request("mixer bass +%i" % (amount))
-        self.get_bass()
+        amount = int(amount)
+        if self.coalescer:
+            self.coalescer.adjust("bass", amount)
+            return
+        self.__set("mixer bass +%i" % (amount), 
+            {"bass": self.__shift("bass", amount)}, self.get_bass)
 
     def bass_down(self, amount=5):
         """Decrease Player Bass"""
         try:
             amount = int(amount)            
-            self.request("mixer bass -%i" % (amount))
-            self.get_bass()
+            if self.coalescer:
+                self.coalescer.adjust("bass", -amount)
+                return
+            self.__set("mixer bass -%i" % (amount), 
+                {"bass": self.__shift("bass", -amount)}, self.get_bass)
         except TypeError:
             pass
 
@@ -477,7 +831,7 @@ class Player(object):
                 treble = -100
             if treble > 100:
                 treble = 100
-            self.request("mixer treble %i" % (treble))
+            self.__set("mixer treble %i" % (treble), {"treble": treble})
         except TypeError:
             pass
 
@@ -485,8 +839,11 @@ class Player(object):
         """Increase Player Treble"""
         try:
             amount = int(amount)
-            self.request("mixer treble +%i" % (amount))
-            self.get_treble()
+            if self.coalescer:
+                self.coalescer.adjust("treble", amount)
+                return
+            self.__set("mixer treble +%i" % (amount), 
+                {"treble": self.__shift("treble", amount)}, self.get_treble)
         except TypeError:
             pass
 
@@ -494,8 +851,11 @@ class Player(object):
         """Decrease Player Treble"""
         try:
             amount = int(amount)
-            self.request("mixer treble -%i" % (amount))
-            self.get_treble()
+            if self.coalescer:
+                self.coalescer.adjust("treble", -amount)
+                return
+            self.__set("mixer treble -%i" % (amount), 
+                {"treble": self.__shift("treble", -amount)}, self.get_treble)
         except TypeError:
             pass
 
@@ -507,7 +867,7 @@ class Player(object):
                 pitch = 80
             if pitch > 120: 
                 pitch = 120
-            self.request("mixer pitch %i" % (pitch))
+            self.__set("mixer pitch %i" % (pitch), {"pitch": pitch})
         except TypeError:
             pass
 
@@ -515,8 +875,11 @@ class Player(object):
         """Increase Player Pitch"""
         try:
             amount = int(amount)        
-            self.request("mixer pitch +%i" % (amount))
-            self.get_pitch()
+            if self.coalescer:
+                self.coalescer.adjust("pitch", amount)
+                return
+            self.__set("mixer pitch +%i" % (amount), 
+                {"pitch": self.__shift("pitch", amount)}, self.get_pitch)
         except TypeError:
             pass
 
@@ -524,8 +887,11 @@ class Player(object):
         """Decrease Player Pitch"""
         try:
             amount = int(amount)  
-            self.request("mixer pitch -%i" % (amount))
-            self.get_pitch()
+            if self.coalescer:
+                self.coalescer.adjust("pitch", -amount)
+                return
+            self.__set("mixer pitch -%i" % (amount), 
+                {"pitch": self.__shift("pitch", -amount)}, self.get_pitch)
         except TypeError:
             pass
 
@@ -537,7 +903,7 @@ class Player(object):
                 rate = 4
             if rate > 4: 
                 rate = 4
-            self.request("mixer rate %i" % (rate))
+            self.__set("mixer rate %i" % (rate), {"rate": rate})
         except TypeError:
             pass
 
@@ -545,8 +911,11 @@ class Player(object):
         """Increase Player Rate"""
         try:
             amount = int(amount)
-            self.request("mixer rate +%i" % (amount))
-            self.get_rate()
+            if self.coalescer:
+                self.coalescer.adjust("rate", amount)
+                return
+            self.__set("mixer rate +%i" % (amount), 
+                {"rate": self.__shift("rate", amount)}, self.get_rate)
         except TypeError:
             pass
 
@@ -554,8 +923,11 @@ class Player(object):
         """Decrease Player Rate"""
         try:
             amount = int(amount)
-            self.request("mixer rate -%i" % (amount))
-            self.get_rate()
+            if self.coalescer:
+                self.coalescer.adjust("rate", -amount)
+                return
+            self.__set("mixer rate -%i" % (amount), 
+                {"rate": self.__shift("rate", -amount)}, self.get_rate)
         except TypeError:
             pass
 
@@ -563,8 +935,11 @@ class Player(object):
         """Increase Player Volume"""
         try:
             amount = int(amount)
-            self.request("mixer volume +%i" % (amount))
-            self.get_volume()
+            if self.coalescer:
+                self.coalescer.adjust("volume", amount)
+                return
+            self.__set("mixer volume +%i" % (amount), 
+                {"volume": self.__shift("volume", amount)}, self.get_volume)
         except TypeError:
             pass
 
@@ -572,8 +947,11 @@ class Player(object):
         """Decrease Player Volume"""
         try:
             amount = int(amount)            
-            self.request("mixer volume -%i" % (amount))
-            self.get_volume()
+            if self.coalescer:
+                self.coalescer.adjust("volume", -amount)
+                return
+            self.__set("mixer volume -%i" % (amount), 
+                {"volume": self.__shift("volume", -amount)}, self.get_volume)
         except TypeError:
             pass
     
@@ -590,6 +968,7 @@ class Player(object):
         try:
             seconds = int(seconds)
             self.request("time %s" % (seconds))
+            self.invalidate_clock()
         except TypeError:
             pass
         
@@ -597,7 +976,11 @@ class Player(object):
         """Seek Player Forward"""
         try:
             seconds = int(seconds)
+            if self.coalescer:
+                self.coalescer.adjust("time", seconds)
+                return
             self.request("time +%s" % (seconds))        
+            self.invalidate_clock()
         except TypeError:
             pass
 
@@ -605,7 +988,11 @@ class Player(object):
         """Seek Player Backwards"""
         try:
             seconds = int(seconds)
+            if self.coalescer:
+                self.coalescer.adjust("time", -seconds)
+                return
             self.request("time -%s" % (seconds))   
+            self.invalidate_clock()
         except TypeError:
             pass
 
@@ -627,11 +1014,84 @@ class Player(object):
 
     def on(self):
         """Switch player on"""
-        self.request("power 1")
+        self.__set("power 1", {"power_state": True, "is_on": True})
+        self.invalidate_clock()
 
     def off(self):
         """Switch player off"""
-        self.request("power 0")
+        self.__set("power 0", {"power_state": False, "is_on": False})
+        self.invalidate_clock()
+
+    def enable_coalescing(self, window=None, max_delay=None):
+        """Merge rapid relative adjustments (volume_up, forward...) into single commands
+        window: pause (in seconds) in adjustments after which they are sent
+        max_delay: max delay (in seconds) of first adjustment while adjustments keep coming"""
+        if not self.coalescer:
+            self.coalescer = CommandCoalescer(self, window, max_delay)
+        else:
+            if window is not None:
+                self.coalescer.window = window
+            if max_delay is not None:
+                self.coalescer.max_delay = max_delay
+        return self.coalescer
+
+    def disable_coalescing(self):
+        """Send pending adjustments and disable commands coalescing"""
+        if self.coalescer:
+            self.coalescer.flush()
+            self.coalescer = None
+
+    def set_fire_and_forget(self, state):
+        """Enable/disable fire and forget mode for setters
+        When enabled setters update members optimistically and return without waiting
+        for server reply. Members are rolled back if command fails"""
+        self.fire_and_forget = bool(state)
+        if not self.fire_and_forget:
+            #wait for queued commands
+            self.server.flush()
+
+    def _send(self, command_string):
+        """Send command, without waiting reply in fire and forget mode"""
+        if self.fire_and_forget:
+            return self.server.send("%s %s" % (self.mac, command_string))
+        else:
+            return self.request(command_string) is not None
+
+    def __set(self, command_string, values, getter=None):
+        """Send setter command
+        values: dict of members updated by command
+        getter: method reading value back from server (not used in fire and forget mode)"""
+        #unknown values (relative change of unknown member) are left untouched
+        values = dict([(name, value) for name, value in values.items() if value is not None])
+        if self.fire_and_forget:
+            previous = {}
+            for name in values:
+                previous[name] = getattr(self, name)
+                setattr(self, name, values[name])
+
+            def confirm(result):
+                if result is None:
+                    #command failed, rollback members not changed since
+                    for name in values:
+                        if getattr(self, name) == values[name]:
+                            setattr(self, name, previous[name])
+
+            self.server.send("%s %s" % (self.mac, command_string), confirm)
+        else:
+            result = self.request(command_string)
+            if getter:
+                getter()
+            elif result is not None:
+                for name in values:
+                    setattr(self, name, values[name])
+
+    def __shift(self, name, amount):
+        """Return mixer member value shifted by amount (None if value is unknown)"""
+        value = getattr(self, name)
+        if value is None:
+            return None
+        (minimum, maximum) = self.MIXER_RANGES[name]
+        return max(minimum, min(maximum, value + amount))
         
     def __quote(self, text):
         try:
@@ -648,3 +1108,302 @@ class Player(object):
         except ImportError:
             import urllib.request, urllib.parse, urllib.error
             return urllib.parse.unquote(text)
+
+
+
+class CommandCoalescer(object):
+
+    """
+    Merge consecutive relative adjustments of a player control (volume, bass, seek...)
+    into a single absolute command sent once adjustments pause for a short window
+    """
+
+    #default merge window (in seconds)
+    DEFAULT_WINDOW = 0.2
+    #default max delay (in seconds) of first merged adjustment while adjustments keep coming
+    DEFAULT_MAX_DELAY = 1.0
+    #control -> command prefix
+    COMMANDS = {
+        "volume": "mixer volume",
+        "bass": "mixer bass",
+        "treble": "mixer treble",
+        "pitch": "mixer pitch",
+        "rate": "mixer rate",
+        "time": "time",
+    }
+
+    def __init__(self, player, window=None, max_delay=None):
+        """
+        Constructor
+        """
+        self.player = player
+        self.window = window
+        if self.window is None:
+            self.window = self.DEFAULT_WINDOW
+        self.max_delay = max_delay
+        if self.max_delay is None:
+            self.max_delay = self.DEFAULT_MAX_DELAY
+        self.__lock = threading.RLock()
+        self.__timer = None
+        self.__first_adjusted_at = None
+        #control -> [absolute target or None, accumulated relative amount]
+        self.__pending = {}
+        #metrics
+        self.adjustments = 0
+        self.coalesced = 0
+        self.commands = 0
+
+    def adjust(self, control, amount):
+        """Queue relative adjustment of control
+        Player member is updated immediately when its current value is known"""
+        if control not in self.COMMANDS:
+            raise ValueError('Unsupported control "%s"' % control)
+        with self.__lock:
+            self.adjustments += 1
+            if control not in self.__pending:
+                target = None
+                if control in Player.MIXER_RANGES:
+                    target = getattr(self.player, control)
+                self.__pending[control] = [target, 0]
+            else:
+                self.coalesced += 1
+            pending = self.__pending[control]
+            if pending[0] is not None:
+                #clamp at each step like server does
+                (minimum, maximum) = Player.MIXER_RANGES[control]
+                pending[0] = max(minimum, min(maximum, pending[0] + amount))
+                setattr(self.player, control, pending[0])
+            else:
+                pending[1] += amount
+
+            #restart window at each adjustment (but don't delay first one more than max delay)
+            now = time.time()
+            if self.__timer is None:
+                self.__first_adjusted_at = now
+            else:
+                self.__timer.cancel()
+            delay = max(0, min(self.window, self.__first_adjusted_at + self.max_delay - now))
+            self.__timer = threading.Timer(delay, self.flush)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def flush(self):
+        """Send pending adjustments now"""
+        with self.__lock:
+            if self.__timer:
+                self.__timer.cancel()
+                self.__timer = None
+            pending = self.__pending
+            self.__pending = {}
+
+            for control in pending:
+                (target, amount) = pending[control]
+                prefix = self.COMMANDS[control]
+                if control == "time":
+                    #seek from current (extrapolated) position
+                    target = max(0, int(self.player.get_time_elapsed() + amount))
+                    self.player._send("%s %i" % (prefix, target))
+                    self.player.invalidate_clock()
+                elif target is not None:
+                    self.player._send("%s %i" % (prefix, target))
+                elif amount != 0:
+                    #current value unknown, send merged relative command
+                    self.player._send("%s %+i" % (prefix, amount))
+                else:
+                    continue
+                self.commands += 1
+
+    def get_metrics(self):
+        """Return coalescing metrics"""
+        with self.__lock:
+            return {
+                "adjustments": self.adjustments,
+                "commands": self.commands,
+                "coalesced": self.coalesced,
+                "pending": len(self.__pending),
+            }
+
+
+
+class DisplayQueue(threading.Thread):
+
+    """
+    Send display messages to a player at a bounded rate
+    A message not sent yet is replaced by the latest one and messages are sent
+    without waiting for server echo
+    """
+
+    #default min delay (in seconds) between two messages
+    DEFAULT_MIN_INTERVAL = 0.5
+
+    def __init__(self, player, min_interval=None):
+        """
+        Constructor
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.player = player
+        self.min_interval = min_interval
+        if self.min_interval is None:
+            self.min_interval = self.DEFAULT_MIN_INTERVAL
+        self.__running = True
+        self.__condition = threading.Condition()
+        self.__message = None
+        self.__last_sent = 0
+        #metrics
+        self.sent = 0
+        self.replaced = 0
+
+    def put(self, command_string):
+        """Queue display command, replacing message not sent yet"""
+        with self.__condition:
+            if self.__message is not None:
+                self.replaced += 1
+            self.__message = command_string
+            self.__condition.notify()
+
+    def stop(self):
+        """stop process"""
+        with self.__condition:
+            self.__running = False
+            self.__message = None
+            self.__condition.notify()
+
+    def run(self):
+        """process"""
+        while True:
+            with self.__condition:
+                while self.__running and self.__message is None:
+                    self.__condition.wait()
+                if not self.__running:
+                    break
+                #rate limit (new messages just replace pending one meanwhile)
+                delay = self.__last_sent + self.min_interval - time.time()
+                while self.__running and delay > 0:
+                    self.__condition.wait(delay)
+                    delay = self.__last_sent + self.min_interval - time.time()
+                if not self.__running:
+                    break
+                message = self.__message
+                self.__message = None
+                self.__last_sent = time.time()
+
+            if self.player.server.send("%s %s" % (self.player.mac, message)):
+                self.sent += 1
+            with self.__condition:
+                drained = self.__message is None
+            if drained:
+                #no message waiting: read echoes of sent messages
+                self.player.server.flush()
+
+        #read echoes left
+        self.player.server.flush()
+
+
+
+class PlayerGroup(object):
+
+    """
+    Group of players controlled at once: commands are pipelined to server
+    and all acknowledgements are collected in a single pass
+    """
+
+    def __init__(self, players):
+        """
+        Constructor
+        """
+        self.players = list(players)
+
+    def __repr__(self):
+        return "PlayerGroup: %s" % (", ".join([str(player.mac) for player in self.players]))
+
+    def request(self, command_string):
+        """Send Same Command To All Players
+        Return dict player mac -> result (None if command failed)"""
+        results = {}
+        #players may be attached to different servers
+        servers = []
+        for player in self.players:
+            for server, server_players in servers:
+                if server is player.server:
+                    server_players.append(player)
+                    break
+            else:
+                servers.append((player.server, [player]))
+
+        for server, server_players in servers:
+            commands = ["%s %s" % (player.mac, command_string) for player in server_players]
+            responses = server.request_many(commands)
+            for player, response in zip(server_players, responses):
+                results[player.mac] = response
+        return results
+
+    def __apply(self, command_string, attribute=None, value=None, invalidate_clock=False):
+        """Send command and update acknowledged players locally
+        Return dict player mac -> acknowledged"""
+        results = self.request(command_string)
+        acks = {}
+        for player in self.players:
+            acked = (results.get(player.mac) is not None)
+            acks[player.mac] = acked
+            if acked:
+                if attribute:
+                    setattr(player, attribute, value)
+                if invalidate_clock:
+                    player.invalidate_clock()
+        return acks
+
+    def play(self):
+        """Play"""
+        return self.__apply("play", invalidate_clock=True)
+
+    def stop(self):
+        """Stop"""
+        return self.__apply("stop", invalidate_clock=True)
+
+    def pause(self):
+        """Pause On"""
+        return self.__apply("pause 1", invalidate_clock=True)
+
+    def unpause(self):
+        """Pause Off"""
+        return self.__apply("pause 0", invalidate_clock=True)
+
+    def on(self):
+        """Switch players on"""
+        return self.set_power_state(True)
+
+    def off(self):
+        """Switch players off"""
+        return self.set_power_state(False)
+
+    def set_power_state(self, state):
+        """Set Players Power State"""
+        state = bool(int(state))
+        acks = self.__apply("power %i" % (int(state)), "power_state", state, True)
+        for player in self.players:
+            if acks[player.mac]:
+                player.is_on = state
+        return acks
+
+    def set_muting(self, state):
+        """Set Players Muting Status"""
+        state = bool(int(state))
+        return self.__apply("mixer muting %i" % (int(state)), "muting", state)
+
+    def mute(self):
+        """Mute Players"""
+        return self.set_muting(True)
+
+    def unmute(self):
+        """Unmute Players"""
+        return self.set_muting(False)
+
+    def set_volume(self, volume):
+        """Set Players Volume"""
+        volume = int(volume)
+        if volume < 0:
+            volume = 0
+        if volume > 100:
+            volume = 100
+        return self.__apply("mixer volume %i" % (volume), "volume", volume)
@@ -37,9 +37,10 @@ class LMSPlaylist(LMSServerNotifications):
     FILTER_TIMEOUT = 10 #in ms
     ALLOWED_COMMANDS = ['playlist', 'power', 'play', 'pause']
 
-    def __init__(self, library, hostname='localhost', port=9090, username='', password='', charset='utf8'):
-        """init"""
-        LMSServerNotifications.__init__(self, self._callback, hostname, port, username, password, charset)
+    def __init__(self, library, hostname='localhost', port=9090, username='', password='', charset='utf8', registry=None):
+        """init
+        registry: LMSServer whose players receive notifications"""
+        LMSServerNotifications.__init__(self, self._callback, hostname, port, username, password, charset, registry)
         self.logger = logging.getLogger("LMSPlaylist")
 
         #objects
@@ -96,6 +97,11 @@ class LMSPlaylist(LMSServerNotifications):
         self.logger.debug('-->_process_response %s' % str(items))
 
         try:
+            if items[0]=='rescan':
+                #rescan done
+                self.library.process_notification(items)
+                return None
+
             #filter response
             if self.__filterByResponse(items[1]):
                 #don't process response
@@ -219,24 +225,39 @@ class LMSPlaylist(LMSServerNotifications):
             current_song = 0
         self.logger.debug('current_song=%d' % current_song)
         
-        #get songs infos one by one
+        #get playlist songs ids and urls
         self.logger.debug('player_id=%s' % player_id)
-        for i in range(count):
+        tracks = []
+        response = self.__server.request('%s status 0 %d tags:u' % (player_id, count), False)
+        for encoded in (response or '').split('playlist%20index')[1:]:
+            track = {}
+            for info in encoded.split(' '):
+                (key, sep, value) = urllib.parse.unquote(info).partition(':')
+                if key in ('id', 'url'):
+                    track[key] = value
             try:
-                count, url, error = self.__server.request_with_results('%s playlist path %d ?' % (player_id, i))
-                if not error:
-                    url = '%s%s' % ('file:',url[0]['file'])
-                    #self.logger.debug('url=%s' % url)
-                    song = self.library.get_song_infos_by_url(url)
-                    #add current song info
-                    if i==current_song:
-                        song.update({'current':True})
-                    else:
-                        song.update({'current':False})
-                    playlist.append( song )
-            except Exception as e:
+                tracks.append((int(track['id']), track.get('url')))
+            except (KeyError, ValueError):
+                tracks.append((None, track.get('url')))
+
+        #get songs infos at once
+        songs = self.library.get_songs_infos([id for id, url in tracks if id is not None])
+        for i, (id, url) in enumerate(tracks):
+            song = songs.get(id)
+            if song is None and url:
+                #remote tracks (negative ids) are not resolved by id
+                song = self.library.get_song_infos_by_url(url)
+            if song is None:
                 #problem during song infos retrieving
-                self.logger.error('Unable to get song infos: %s' % str(e))
+                self.logger.error('Unable to get song infos of track %s' % (id if id is not None else url))
+                continue
+            #same song can be queued several times
+            song = dict(song)
+            if i==current_song:
+                song.update({'current':True})
+            else:
+                song.update({'current':False})
+            playlist.append( song )
         
         return playlist
         
@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+ 
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+ 
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import threading
+import logging
+import time
+
+class LMSPoller(threading.Thread):
+    """
+    Poll status of many players with batched (pipelined) status requests.
+    Poll interval adapts to each player state and subscribers only receive changed fields.
+    """
+
+    #poll intervals (in seconds) according to player state
+    INTERVAL_PLAYING = 1.0
+    INTERVAL_PAUSED = 5.0
+    INTERVAL_STOPPED = 10.0
+    INTERVAL_OFF = 30.0
+    INTERVAL_DISCONNECTED = 60.0
+
+    def __init__(self, server, players=None, max_requests_per_second=10, player_min_interval=0.5, tags=''):
+        """
+        Constructor
+        server: LMSServer used to send status requests
+        players: list of players to poll
+        max_requests_per_second: aggregate status requests budget
+        player_min_interval: a player is never polled more often than this delay (in seconds)
+        tags: songinfo tags of current song requested in status
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.logger = logging.getLogger("LMSPoller")
+
+        #members
+        self.server = server
+        self.max_requests_per_second = max_requests_per_second
+        self.player_min_interval = player_min_interval
+        self.tags = tags
+        self.intervals = {
+            'play': self.INTERVAL_PLAYING,
+            'pause': self.INTERVAL_PAUSED,
+            'stop': self.INTERVAL_STOPPED,
+            'off': self.INTERVAL_OFF,
+            'disconnected': self.INTERVAL_DISCONNECTED,
+        }
+        self.__running = True
+        self.__lock = threading.RLock()
+        self.__players = {}
+        self.__next_poll = {}
+        self.__last_poll = {}
+        self.__last_status = {}
+        self.__subscribers = []
+        self.__tokens = float(max_requests_per_second)
+        self.__tokens_updated = time.time()
+        self.__wakeup = threading.Event()
+        for player in players or []:
+            self.add_player(player)
+
+    def stop(self):
+        """stop process"""
+        self.__running = False
+        self.__wakeup.set()
+
+    def add_player(self, player):
+        """poll specified player (immediately)"""
+        with self.__lock:
+            self.__players[player.mac] = player
+            self.__next_poll[player.mac] = 0
+        self.__wakeup.set()
+
+    def remove_player(self, player):
+        """stop polling specified player"""
+        with self.__lock:
+            self.__players.pop(player.mac, None)
+            self.__next_poll.pop(player.mac, None)
+            self.__last_poll.pop(player.mac, None)
+            self.__last_status.pop(player.mac, None)
+
+    def subscribe(self, callback):
+        """callback(player, changed_fields) is called each time player status changes"""
+        with self.__lock:
+            if callback not in self.__subscribers:
+                self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """remove subscriber"""
+        with self.__lock:
+            if callback in self.__subscribers:
+                self.__subscribers.remove(callback)
+
+    def set_interval(self, state, interval):
+        """set poll interval (in seconds) for state (play, pause, stop, off or disconnected)"""
+        if state not in self.intervals:
+            raise ValueError('Unknown player state "%s"' % state)
+        self.intervals[state] = interval
+        self.__wakeup.set()
+
+    def poll(self):
+        """poll players due now (limited by requests budget)
+        return number of polled players"""
+        now = time.time()
+        with self.__lock:
+            #refill requests budget
+            self.__tokens = min(float(self.max_requests_per_second),
+                self.__tokens + (now - self.__tokens_updated) * self.max_requests_per_second)
+            self.__tokens_updated = now
+
+            due = [mac for mac in self.__next_poll if self.__next_poll[mac] <= now]
+            due.sort(key=lambda mac: self.__next_poll[mac])
+            due = due[:int(self.__tokens)]
+            if not due:
+                return 0
+            self.__tokens -= len(due)
+            players = [self.__players[mac] for mac in due]
+
+        #single round trip for all due players
+        commands = []
+        for player in players:
+            command = '%s status - 1' % player.mac
+            if self.tags:
+                command += ' tags:%s' % self.tags
+            commands.append(command)
+        results = self.server.request_many_with_results(commands)
+
+        for player, (count, items, error) in zip(players, results):
+            status = None
+            if not error and items:
+                status = items[0]
+            self.__process_status(player, status, now)
+        return len(players)
+
+    def next_poll_delay(self):
+        """return delay (in seconds) before next player poll"""
+        with self.__lock:
+            if not self.__next_poll:
+                return None
+            delay = min(self.__next_poll.values()) - time.time()
+            if self.__tokens < 1:
+                #wait for budget
+                delay = max(delay, (1 - self.__tokens) / self.max_requests_per_second)
+            return max(delay, 0)
+
+    def __process_status(self, player, status, now):
+        """store status, schedule next poll and notify subscribers"""
+        if status is None:
+            state = 'disconnected'
+            status = {}
+        else:
+            player.update_status(status)
+            state = self.__get_state(status)
+
+        with self.__lock:
+            if player.mac not in self.__players:
+                #player removed meanwhile
+                return
+            interval = max(self.intervals[state], self.player_min_interval)
+            self.__last_poll[player.mac] = now
+            self.__next_poll[player.mac] = now + interval
+
+            previous = self.__last_status.get(player.mac, {})
+            changed = {}
+            for key in status:
+                if previous.get(key) != status[key]:
+                    changed[key] = status[key]
+            for key in previous:
+                if key not in status:
+                    changed[key] = None
+            self.__last_status[player.mac] = status
+            subscribers = list(self.__subscribers)
+
+        if changed:
+            for callback in subscribers:
+                try:
+                    callback(player, changed)
+                except Exception as e:
+                    self.logger.error('Exception in subscriber: %s' % str(e))
+
+    def __get_state(self, status):
+        """return player state from status fields"""
+        if status.get('player_connected', '1') == '0':
+            return 'disconnected'
+        if status.get('power', '1') == '0':
+            return 'off'
+        mode = status.get('mode', 'stop')
+        if mode in ('play', 'pause'):
+            return mode
+        return 'stop'
+
+    def run(self):
+        """process"""
+        while self.__running:
+            try:
+                self.poll()
+            except Exception as e:
+                self.logger.error('Exception during poll: %s' % str(e))
+            delay = self.next_poll_delay()
+            if delay is None:
+                delay = 1
+            self.__wakeup.wait(min(max(delay, 0.05), 1))
+            self.__wakeup.clear()
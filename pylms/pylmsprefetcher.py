@@ -0,0 +1,146 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from .pylmsserver import LMSServer
+from .pylmscache import LRUCache
+from collections import deque
+import threading
+import logging
+import time
+
+class LMSPrefetcher(threading.Thread):
+    """Speculatively run browse requests in background on a dedicated server connection
+    Requests are rate limited (budget) and pending ones are cancelled when new hints arrive,
+    results are kept in a LRU cache until used"""
+
+    #max number of requests per second
+    DEFAULT_BUDGET = 4
+    #max number of pending requests (following hints are dropped)
+    MAX_PENDING = 8
+    #number of cached results
+    CACHE_SIZE = 100
+
+    def __init__(self, hostname='localhost', port=9090, username='', password='', charset='utf-8', budget=DEFAULT_BUDGET):
+        """constructor
+        budget: max number of requests per second"""
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.logger = logging.getLogger("LMSPrefetcher")
+
+        #members
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.charset = charset
+        self.budget = budget
+        self.cache = LRUCache(self.CACHE_SIZE)
+        self.__server = None
+        self.__pending = deque()
+        self.__condition = threading.Condition()
+        self.__running = True
+        self.__last_request = 0
+        self.__stats = {'requested': 0, 'cancelled': 0, 'used': 0}
+
+    def prefetch(self, commands, cancel=True):
+        """queue commands to run in background
+        cancel: drop pending commands first (user moved to another item)"""
+        with self.__condition:
+            if cancel:
+                self.__stats['cancelled'] += len(self.__pending)
+                self.__pending.clear()
+            for command in commands:
+                if command in self.cache or command in self.__pending:
+                    continue
+                if len(self.__pending) >= self.MAX_PENDING:
+                    #hints are ordered by likelihood: drop the last ones
+                    self.__stats['cancelled'] += 1
+                    continue
+                self.__pending.append(command)
+            self.__condition.notify()
+
+    def cancel(self):
+        """drop pending commands"""
+        with self.__condition:
+            self.__stats['cancelled'] += len(self.__pending)
+            self.__pending.clear()
+
+    def get(self, command):
+        """return prefetched result (count, items, error) of command, None if not prefetched"""
+        result = self.cache.get(command)
+        if result is not None:
+            self.__stats['used'] += 1
+        return result
+
+    def invalidate(self, album_ids=None):
+        """drop prefetched results (library changed)
+        album_ids: only drop results of these albums"""
+        if album_ids is None:
+            self.cache.clear()
+            return
+        album_tags = set(['album_id:%s' % id for id in album_ids])
+        for command in self.cache.keys():
+            if album_tags.intersection(command.split(' ')):
+                self.cache.invalidate(command)
+
+    def get_stats(self):
+        """return prefetch statistics (requested, cancelled, used, cache hits and misses)"""
+        stats = dict(self.__stats)
+        cache_stats = self.cache.get_stats()
+        stats['hits'] = cache_stats['hits']
+        stats['misses'] = cache_stats['misses']
+        return stats
+
+    def stop(self):
+        """stop process"""
+        with self.__condition:
+            self.__running = False
+            self.__pending.clear()
+            self.__condition.notify()
+
+    def run(self):
+        """process"""
+        while True:
+            with self.__condition:
+                while self.__running and not self.__pending:
+                    self.__condition.wait()
+                if not self.__running:
+                    break
+                #respect budget
+                delay = self.__last_request + 1.0 / self.budget - time.time()
+                if delay > 0:
+                    self.__condition.wait(delay)
+                    continue
+                command = self.__pending.popleft()
+
+            if not self.__server:
+                self.__server = LMSServer(self.hostname, self.port, self.username, self.password, self.charset)
+                self.__server.connect(update=False)
+            self.__last_request = time.time()
+            self.__stats['requested'] += 1
+            result = self.__server.request_with_results(command)
+            if not result[2]:
+                self.cache.put(command, result)
+
+        if self.__server:
+            self.__server.disconnect()
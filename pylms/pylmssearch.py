@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import bisect
+import heapq
+import threading
+import unicodedata
+import re
+
+class LMSSearchIndex():
+    """In-process inverted index over artists, albums and tracks names
+    Supports prefix, infix (trigrams) and diacritic insensitive matching"""
+
+    #entity kinds with their ranking weight
+    KINDS = {'artist': 3, 'album': 2, 'track': 1}
+    #scores of a query word match
+    SCORE_EXACT = 30
+    SCORE_PREFIX = 20
+    SCORE_INFIX = 10
+    #max number of index tokens a single query word can expand to
+    MAX_EXPANSIONS = 300
+    #max number of entities ranked for a single word query (bounds short queries cost)
+    MAX_CANDIDATES = 2000
+
+    __SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+    def __init__(self):
+        """constructor"""
+        self.__lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """empty index"""
+        with self.__lock:
+            #(kind, id) -> (name, normalized name)
+            self.__names = {}
+            #token -> set of (kind, id)
+            self.__postings = {}
+            #sorted tokens (prefix lookups)
+            self.__tokens = []
+            #trigram -> set of tokens (infix lookups)
+            self.__trigrams = {}
+
+    def __len__(self):
+        return len(self.__names)
+
+    def normalize(self, text):
+        """return text lowered without diacritics nor punctuation"""
+        text = unicodedata.normalize('NFKD', str(text))
+        text = ''.join([c for c in text if not unicodedata.combining(c)])
+        return self.__SEPARATORS.sub(' ', text.casefold()).strip()
+
+    def build(self, artists=None, albums=None, tracks=None):
+        """(re)build index from library listings (dicts with id and artist/album/title fields)"""
+        with self.__lock:
+            self.clear()
+            for kind, items, field in (('artist', artists, 'artist'), ('album', albums, 'album'), ('track', tracks, 'title')):
+                for item in items or []:
+                    if 'id' in item and item.get(field):
+                        self.__add(kind, item['id'], item[field], False)
+            self.__tokens = sorted(self.__postings.keys())
+
+    def add(self, kind, id, name):
+        """add (or update) entity in index"""
+        with self.__lock:
+            self.remove(kind, id)
+            self.__add(kind, id, name, True)
+
+    def remove(self, kind, id):
+        """remove entity from index"""
+        key = (kind, str(id))
+        with self.__lock:
+            names = self.__names.pop(key, None)
+            if names is None:
+                return
+            for token in set(names[1].split()):
+                postings = self.__postings.get(token)
+                if postings is None:
+                    continue
+                postings.discard(key)
+                if not postings:
+                    #token not used anymore
+                    del self.__postings[token]
+                    i = bisect.bisect_left(self.__tokens, token)
+                    if i < len(self.__tokens) and self.__tokens[i] == token:
+                        del self.__tokens[i]
+                    for trigram in self.__get_trigrams(token):
+                        tokens = self.__trigrams.get(trigram)
+                        if tokens is not None:
+                            tokens.discard(token)
+                            if not tokens:
+                                del self.__trigrams[trigram]
+
+    def __add(self, kind, id, name, keep_sorted):
+        """add entity in index"""
+        if kind not in self.KINDS:
+            raise ValueError('Unsupported kind "%s"' % kind)
+        key = (kind, str(id))
+        normalized_name = self.normalize(name)
+        self.__names[key] = (name, normalized_name)
+        for token in set(normalized_name.split()):
+            postings = self.__postings.get(token)
+            if postings is None:
+                postings = self.__postings[token] = set()
+                if keep_sorted:
+                    bisect.insort(self.__tokens, token)
+                for trigram in self.__get_trigrams(token):
+                    self.__trigrams.setdefault(trigram, set()).add(token)
+            postings.add(key)
+
+    def __get_trigrams(self, token):
+        """return trigrams of token"""
+        return set([token[i:i+3] for i in range(len(token) - 2)])
+
+    def __expand(self, word):
+        """return dict index token -> match score for query word"""
+        matches = {}
+        #prefix matches (exact one included)
+        i = bisect.bisect_left(self.__tokens, word)
+        while i < len(self.__tokens) and len(matches) < self.MAX_EXPANSIONS:
+            token = self.__tokens[i]
+            if not token.startswith(word):
+                break
+            matches[token] = self.SCORE_EXACT if token == word else self.SCORE_PREFIX
+            i += 1
+
+        #infix matches
+        if len(word) >= 3 and len(matches) < self.MAX_EXPANSIONS:
+            candidates = None
+            for trigram in sorted(self.__get_trigrams(word), key=lambda t: len(self.__trigrams.get(t, ()))):
+                tokens = self.__trigrams.get(trigram)
+                if not tokens:
+                    candidates = set()
+                    break
+                candidates = set(tokens) if candidates is None else candidates & tokens
+                if not candidates:
+                    break
+            for token in candidates or ():
+                if token not in matches and word in token:
+                    matches[token] = self.SCORE_INFIX
+                    if len(matches) >= self.MAX_EXPANSIONS:
+                        break
+        return matches
+
+    def search(self, term, limit=50, kinds=None):
+        """search term in index
+        kinds: restrict search to these entity kinds
+        return ranked list of dicts (type, id, name, score)"""
+        words = self.normalize(term).split()
+        if not words:
+            return []
+
+        with self.__lock:
+            #rarest word first: its matches bound the candidates of following words
+            expansions = [self.__expand(word) for word in set(words)]
+            expansions.sort(key=lambda tokens: sum([len(self.__postings[token]) for token in tokens]))
+
+            #entity -> score, all words must match
+            scores = None
+            for tokens in expansions:
+                word_scores = {}
+                #best matches first
+                for token, score in sorted(tokens.items(), key=lambda item: item[1], reverse=True):
+                    postings = self.__postings[token]
+                    if scores is not None:
+                        #only keep entities matched by previous words
+                        if len(postings) < len(scores):
+                            postings = [key for key in postings if key in scores]
+                        else:
+                            postings = [key for key in scores if key in postings]
+                    for key in postings:
+                        if kinds and key[0] not in kinds:
+                            continue
+                        if word_scores.get(key, 0) < score:
+                            word_scores[key] = score
+                    if len(expansions) == 1 and len(word_scores) >= self.MAX_CANDIDATES:
+                        break
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = dict([(key, scores[key] + word_scores[key]) for key in word_scores])
+                if not scores:
+                    return []
+
+            normalized_term = ' '.join(words)
+            results = []
+            for key, score in scores.items():
+                (kind, id) = key
+                (name, normalized_name) = self.__names[key]
+                if normalized_name == normalized_term:
+                    score += self.SCORE_EXACT
+                elif normalized_name.startswith(normalized_term):
+                    score += self.SCORE_PREFIX
+                score += self.KINDS[kind]
+                results.append((-score, len(name), name, kind, id))
+
+        results = heapq.nsmallest(limit, results)
+        return [{'type': kind, 'id': id, 'name': name, 'score': -score} for (score, length, name, kind, id) in results]
@@ -26,10 +26,11 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 import telnetlib
 import urllib.request, urllib.parse, urllib.error
-from pylmsplayer import Player
+from .pylmsplayer import Player
 import threading
 import logging
 import time
+import collections
 
 class LMSServer(object):
 
@@ -37,6 +38,9 @@ class LMSServer(object):
     LMS Server access to perform some requests
     """
 
+    #max number of players returned by players enumeration
+    PLAYERS_QUERY_LIMIT = 1000
+
     def __init__(self, hostname="localhost", port=9090, 
                        username="", password="",
                        charset="utf-8"):
@@ -55,6 +59,14 @@ class LMSServer(object):
         self.player_count = 0
         self.players = []
         self.charset = charset
+        self._lock = threading.RLock()
+        self._pending = collections.deque()
+        #players registry (also updated from notifications thread)
+        self.__registry_lock = threading.RLock()
+        self.__players_by_mac = {}
+        self.__players_by_uuid = {}
+        self.__players_by_name = {}
+        self.__players_by_name_part = {}
 
     def __del__(self):
         """
@@ -139,77 +151,180 @@ class LMSServer(object):
         """
         Request
         command_string : command to send
-        preserver_encoding : preserve encoding in result
+        decode_output : unquote result items (see _parse_response)
         timeout : unblock telnet command after specified seconds
         """
-        try:
-            #connect if necessary
-            if not self.telnet:
-                if not self.connect():
-                    #failed to connect
-                    raise Exception('Unable to connect')
-
-            #process command line
-            self.logger.debug('command="%s"' % command)
-            command = command.strip()
-            command_len = len( command.strip().split(' ') )
-            if command.endswith('?'):
-                command_len -= 1
-            command_encoded = (command.strip()).encode(self.charset)
-
-            #send command
-            self.telnet.write( command_encoded + '\n'.encode(self.charset) )
-            response = self.telnet.read_until( '\n'.encode(self.charset) )
-            response = response.strip()
-            self.logger.debug('response="%s"' % response)
-            self.logger.debug('response="%s"' % response.decode())
-
-            #process response
-            response_parts = response.decode(self.charset).split(' ')
-            response_len = len(response.decode(self.charset).split(' '))
-            self.logger.debug('command_parts=%d' % command_len)
-            self.logger.debug('response_parts=%d' % response_len)
-        
-            #process result
-            result = ''
-            for i in range(command_len, response_len):
-                self.logger.debug(self._decode(response_parts[i]))
-                if decode_output:
-                    result += self._decode(response_parts[i]) + ' '
-                else:
-                    result += str(response_parts[i]) + ' '
-            result = result.strip()
-            self.logger.debug('result="%s"' % result)
-        
-        except EOFError:
-            #telnet failed (not connected?)
-            self.logger('EOFError: telnet failed')
-            self.telnet = None #force to reconnect next time
-            result = None
-
-        except Exception as e:
-            #something failed
-            self.logger.error(str(e))
-            result = None
-
+        return self.request_many([command], decode_output)[0]
+
+    def request_many(self, commands, decode_output=True):
+        """
+        Pipelined requests
+        commands : list of commands sent back to back before reading any response
+        decode_output : decode results
+        Return list of results in commands order (None for failed command)
+        """
+        results = [None] * len(commands)
+        if not commands:
+            return results
+        with self._lock:
+            unread = 0
+            try:
+                #connect if necessary
+                if not self.telnet:
+                    if not self.connect():
+                        #failed to connect
+                        raise Exception('Unable to connect')
+
+                #replies of fire and forget commands come first
+                self.flush()
+
+                #send all commands at once
+                commands = [command.strip() for command in commands]
+                payload = ''
+                for command in commands:
+                    self.logger.debug('command="%s"' % command)
+                    payload += command + '\n'
+                self.telnet.write( payload.encode(self.charset) )
+                unread = len(commands)
+
+                #then collect responses (server answers in commands order)
+                for i in range(len(commands)):
+                    response = self.telnet.read_until( '\n'.encode(self.charset) )
+                    unread -= 1
+                    results[i] = self._parse_response(commands[i], response, decode_output)
+
+            except EOFError:
+                #telnet failed (not connected?)
+                self.logger.error('EOFError: telnet failed')
+                self.telnet = None #force to reconnect next time
+
+            except Exception as e:
+                #something failed
+                self.logger.error(str(e))
+
+            finally:
+                if unread and self.telnet:
+                    #responses left in socket would be returned to next requests
+                    self.logger.error('%d responses left unread: reset connection' % unread)
+                    self.telnet.close()
+                    self.telnet = None #force to reconnect next time
+
+        return results
+
+    def send(self, command, callback=None, decode_output=True):
+        """
+        Fire and forget request: send command without waiting for its response
+        Response is read during next request (or explicit flush) and given to callback
+        (None if command failed)
+        Return True if command was sent
+        """
+        with self._lock:
+            try:
+                #connect if necessary
+                if not self.telnet:
+                    if not self.connect():
+                        #failed to connect
+                        raise Exception('Unable to connect')
+
+                command = command.strip()
+                self.logger.debug('command="%s" (no wait)' % command)
+                self.telnet.write( (command + '\n').encode(self.charset) )
+                self._pending.append((command, callback, decode_output))
+                return True
+
+            except Exception as e:
+                #something failed
+                self.logger.error(str(e))
+                self.telnet = None #force to reconnect next time
+                if callback:
+                    callback(None)
+                return False
+
+    def flush(self):
+        """
+        Read responses of all fire and forget commands and run their callbacks
+        """
+        with self._lock:
+            while self._pending:
+                (command, callback, decode_output) = self._pending.popleft()
+                result = None
+                try:
+                    if self.telnet:
+                        response = self.telnet.read_until( '\n'.encode(self.charset) )
+                        result = self._parse_response(command, response, decode_output)
+                except EOFError:
+                    #telnet failed (not connected?)
+                    self.logger.error('EOFError: telnet failed')
+                    self.telnet = None #force to reconnect next time
+                except Exception as e:
+                    #something failed
+                    self.logger.error(str(e))
+                if callback:
+                    try:
+                        callback(result)
+                    except Exception as e:
+                        self.logger.error('Exception in send callback: %s' % str(e))
+
+    def _parse_response(self, command, response, decode_output=True):
+        """
+        Strip command echo from response
+        decode_output : unquote result items (True), keep them quoted (False) or keep raw bytes (None)
+        Return result string (bytes if decode_output is None)
+        """
+        #process command line
+        command_len = len( command.strip().split(' ') )
+        if command.endswith('?'):
+            command_len -= 1
+
+        #split echo from result, result items are only processed if needed
+        response_parts = response.strip().split(b' ', command_len)
+        result = response_parts[command_len].strip() if len(response_parts) > command_len else b''
+        if decode_output is None:
+            return result
+        result = result.decode(self.charset)
+        if decode_output:
+            result = ' '.join([self._decode(part) for part in result.split(' ')]).strip()
+        self.logger.debug('result="%s"', result)
         return result
-        
+
+    def request_raw(self, command):
+        """
+        Request without any processing of result (ie to parse it in another process)
+        Return result bytes without command echo (None if command failed)
+        """
+        return self.request(command, None)
 
     def request_with_results(self, command):
         """
         Request with results
         Return tuple (count, results, error_occured)
         """
+        #request command without decoding output
+        return self.parse_results(self.request(command, False))
+
+    def request_many_with_results(self, commands):
+        """
+        Pipelined requests with results
+        Return list of tuples (count, results, error_occured) in commands order
+        """
+        return [self.parse_results(response) for response in self.request_many(commands, False)]
+
+    def parse_results(self, response):
+        """
+        Parse not decoded response of a request with results
+        Return tuple (count, results, error_occured)
+        """
         count = 0
         items = []
         try:
-            #request command without decoding output
-            response = self.request(command, False)
             response_parts = response.split(' ')
             if response.startswith('count'):
                 self.logger.debug('count response')
                 #get number of items
                 count = int(self._decode(response_parts[0]).split(':',1)[1])
+                if len(response_parts)==1:
+                    #no item
+                    return count, [], False
 
                 #get items separator
                 separator = self._decode(response_parts[1]).split(':',1)[0]
@@ -241,7 +356,7 @@ class LMSServer(object):
 
         except Exception as e:
             #error parsing results (not correct?)
-            self.logger.error('Exception occured in request_with_results: %s' % str(e))
+            self.logger.error('Exception occured in parse_results: %s' % str(e))
             return 0,[],True
 
         return count, items, False
@@ -249,29 +364,170 @@ class LMSServer(object):
     def get_players(self, update=True):
         """
         Get Players
-        """
-        self.players = []
-        player_count = self.get_player_count()
-        for i in range(player_count):
-            player = Player(server=self, index=i-1, update=update)
-            self.players.append(player)
-        return self.players
+        Enumerate players on server (single request) and refresh players registry
+        """
+        players_infos = self.get_players_infos()
+        with self.__registry_lock:
+            players = []
+            for infos in players_infos:
+                mac = self._normalize_player_ref(infos.get('playerid'))
+                player = self.__players_by_mac.get(mac)
+                if player:
+                    #keep same player instance
+                    player.set_infos(infos)
+                else:
+                    player = Player(server=self, update=False, infos=infos)
+                players.append(player)
+
+            #rebuild registry
+            self.players = players
+            self.__players_by_mac = {}
+            self.__players_by_uuid = {}
+            self.__players_by_name = {}
+            self.__players_by_name_part = {}
+            for player in players:
+                self.register_player(player)
+            return self.players
+
+    def get_players_infos(self):
+        """
+        Get infos (id, uuid, ip, name, model...) of all players with a single request
+        Return list of dicts
+        """
+        count, items, error = self.request_with_results('players 0 %d' % self.PLAYERS_QUERY_LIMIT)
+        if error or not count:
+            return []
+        self.player_count = count
+        return items
 
     def get_player(self, ref):
         """
         Get Player
+        ref: player mac, uuid or (part of) name
+        Lookup is performed on players registry, server is only requested if registry is empty
         """
-        ref = str(ref).lower()
+        ref = self._normalize_player_ref(ref)
         self.logger.debug('ref="%s"' % ref)
         if ref:
-            for player in self.get_players():
-                player_name = str(player.name).lower()
-                player_mac = str(player.mac).lower()
-                self.logger.debug('compare %s==%s or in %s' % (ref, player_mac, player_name))
-                if ref==player_mac or ref in player_name:
-                    return player
+            if not self.__players_by_mac:
+                self.get_players()
+
+            with self.__registry_lock:
+                players = self.__players_by_name_part.get(ref)
+                return self.__players_by_mac.get(ref) or \
+                       self.__players_by_uuid.get(ref) or \
+                       self.__players_by_name.get(ref) or \
+                       (players[0] if players else None)
         return None
 
+    def __name_parts(self, name):
+        """
+        Return all parts of player name
+        """
+        return set([name[start:end] for start in range(len(name)) for end in range(start + 1, len(name) + 1)])
+
+    def register_player(self, player):
+        """
+        Add (or reindex) player in players registry
+        Player uuid and name are only indexed once its infos are loaded (see reindex_player)
+        """
+        mac = self._normalize_player_ref(player.mac)
+        if not mac:
+            return
+        with self.__registry_lock:
+            #drop previous references of this player
+            self.unregister_player(mac)
+
+            self.__players_by_mac[mac] = player
+            #don't trigger lazy loading of player infos
+            uuid = self._normalize_player_ref(player._uuid)
+            if uuid and uuid!='none':
+                self.__players_by_uuid[uuid] = player
+            name = self._normalize_player_ref(player._name)
+            if name and name not in self.__players_by_name:
+                self.__players_by_name[name] = player
+                #first registered player wins
+                for part in self.__name_parts(name):
+                    self.__players_by_name_part.setdefault(part, []).append(player)
+            if player not in self.players:
+                self.players.append(player)
+
+    def reindex_player(self, player):
+        """
+        Reindex player uuid and name (ie after its infos were loaded)
+        Nothing is done if player is not registered
+        """
+        with self.__registry_lock:
+            if self.__players_by_mac.get(self._normalize_player_ref(player.mac)) is player:
+                self.register_player(player)
+
+    def unregister_player(self, mac):
+        """
+        Remove player from players registry
+        Return removed player or None
+        """
+        mac = self._normalize_player_ref(mac)
+        with self.__registry_lock:
+            player = self.__players_by_mac.pop(mac, None)
+            if player:
+                for key in [key for key, value in self.__players_by_uuid.items() if value is player]:
+                    del self.__players_by_uuid[key]
+                for name in [key for key, value in self.__players_by_name.items() if value is player]:
+                    del self.__players_by_name[name]
+                    #only drop parts of this player name
+                    for part in self.__name_parts(name):
+                        players = self.__players_by_name_part[part]
+                        players.remove(player)
+                        if not players:
+                            del self.__players_by_name_part[part]
+                if player in self.players:
+                    self.players.remove(player)
+            return player
+
+    def process_notification(self, items):
+        """
+        Update players registry and players from a notification
+        items: unquoted notification items as sent by LMSServerNotifications
+        """
+        if len(items) < 2:
+            return
+        mac = self._normalize_player_ref(items[0])
+        with self.__registry_lock:
+            player = self.__players_by_mac.get(mac)
+
+            if items[1]=='client' and len(items) > 2:
+                #192.168.1.1 client [new|disconnect|reconnect|forget]
+                if items[2]=='forget':
+                    self.unregister_player(mac)
+                    player = None
+                elif items[2]=='disconnect':
+                    if player:
+                        player.is_connected = False
+                elif items[2] in ('new', 'reconnect'):
+                    if player:
+                        player.is_connected = True
+                    else:
+                        #only indexed by mac until its infos are loaded
+                        player = Player(server=self, update=False, mac=items[0])
+                        player.is_connected = True
+                        self.register_player(player)
+
+            elif items[1]=='name' and len(items) > 2 and player:
+                #player renamed
+                player.name = items[2]
+                self.register_player(player)
+
+        if player:
+            player.process_notification(items)
+
+    def _normalize_player_ref(self, ref):
+        """
+        Normalize player reference (mac, uuid, name) for registry lookups
+        """
+        if ref is None:
+            return ''
+        return str(ref).strip().lower()
+
     def get_version(self):
         """
         Get Version
@@ -279,6 +535,18 @@ class LMSServer(object):
         self.version = self.request("version ?")
         return self.version
     
+    def get_last_scan(self):
+        """
+        Get timestamp of last library scan (None if unknown)
+        """
+        count, items, error = self.request_with_results("serverstatus 0 0")
+        if error or not items:
+            return None
+        try:
+            return int(items[0]['lastscan'])
+        except (KeyError, ValueError):
+            return None
+
     def get_player_count(self):
         """
         Get Number Of Players
@@ -333,8 +601,9 @@ class LMSServerNotifications(threading.Thread, LMSServer):
     """
     Class that catch LMS server notifications to create events on some server actions
     """
-    def __init__(self, notifications_callback, hostname="localhost", port=9090, username="", password="", charset="utf-8"):
-        """constructor"""
+    def __init__(self, notifications_callback, hostname="localhost", port=9090, username="", password="", charset="utf-8", registry=None):
+        """constructor
+        registry: LMSServer whose players receive notifications (see set_registry)"""
         LMSServer.__init__(self, hostname, port, username, password, charset)
         threading.Thread.__init__(self)
         self.logger = logging.getLogger("LMSServerNotifications")
@@ -343,6 +612,7 @@ class LMSServerNotifications(threading.Thread, LMSServer):
         self.__running = True
         self._player_ids = []
         self._callback = notifications_callback
+        self._registry = registry
         
     def __del__(self):
         """Destructor"""
@@ -364,6 +634,20 @@ class LMSServerNotifications(threading.Thread, LMSServer):
         else:
             self._player_ids = []
 
+    def set_registry(self, server):
+        """route notifications to players registry of server (the one owning players),
+           so players resync their clock and update their cached state"""
+        self._registry = server
+
+    def _route_response(self, items):
+        """give notification to players registry"""
+        if not self._registry:
+            return
+        try:
+            self._registry.process_notification(items)
+        except Exception as e:
+            self.logger.error('Exception in players registry: %s' % str(e))
+
     def _process_response(self, items):
         """process response received by lmsserver
            this function can be overwriten to process some other stuff"""
@@ -386,11 +670,14 @@ class LMSServerNotifications(threading.Thread, LMSServer):
                     #self.logger.debug('RAW=%s' % response.strip())
                     
                     #split response
-                    items = response.split(' ')
+                    items = response.decode(self.charset).strip().split(' ')
                     #and unquote all items
                     for i in range(len(items)):
                         items[i] = urllib.parse.unquote(items[i].strip())
 
+                    #update players first so callbacks see their new state
+                    self._route_response(items)
+
                     #finally process response
                     if self._player_ids:
                         if items[0] in self._player_ids:
@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from array import array
+import logging
+import struct
+import sys
+import os
+
+class LMSLibrarySnapshot():
+    """Compact binary snapshot of library listings
+    File layout (little endian):
+        header: magic, version, last scan (length-prefixed utf-8)
+        string table: count, byte length, utf-8 strings separated by NUL
+        tables: count, then for each table
+            name and columns (length-prefixed utf-8), rows count,
+            one uint32 column of string table indexes per column (0 for absent value, strings are indexed from 1)"""
+
+    MAGIC = b'PYLMSSNP'
+    VERSION = 1
+    SEPARATOR = '\x00'
+
+    def __init__(self, path):
+        """constructor"""
+        self.logger = logging.getLogger("LibrarySnapshot")
+        self.path = path
+
+    def __write_string(self, f, value):
+        data = value.encode('utf-8')
+        f.write(struct.pack('<I', len(data)))
+        f.write(data)
+
+    def __read_string(self, f):
+        (length,) = struct.unpack('<I', f.read(4))
+        return f.read(length).decode('utf-8')
+
+    def __write_array(self, f, values):
+        if sys.byteorder != 'little':
+            values.byteswap()
+        values.tofile(f)
+
+    def __read_array(self, f, count):
+        values = array('I')
+        values.fromfile(f, count)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    def save(self, lastscan, tables):
+        """write snapshot
+        lastscan: server last scan stamp the listings belong to
+        tables: dict table name -> list of items (dicts of strings)"""
+        strings = {}
+        encoded_tables = []
+        for name, items in tables.items():
+            columns = []
+            for item in items:
+                for key in item:
+                    if key not in columns:
+                        columns.append(key)
+            encoded_columns = []
+            for column in columns:
+                indexes = array('I')
+                for item in items:
+                    value = item.get(column)
+                    if value is None:
+                        indexes.append(0)
+                    else:
+                        value = str(value)
+                        index = strings.get(value)
+                        if index is None:
+                            index = strings[value] = len(strings) + 1
+                        indexes.append(index)
+                encoded_columns.append(indexes)
+            encoded_tables.append((name, columns, len(items), encoded_columns))
+
+        blob = self.SEPARATOR.join(strings.keys()).encode('utf-8')
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<I', self.VERSION))
+            self.__write_string(f, str(lastscan))
+            f.write(struct.pack('<II', len(strings), len(blob)))
+            f.write(blob)
+            f.write(struct.pack('<I', len(encoded_tables)))
+            for name, columns, count, encoded_columns in encoded_tables:
+                self.__write_string(f, name)
+                self.__write_string(f, self.SEPARATOR.join(columns))
+                f.write(struct.pack('<II', len(columns), count))
+                for indexes in encoded_columns:
+                    self.__write_array(f, indexes)
+        #replace previous snapshot only when complete
+        os.replace(temp_path, self.path)
+
+    def get_last_scan(self):
+        """return last scan stamp of snapshot (None if no valid snapshot)"""
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(self.MAGIC))!=self.MAGIC or struct.unpack('<I', f.read(4))[0]!=self.VERSION:
+                    return None
+                return self.__read_string(f)
+        except (IOError, OSError, struct.error, UnicodeDecodeError):
+            return None
+
+    def load(self, lastscan=None):
+        """read snapshot
+        lastscan: expected last scan stamp (snapshot is rejected if different)
+        return dict table name -> list of items, None if snapshot is missing, invalid or outdated"""
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(self.MAGIC))!=self.MAGIC or struct.unpack('<I', f.read(4))[0]!=self.VERSION:
+                    self.logger.error('Invalid snapshot file %s' % self.path)
+                    return None
+                snapshot_lastscan = self.__read_string(f)
+                if lastscan is not None and snapshot_lastscan!=str(lastscan):
+                    self.logger.debug('Snapshot is outdated')
+                    return None
+                (strings_count, blob_length) = struct.unpack('<II', f.read(8))
+                strings = f.read(blob_length).decode('utf-8').split(self.SEPARATOR) if strings_count else []
+                if len(strings)!=strings_count:
+                    self.logger.error('Corrupted snapshot file %s' % self.path)
+                    return None
+                #index 0 stands for absent value
+                lookup = ([None] + strings).__getitem__
+
+                tables = {}
+                (tables_count,) = struct.unpack('<I', f.read(4))
+                for i in range(tables_count):
+                    name = self.__read_string(f)
+                    columns = self.__read_string(f).split(self.SEPARATOR)
+                    (columns_count, count) = struct.unpack('<II', f.read(8))
+                    if not columns_count:
+                        columns = []
+                    indexes = [self.__read_array(f, count) for column in columns]
+                    values = [list(map(lookup, column_indexes)) for column_indexes in indexes]
+                    items = [dict(zip(columns, row)) for row in zip(*values)] if columns else [{} for j in range(count)]
+                    for column, column_indexes in zip(columns, indexes):
+                        if 0 in column_indexes:
+                            #drop absent values
+                            for item in items:
+                                if item[column] is None:
+                                    del item[column]
+                    tables[name] = items
+                return tables
+        except (IOError, OSError, EOFError, struct.error, UnicodeDecodeError, IndexError) as e:
+            self.logger.error('Unable to load snapshot: %s' % str(e))
+            return None
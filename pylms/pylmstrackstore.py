@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+PyLMS: Python Wrapper for Logitech Media Server CLI (Telnet) Interface
+
+Copyright (C) 2013 Tang <tanguy [dot] bonneau [at] gmail [dot] com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from array import array
+import bisect
+import logging
+import struct
+import mmap
+import sys
+import os
+
+class LMSTrackStore():
+    """On-disk columnar tracks store shared between processes through mmap
+    Tracks are sorted by id. Numeric fields are stored in fixed-width columns, text fields in
+    string heaps indexed by offsets columns. Columns are read in place (no deserialization)
+    File layout (native byte order):
+        header: magic, version, byte order, tracks count, sections count
+        sections directory: name, offset, size of each section
+        sections (8 bytes aligned)"""
+
+    MAGIC = b'PYLMSTRK'
+    VERSION = 1
+    HEADER = '<8sIIII'
+    SECTION = '<16sQQ'
+    #fixed-width columns with their array typecode (missing values are stored as 0)
+    COLUMNS = [('id', 'I'), ('album_id', 'I'), ('artist_id', 'I'), ('genre_id', 'I'), ('year', 'H'), ('duration', 'f')]
+    #text columns stored in string heaps
+    STRINGS = ['title', 'album', 'artist', 'genre', 'url']
+    #tracks positions sorted by these columns (then by position)
+    ORDERS = ['album_id', 'artist_id']
+
+    def __init__(self, path):
+        """constructor"""
+        self.logger = logging.getLogger("TrackStore")
+        self.path = path
+        self.__file = None
+        self.__mmap = None
+        self.__view = None
+        self.__sections = {}
+        self.count = 0
+        self.lastscan = None
+
+    # writing
+
+    def write(self, tracks, lastscan=None):
+        """write store from tracks infos (dicts as returned by server)
+        File is replaced atomically: opened readers keep previous version until reopened"""
+        sortable = []
+        for track in tracks:
+            try:
+                sortable.append((int(track['id']), track))
+            except (KeyError, TypeError, ValueError):
+                continue
+        sortable.sort(key=lambda item: item[0])
+        tracks = [track for id, track in sortable]
+
+        sections = []
+        for name, typecode in self.COLUMNS:
+            values = array(typecode)
+            for track in tracks:
+                try:
+                    values.append(self.__number(typecode, track.get(name)))
+                except OverflowError:
+                    values.append(0)
+            sections.append((name, values.tobytes()))
+        for name in self.STRINGS:
+            offsets = array('Q', [0])
+            heap = bytearray()
+            for track in tracks:
+                heap += str(track.get(name) or '').encode('utf-8')
+                offsets.append(len(heap))
+            sections.append(('%s.offsets' % name, offsets.tobytes()))
+            sections.append(('%s.heap' % name, bytes(heap)))
+        for name in self.ORDERS:
+            keys = [self.__number('I', track.get(name)) for track in tracks]
+            order = array('I', sorted(range(len(tracks)), key=keys.__getitem__))
+            sections.append(('%s.order' % name, order.tobytes()))
+        sections.append(('lastscan', str(lastscan if lastscan is not None else '').encode('utf-8')))
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(struct.pack(self.HEADER, self.MAGIC, self.VERSION, self.__byteorder(), len(tracks), len(sections)))
+            offset = self.__align(struct.calcsize(self.HEADER) + struct.calcsize(self.SECTION) * len(sections))
+            for name, data in sections:
+                f.write(struct.pack(self.SECTION, name.encode('ascii'), offset, len(data)))
+                offset = self.__align(offset + len(data))
+            for name, data in sections:
+                f.seek(self.__align(f.tell()))
+                f.write(data)
+        os.replace(temp_path, self.path)
+
+    def __number(self, typecode, value):
+        """return value converted for column of typecode"""
+        try:
+            if typecode=='f':
+                return float(value)
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            return 0
+
+    def __align(self, offset):
+        return (offset + 7) & ~7
+
+    def __byteorder(self):
+        return 1 if sys.byteorder=='little' else 2
+
+    # reading
+
+    def open(self):
+        """map store file, return True if succeed"""
+        self.close()
+        try:
+            self.__file = open(self.path, 'rb')
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError) as e:
+            self.logger.error('Unable to open track store: %s' % str(e))
+            self.close()
+            return False
+
+        header_size = struct.calcsize(self.HEADER)
+        (magic, version, byteorder, count, sections_count) = struct.unpack_from(self.HEADER, self.__mmap, 0)
+        if magic!=self.MAGIC or version!=self.VERSION or byteorder!=self.__byteorder():
+            self.logger.error('Unsupported track store file %s' % self.path)
+            self.close()
+            return False
+        self.__view = memoryview(self.__mmap)
+        for i in range(sections_count):
+            (name, offset, size) = struct.unpack_from(self.SECTION, self.__mmap, header_size + i * struct.calcsize(self.SECTION))
+            self.__sections[name.rstrip(b'\x00').decode('ascii')] = self.__view[offset:offset+size]
+        for name, typecode in self.COLUMNS:
+            self.__sections[name] = self.__sections[name].cast(typecode)
+        for name in self.STRINGS:
+            self.__sections['%s.offsets' % name] = self.__sections['%s.offsets' % name].cast('Q')
+        for name in self.ORDERS:
+            self.__sections['%s.order' % name] = self.__sections['%s.order' % name].cast('I')
+        self.count = count
+        self.lastscan = bytes(self.__sections['lastscan']).decode('utf-8') or None
+        return True
+
+    def close(self):
+        """unmap store file"""
+        for section in self.__sections.values():
+            section.release()
+        self.__sections = {}
+        if self.__view:
+            self.__view.release()
+            self.__view = None
+        if self.__mmap:
+            self.__mmap.close()
+            self.__mmap = None
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+        self.count = 0
+
+    def is_open(self):
+        """return True if store file is mapped"""
+        return self.__mmap is not None
+
+    def __len__(self):
+        return self.count
+
+    def get_column(self, name):
+        """return fixed-width column (read-only memoryview sorted by track id)"""
+        return self.__sections[name]
+
+    def get_string(self, name, position):
+        """return text field of track at position"""
+        offsets = self.__sections['%s.offsets' % name]
+        return str(self.__sections['%s.heap' % name][offsets[position]:offsets[position+1]], 'utf-8')
+
+    def get(self, position):
+        """return infos of track at position (tracks are sorted by id)"""
+        infos = {}
+        for name, typecode in self.COLUMNS:
+            infos[name] = self.__sections[name][position]
+        for name in self.STRINGS:
+            infos[name] = self.get_string(name, position)
+        return infos
+
+    def find(self, id):
+        """return position of track id (None if unknown)"""
+        ids = self.__sections['id']
+        position = bisect.bisect_left(ids, int(id))
+        if position < self.count and ids[position]==int(id):
+            return position
+        return None
+
+    def get_by_id(self, id):
+        """return infos of track id (None if unknown)"""
+        position = self.find(id)
+        if position is None:
+            return None
+        return self.get(position)
+
+    def get_range(self, start, stop):
+        """return infos of tracks between positions start and stop"""
+        return [self.get(position) for position in range(max(0, start), min(stop, self.count))]
+
+    def get_id_range(self, min_id, max_id):
+        """return infos of tracks with min_id <= id <= max_id"""
+        ids = self.__sections['id']
+        return self.get_range(bisect.bisect_left(ids, min_id), bisect.bisect_right(ids, max_id))
+
+    def find_by(self, name, value):
+        """return positions of tracks whose column name (one of ORDERS) equals value"""
+        column = self.__sections[name]
+        order = self.__sections['%s.order' % name]
+        #binary search through order permutation
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if column[order[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        positions = []
+        while low < self.count and column[order[low]]==value:
+            positions.append(order[low])
+            low += 1
+        return positions
+
+    def get_album_tracks(self, album_id):
+        """return infos of tracks of album"""
+        return [self.get(position) for position in self.find_by('album_id', int(album_id))]
+
+    def get_artist_tracks(self, artist_id):
+        """return infos of tracks of artist"""
+        return [self.get(position) for position in self.find_by('artist_id', int(artist_id))]
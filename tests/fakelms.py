@@ -0,0 +1,200 @@
+"""
+Fake LMS server used by tests: answers CLI commands from in-memory library and players
+"""
+
+import urllib.parse
+import tempfile
+import shutil
+import os
+import unittest
+from unittest import mock
+
+from pylms.pylmsserver import LMSServer
+
+
+def quote(value):
+    return urllib.parse.quote(str(value), safe='')
+
+
+class FakeTelnet(object):
+    """Telnet replacement: each written command line is answered by handler(command)
+    handler returns reply without command echo, or None to make the request fail"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.sent = []
+        self.writes = 0
+        self.__replies = []
+
+    def write(self, data):
+        self.writes += 1
+        for command in data.decode('utf-8').strip().split('\n'):
+            self.sent.append(command)
+            reply = self.handler(command)
+            if reply is None:
+                self.__replies.append(None)
+                continue
+            echo = command.rsplit(' ', 1)[0] if command.endswith('?') else command
+            self.__replies.append(('%s %s' % (echo, reply) if reply else echo).encode('utf-8') + b'\n')
+
+    def read_until(self, separator, timeout=None):
+        if not self.__replies:
+            raise EOFError()
+        reply = self.__replies.pop(0)
+        if reply is None:
+            raise EOFError()
+        return reply
+
+    def close(self):
+        pass
+
+
+class FakeLMS(object):
+    """In-memory LMS answering the CLI commands used by pylms"""
+
+    def __init__(self):
+        self.lastscan = 1
+        self.artists = [(1, 'ABBA'), (2, 'Bjork'), (3, 'Cat Power')]
+        self.genres = [(1, 'Pop'), (2, 'Rock')]
+        #id, name, year, artist id
+        self.albums = [(10, 'Gold', 1992, 1), (11, 'Homogenic', 1997, 2), (12, 'Debut', 1993, 2), (13, 'Moon Pix', 1998, 3)]
+        self.tracks = []
+        track_id = 100
+        for album_id, name, year, artist_id in self.albums:
+            for number in range(1, 4):
+                self.tracks.append({
+                    'id': track_id, 'title': '%s track %d' % (name, number),
+                    'artist': dict(self.artists)[artist_id], 'artist_id': artist_id,
+                    'album': name, 'album_id': album_id,
+                    'genre': 'Pop' if artist_id < 3 else 'Rock', 'genre_id': 1 if artist_id < 3 else 2,
+                    'year': year, 'duration': 200 + number, 'tracknum': number,
+                    'url': 'file:///music/%d.mp3' % track_id, 'filesize': 1000 * track_id,
+                    'bitrate': '320kbps', 'samplerate': 44100, 'type': 'mp3',
+                    'addedTime': 1000 + track_id, 'lastUpdated': 1000 + track_id,
+                })
+                track_id += 1
+        #mac, name
+        self.players = [('00:04:20:00:00:01', 'Kitchen'), ('00:04:20:00:00:02', 'Living Room')]
+        #player status (None to fail status requests) and playlist tracks ids
+        self.status = {'mode': 'stop'}
+        self.playlist = []
+        self.playlist_index = 0
+        #command prefix -> reply (None to fail)
+        self.replies = {}
+
+    def format(self, item):
+        return ' '.join(['%s:%s' % (key, quote(value)) for key, value in item.items()])
+
+    def listing(self, items, start, count):
+        return ' '.join(['count:%d' % len(items)] + [self.format(item) for item in items[start:start+count]])
+
+    def get_remote_track(self, id):
+        """remote tracks have negative ids and can only be found by url"""
+        return {'id': id, 'title': 'Remote %d' % -id, 'url': 'http://radio.example/%d' % -id}
+
+    def get_albums(self):
+        return [{'id': id, 'album': name, 'year': year, 'artwork_track_id': id * 10,
+                 'artist': dict(self.artists)[artist_id], 'artist_id': artist_id, 'textkey': name[0], 'compilation': 0}
+                for id, name, year, artist_id in self.albums]
+
+    def __call__(self, command):
+        for prefix, reply in self.replies.items():
+            if command.startswith(prefix):
+                return reply(command) if callable(reply) else reply
+        parts = command.split(' ')
+        params = dict([part.split(':', 1) for part in parts if ':' in part])
+        params = dict([(key, urllib.parse.unquote(value)) for key, value in params.items()])
+        if len(parts) > 2 and parts[1].isdigit():
+            (start, count) = (int(parts[1]), int(parts[2]))
+        else:
+            (start, count) = (0, 0)
+
+        if parts[0] == 'login':
+            return '******'
+        if parts[0] == 'serverstatus':
+            return 'lastscan:%d version:8.0' % self.lastscan
+        if parts[0] == 'info':
+            return str({'albums': len(self.albums), 'artists': len(self.artists),
+                        'genres': len(self.genres), 'songs': len(self.tracks)}[parts[2]])
+        if parts[0] == 'players':
+            return self.listing([{'playerindex': index, 'playerid': mac, 'uuid': 'none', 'name': name,
+                                  'model': 'squeezelite', 'isplayer': 1, 'connected': 1}
+                                 for index, (mac, name) in enumerate(self.players)], start, count)
+        if parts[0] == 'artists':
+            artists = [{'id': id, 'artist': name, 'textkey': name[0]} for id, name in self.artists]
+            if 'artist_id' in params:
+                artists = [artist for artist in artists if artist['id'] == int(params['artist_id'])]
+            return self.listing(artists, start, count)
+        if parts[0] == 'genres':
+            return self.listing([{'id': id, 'genre': name, 'textkey': name[0]} for id, name in self.genres], start, count)
+        if parts[0] == 'years':
+            return self.listing([{'year': year} for year in sorted(set([album[2] for album in self.albums]))], start, count)
+        if parts[0] == 'albums':
+            albums = self.get_albums()
+            for param, key in (('album_id', 'id'), ('artist_id', 'artist_id')):
+                if param in params:
+                    albums = [album for album in albums if album[key] == int(params[param])]
+            if 'year' in params:
+                albums = [album for album in albums if album['year'] == int(params['year'])]
+            return self.listing(albums, start, count)
+        if parts[0] in ('songs', 'titles'):
+            tracks = self.tracks
+            if 'album_id' in params:
+                tracks = [track for track in tracks if track['album_id'] == int(params['album_id'])]
+            return self.listing(tracks, start, count)
+        if parts[0] == 'songinfo':
+            tracks = [track for track in self.tracks + [self.get_remote_track(id) for id in self.playlist if id < 0]
+                      if ('track_id' in params and track['id'] == int(params['track_id']) and track['id'] >= 0)
+                      or ('url' in params and track['url'] == params['url'])]
+            return 'count:1 %s' % self.format(tracks[0]) if tracks else 'count:0'
+        if len(parts) > 1 and parts[1] == 'status':
+            if self.status is None:
+                return 'error'
+            reply = 'player_name:Kitchen %s' % self.format(self.status)
+            if parts[2].isdigit():
+                (start, count) = (int(parts[2]), int(parts[3]))
+                reply += ' playlist_tracks:%d' % len(self.playlist)
+                tracks = dict([(track['id'], track) for track in self.tracks])
+                for position, id in enumerate(self.playlist[start:start+count], start):
+                    track = tracks.get(id) or self.get_remote_track(id)
+                    reply += ' playlist%%20index:%d id:%d title:%s url:%s' % (position, id, quote(track['title']), quote(track['url']))
+            return reply
+        if len(parts) > 2 and parts[1] == 'playlist' and parts[2] == 'tracks':
+            return str(len(self.playlist))
+        if len(parts) > 2 and parts[1] == 'playlist' and parts[2] == 'index':
+            return str(self.playlist_index)
+        return ''
+
+
+def make_server(lms=None, server_class=LMSServer, **kwargs):
+    """return server class instance connected to fake LMS"""
+    lms = lms or FakeLMS()
+    server = server_class(**kwargs)
+    server.telnet = FakeTelnet(lms)
+    return server
+
+
+class LibraryTestCase(unittest.TestCase):
+    """Test case running LMSLibrary against FakeLMS with a temporary home directory"""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        patcher = mock.patch.dict(os.environ, {'HOME': self.home})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.home, True)
+        patcher = mock.patch.object(LMSServer, 'telnet_connect', lambda server: self.telnet_connect(server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lms = FakeLMS()
+
+    def telnet_connect(self, server):
+        """connect every server (library, notifications, bulk loader...) to fake LMS"""
+        server.telnet = FakeTelnet(self.lms)
+        return server.telnet
+
+    def make_library(self, **kwargs):
+        from pylms.pylmslibrary import LMSLibrary
+        library = LMSLibrary('127.0.0.1', **kwargs)
+        self.addCleanup(library.__del__)
+        return library
@@ -0,0 +1,72 @@
+import unittest
+
+from pylms import pylmsanalytics
+from pylms.pylmsanalytics import LMSLibraryAnalytics
+from tests.fakelms import FakeLMS, LibraryTestCase
+
+
+class AnalyticsTests(unittest.TestCase):
+    """Analytics over lists (same results are expected with NumPy arrays)"""
+
+    use_numpy = False
+
+    def setUp(self):
+        tracks = [dict([(key, str(value)) for key, value in track.items()]) for track in FakeLMS().tracks]
+        tracks[0]['year'] = ''
+        tracks[1]['bitrate'] = '128kbps VBR'
+        self.analytics = LMSLibraryAnalytics(tracks, self.use_numpy)
+        self.assertEqual(self.analytics.use_numpy, self.use_numpy)
+
+    def test_count(self):
+        self.assertEqual(self.analytics.count('genre'), {'Pop': 9, 'Rock': 3})
+        self.assertEqual(self.analytics.count('decade'), {None: 1, 1990: 11})
+
+    def test_sum(self):
+        self.assertEqual(self.analytics.sum('duration'), 12 * 200 + 4 * 6)
+        self.assertEqual(self.analytics.sum('duration', 'artist')['Cat Power'], 3 * 200 + 6)
+        self.assertEqual(self.analytics.sum('bitrate'), 11 * 320 + 128)
+
+    def test_top(self):
+        self.assertEqual(self.analytics.top('artist', 1), [('Bjork', 6)])
+        self.assertEqual(self.analytics.top('decade', 5), [(1990, 11)])
+        self.assertEqual(self.analytics.top('album', 1, 'filesize'), [('Moon Pix', 1000.0 * (109 + 110 + 111))])
+
+    def test_histogram(self):
+        edges, counts = self.analytics.histogram('duration', 3)
+        for edge, expected in zip(edges, [201.0, 201.0 + 2.0 / 3, 201.0 + 4.0 / 3, 203.0]):
+            self.assertAlmostEqual(edge, expected)
+        self.assertEqual(counts, [4, 4, 4])
+        edges, counts = self.analytics.histogram('year', 2, (1990, 2000))
+        #unknown year counts as 0 (outside limits)
+        self.assertEqual(counts, [5, 6])
+
+    def test_unsupported_fields(self):
+        with self.assertRaises(ValueError):
+            self.analytics.count('title')
+        with self.assertRaises(ValueError):
+            self.analytics.sum('title')
+
+    def test_empty_library(self):
+        analytics = LMSLibraryAnalytics([], self.use_numpy)
+        self.assertEqual(analytics.count('genre'), {})
+        self.assertEqual(analytics.sum('duration'), 0)
+
+
+@unittest.skipIf(pylmsanalytics.numpy is None, 'NumPy is not installed')
+class NumpyAnalyticsTests(AnalyticsTests):
+
+    use_numpy = True
+
+
+class LibraryAnalyticsTests(LibraryTestCase):
+
+    def test_analytics_are_kept_until_library_changes(self):
+        library = self.make_library()
+        library.sync_store(full=True)
+        analytics = library.get_analytics()
+        self.assertEqual(analytics.count_tracks, 12)
+        self.assertIs(library.get_analytics(), analytics)
+        self.lms.tracks[0].update({'genre': 'Disco', 'lastUpdated': 5000})
+        self.lms.lastscan = 2
+        library.sync_store()
+        self.assertEqual(library.get_analytics().count('genre')['Disco'], 1)
@@ -0,0 +1,142 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from pylms import pylmsbulkloader
+from pylms.pylmsbulkloader import LMSBulkLoader, parse_page
+from pylms.pylmslibrarystore import LMSLibraryStore
+from tests.fakelms import LibraryTestCase, make_server
+
+
+class BrokenPool(object):
+    """ProcessPoolExecutor replacement whose processes died"""
+
+    def __init__(self, processes, mp_context=None):
+        self.shutdowns = 0
+
+    def submit(self, *args):
+        raise BrokenProcessPool('process died')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+
+class DyingPool(BrokenPool):
+    """ProcessPoolExecutor replacement whose processes die while parsing"""
+
+    def submit(self, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool('process died'))
+        return future
+
+
+class ParsePageTests(LibraryTestCase):
+
+    def test_parse_page_matches_parse_results(self):
+        server = make_server(self.lms)
+        response = server.request_raw('songs 0 5 tags:al')
+        self.assertIsInstance(response, bytes)
+        count, items, error = server.request_with_results('songs 0 5 tags:al')
+        columns = ['id', 'title', 'album', 'missing']
+        self.assertEqual(parse_page(response, columns), (count, [tuple([item.get(column) for column in columns]) for item in items], False))
+
+    def test_request_raw_only_strips_echo(self):
+        server = make_server(self.lms)
+        self.lms.replies['songs'] = 'count:1 id:1 title:A%20B'
+        self.assertEqual(server.request_raw('songs 0 1 tags:a'), b'count:1 id:1 title:A%20B')
+
+    def test_parse_page_errors(self):
+        self.assertEqual(parse_page(b'error', ['id']), (0, [], True))
+        self.assertEqual(parse_page(b'count:3 id', ['id']), (0, [], True))
+        self.assertEqual(parse_page(b'count:0', ['id']), (0, [], False))
+
+
+class BulkLoaderTests(LibraryTestCase):
+
+    def load(self, loader, start=0):
+        pages = []
+        success = loader.load('songs %d %d tags:al', len(self.lms.tracks), lambda start, items: pages.append((start, items)),
+                              start, columns=['id', 'title'])
+        return success, pages
+
+    def expected(self, start=0):
+        return [(str(track['id']), track['title']) for track in self.lms.tracks[start:]]
+
+    def test_pages_parsed_in_processes_are_merged_in_order(self):
+        loader = LMSBulkLoader('127.0.0.1', connections=3, page_size=2, processes=2)
+        success, pages = self.load(loader)
+        self.assertTrue(success)
+        self.assertEqual([start for start, rows in pages], list(range(0, 12, 2)))
+        self.assertEqual(sum([rows for start, rows in pages], []), self.expected())
+        self.assertIsNone(loader.get_pool())
+
+    def test_broken_pool_falls_back_to_threads(self):
+        loader = LMSBulkLoader('127.0.0.1', connections=2, page_size=2, processes=2)
+        with mock.patch.object(pylmsbulkloader, 'ProcessPoolExecutor', BrokenPool):
+            success, pages = self.load(loader)
+        self.assertTrue(success)
+        self.assertEqual(sum([rows for start, rows in sorted(pages)], []), self.expected())
+
+    def test_pages_of_dead_processes_are_parsed_again(self):
+        loader = LMSBulkLoader('127.0.0.1', connections=2, page_size=2, processes=2)
+        with mock.patch.object(pylmsbulkloader, 'ProcessPoolExecutor', DyingPool):
+            success, pages = self.load(loader)
+        self.assertTrue(success)
+        self.assertEqual([start for start, rows in pages], list(range(0, 12, 2)))
+        self.assertEqual(sum([rows for start, rows in pages], []), self.expected())
+
+    def test_items_without_columns(self):
+        loader = LMSBulkLoader('127.0.0.1', connections=2, page_size=5, processes=2)
+        pages = []
+        self.assertTrue(loader.load('songs %d %d tags:al', 12, lambda start, items: pages.append(items)))
+        self.assertEqual([item['id'] for item in sum(pages, [])], [str(track['id']) for track in self.lms.tracks])
+
+    def test_failed_page_stops_loading_and_resumes(self):
+        loader = LMSBulkLoader('127.0.0.1', connections=1, page_size=4, processes=0)
+        loader.retries = 0
+        self.lms.replies['songs 4 '] = None
+        success, pages = self.load(loader)
+        self.assertFalse(success)
+        self.assertEqual(sum([rows for start, rows in pages], []), self.expected()[:4])
+
+        del self.lms.replies['songs 4 ']
+        success, pages = self.load(loader, 4)
+        self.assertTrue(success)
+        self.assertEqual(sum([rows for start, rows in pages], []), self.expected(4))
+
+
+class BulkSyncTests(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.telnets = []
+
+    def telnet_connect(self, server):
+        """keep telnets of loader connections"""
+        self.telnets.append(LibraryTestCase.telnet_connect(self, server))
+        return self.telnets[-1]
+
+    def test_store_sync_with_parsing_processes(self):
+        store = LMSLibraryStore(self.home + '/library.db')
+        self.addCleanup(store.close)
+        loader = LMSBulkLoader('127.0.0.1', page_size=2, processes=2)
+        self.assertTrue(store.sync(make_server(self.lms), loader))
+        self.assertEqual(len(store.select('SELECT id FROM tracks')), 12)
+        self.assertEqual([album['album'] for album in store.get_albums()], sorted([album[1] for album in self.lms.albums]))
+
+    def test_interrupted_store_sync_is_resumed(self):
+        store = LMSLibraryStore(self.home + '/library.db')
+        self.addCleanup(store.close)
+        loader = LMSBulkLoader('127.0.0.1', connections=1, page_size=4)
+        loader.retries = 0
+        self.lms.replies['songs 8 '] = None
+        self.assertFalse(store.sync(make_server(self.lms), loader))
+        self.assertFalse(store.is_synced())
+        self.assertEqual(store.get_meta('bulk_tracks_offset'), '8')
+
+        del self.lms.replies['songs 8 ']
+        del self.telnets[:]
+        self.assertTrue(store.sync(make_server(self.lms), loader))
+        self.assertEqual([command.split(' ')[1] for telnet in self.telnets for command in telnet.sent if command.startswith('songs')], ['8'])
+        self.assertEqual(len(store.select('SELECT id FROM tracks')), 12)
+        self.assertIsNone(store.get_meta('bulk_tracks_offset'))
@@ -0,0 +1,87 @@
+import unittest
+
+from pylms.pylmscache import LRUCache, sizeof
+from tests.fakelms import LibraryTestCase
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.evicted = []
+        self.cache = LRUCache(3, evict_callback=lambda key, value: self.evicted.append(key))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for key in 'abc':
+            self.cache.put(key, key.upper())
+        self.assertEqual(self.cache.get('a'), 'A')
+        self.cache.put('d', 'D')
+        self.assertEqual(self.evicted, ['b'])
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_size_bound(self):
+        value = {'title': 'x' * 100}
+        cache = LRUCache(100, max_size=sizeof(value) * 2)
+        for key in range(3):
+            cache.put(key, dict(value))
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(0, cache)
+        cache.put('big', {'title': 'x' * 1000})
+        self.assertNotIn('big', cache)
+
+    def test_stats(self):
+        self.cache.put('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+        self.cache.invalidate('a')
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries'], stats['size']), (1, 1, 0, 0))
+        self.assertEqual(self.evicted, ['a'])
+
+
+class SongInfosCacheTests(LibraryTestCase):
+
+    def count_songinfo(self, library):
+        return len([command for command in library.server.telnet.sent if command.startswith('songinfo')])
+
+    def test_song_infos_are_cached(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        infos = library.get_song_infos(101)
+        self.assertEqual(infos['title'], 'Gold track 2')
+        infos['title'] = 'changed'
+        self.assertEqual(library.get_song_infos(101)['title'], 'Gold track 2')
+        self.assertEqual(library.get_song_infos_by_url('file:///music/101.mp3')['id'], '101')
+        self.assertEqual(self.count_songinfo(library), 1)
+
+    def test_invalidated_song_infos_are_requested_again(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        library.get_song_infos(101)
+        library.invalidate_song_infos([101])
+        library.get_song_infos(101)
+        self.assertEqual(self.count_songinfo(library), 2)
+
+    def test_song_notification_only_evicts_its_infos(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        library.get_song_infos(101)
+        library.get_song_infos(104)
+        library.process_notification(['ratingslight', 'setrating', 'track_id:101', 'rating:80'])
+        self.assertNotIn('101', library.song_infos_cache)
+        self.assertIn('104', library.song_infos_cache)
+
+    def test_rescan_only_evicts_changed_songs(self):
+        library = self.make_library(use_graph=False)
+        library.sync_store(full=True)
+        library.get_song_infos(100)
+        library.get_song_infos(101)
+        self.lms.tracks[0].update({'title': 'Dancing Queen', 'lastUpdated': 5000})
+        self.lms.lastscan += 1
+        library.process_notification(['rescan', 'done'])
+        self.assertNotIn('100', library.song_infos_cache)
+        self.assertIn('101', library.song_infos_cache)
+        self.assertEqual(library.get_song_infos(100)['title'], 'Dancing Queen')
+
+    def test_library_change_without_store_evicts_all_songs(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        library.get_song_infos(101)
+        library.process_notification(['library', 'changed', '1'])
+        self.assertEqual(len(library.song_infos_cache), 0)
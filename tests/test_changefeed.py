@@ -0,0 +1,80 @@
+import unittest
+
+from pylms.pylmschangefeed import LMSLibraryChangeFeed
+from tests.fakelms import LibraryTestCase
+
+
+class ChangeFeedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.feed = LMSLibraryChangeFeed()
+        self.events = []
+        self.feed.subscribe(self.events.extend)
+        self.feed.prime({'albums': [{'id': '1', 'album': 'Gold'}, {'id': '2', 'album': 'Debut'}]})
+
+    def summary(self, events):
+        return sorted([(event['event'], event['kind'], event['id']) for event in events])
+
+    def test_prime_does_not_publish(self):
+        self.assertTrue(self.feed.is_primed())
+        self.assertEqual(self.events, [])
+
+    def test_diff_of_full_listings(self):
+        self.feed.diff({'albums': [{'id': '1', 'album': 'Gold (remaster)'}, {'id': '3', 'album': 'Post'}]})
+        self.assertEqual(self.summary(self.events), [('added', 'album', '3'), ('modified', 'album', '1'), ('removed', 'album', '2')])
+
+    def test_unchanged_items_are_not_published(self):
+        self.feed.diff({'albums': [{'id': '2', 'album': 'Debut'}, {'id': '1', 'album': 'Gold'}]})
+        self.assertEqual(self.events, [])
+
+    def test_apply_partial_changes(self):
+        self.feed.apply({'albums': [{'id': '2', 'album': 'Debut'}], 'deleted_albums': ['1'], 'tracks': [{'id': '9'}]})
+        self.assertEqual(self.summary(self.events), [('added', 'track', '9'), ('removed', 'album', '1')])
+
+    def test_subscribers_filters(self):
+        removed = []
+        self.feed.subscribe(removed.extend, events=['removed'])
+        tracks = []
+        self.feed.subscribe(tracks.extend, kinds=['track'])
+        self.feed.diff({'albums': [], 'tracks': [{'id': '9'}]})
+        self.assertEqual(self.summary(removed), [('removed', 'album', '1'), ('removed', 'album', '2')])
+        self.assertEqual(self.summary(tracks), [('added', 'track', '9')])
+
+
+class LibraryChangeFeedTests(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.library = self.make_library()
+        self.events = []
+        self.library.change_feed.subscribe(self.events.extend)
+
+    def summary(self):
+        return sorted([(event['event'], event['kind'], event['id']) for event in self.events])
+
+    def test_full_sync_publishes_library(self):
+        self.library.sync_store(full=True)
+        self.assertEqual(len([event for event in self.events if event['event'] == 'added']), 3 + 4 + 2 + 12)
+
+    def test_incremental_sync_only_publishes_changes(self):
+        self.library.sync_store(full=True)
+        del self.events[:]
+        self.lms.tracks[0]['title'] = 'Dancing Queen'
+        self.lms.tracks[0]['lastUpdated'] += 1
+        self.lms.lastscan += 1
+        self.assertIsNotNone(self.library.sync_store())
+        self.assertEqual(self.summary(), [('modified', 'track', '100')])
+        self.assertEqual(self.events[0]['item']['title'], 'Dancing Queen')
+
+    def test_feed_is_primed_from_store(self):
+        self.library.sync_store(full=True)
+        self.library.change_feed.reset()
+        del self.events[:]
+        self.lms.lastscan += 1
+        self.assertIsNotNone(self.library.sync_store())
+        self.assertTrue(self.library.change_feed.is_primed())
+        self.assertEqual(self.events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
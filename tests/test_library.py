@@ -0,0 +1,34 @@
+import unittest
+
+from tests.fakelms import LibraryTestCase
+
+
+class FieldsProjectionTests(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.library = self.make_library(use_store=False, use_graph=False)
+        self.library.check_update()
+        self.sent = self.library.server.telnet.sent
+
+    def test_only_id_and_requested_fields_are_returned(self):
+        albums = self.library.get_albums(fields=['year'])
+        self.assertEqual(albums[0], {'id': 10, 'year': 1992})
+        self.assertTrue(self.sent[-1].endswith('tags:y'))
+
+    def test_name_is_returned_when_requested(self):
+        album = self.library.get_album(11, fields=['album', 'artist_id'])
+        self.assertEqual(album, [{'id': 11, 'album': 'Homogenic', 'artist_id': 2}])
+
+    def test_album_songs_request(self):
+        songs = self.library.get_album_songs(11, fields=['title', 'duration'])
+        self.assertEqual(self.sent[-1], 'songs 0 200 album_id:11 tags:d')
+        self.assertEqual(songs[0], {'id': 103, 'title': 'Homogenic track 1', 'duration': 201.0})
+
+    def test_unsupported_field(self):
+        with self.assertRaises(ValueError):
+            self.library.get_artists(fields=['bitrate'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from pylms.pylmslibrarygraph import LMSLibraryGraph
+from tests.fakelms import FakeLMS, LibraryTestCase, make_server
+
+
+class LibraryGraphTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        server = make_server(self.lms)
+        self.listings = {}
+        for table, query in (('artists', 'artists'), ('albums', 'albums'), ('genres', 'genres'), ('tracks', 'songs')):
+            count, self.listings[table], error = server.request_with_results('%s 0 100' % query)
+        self.graph = LMSLibraryGraph()
+        self.graph.build(**self.listings)
+
+    def names(self, items, field='album'):
+        return [item[field] for item in items]
+
+    def test_relationships(self):
+        self.assertTrue(self.graph.is_built())
+        self.assertEqual(self.names(self.graph.get_artist_albums(2)), ['Debut', 'Homogenic'])
+        self.assertEqual(self.names(self.graph.get_genre_albums(2)), ['Moon Pix'])
+        self.assertEqual(self.names(self.graph.get_year_albums(1997)), ['Homogenic'])
+        self.assertEqual(self.graph.get_years()[0], {'year': '1998'})
+        self.assertEqual(self.names(self.graph.get_album_songs(11), 'tracknum'), ['1', '2', '3'])
+        self.assertEqual(self.graph.get_song_infos_by_url('file:///music/105.mp3')['id'], '105')
+
+    def test_update_moves_track_between_indexes(self):
+        track = dict(self.listings['tracks'][0], genre_id='2', genre='Rock')
+        self.graph.update({'tracks': [track]})
+        self.assertEqual(self.names(self.graph.get_genre_albums(2)), ['Gold', 'Moon Pix'])
+        #other tracks of album still reference pop genre
+        self.assertEqual(self.names(self.graph.get_genre_albums(1)), ['Debut', 'Gold', 'Homogenic'])
+
+    def test_update_removes_deleted_items(self):
+        self.graph.update({'deleted_tracks': ['109', '110', '111'], 'deleted_albums': ['13'], 'deleted_artists': ['3']})
+        self.assertEqual(self.graph.get_genre_albums(2), [])
+        self.assertEqual(self.graph.get_album(13), [])
+        self.assertEqual(self.names(self.graph.get_artists(), 'artist'), ['ABBA', 'Bjork'])
+        self.assertIsNone(self.graph.get_song_infos(110))
+        self.assertNotIn('13', [album['id'] for album in self.graph.get_albums()])
+
+
+class LibraryGraphBrowsingTests(LibraryTestCase):
+
+    def test_browse_requests_are_answered_by_graph(self):
+        library = self.make_library()
+        library.sync_store(full=True)
+        self.assertTrue(library.build_graph())
+        library.server.telnet.sent = []
+        self.assertEqual([album['id'] for album in library.get_genre_albums(2)], ['13'])
+        self.assertEqual(len(library.get_album_songs(10)), 3)
+        self.assertEqual([command for command in library.server.telnet.sent if not command.startswith('serverstatus')], [])
+
+    def test_returned_items_can_be_updated(self):
+        library = self.make_library()
+        library.sync_store(full=True)
+        library.build_graph()
+        library.get_albums()[0]['album'] = 'changed'
+        library.get_album(11)[0]['album'] = 'changed'
+        self.assertNotIn('changed', [album['album'] for album in library.get_albums()])
+        self.assertEqual(library.get_album(11)[0]['album'], 'Homogenic')
@@ -0,0 +1,112 @@
+import os
+
+from pylms.pylmslibrarystore import LMSLibraryStore
+from tests.fakelms import LibraryTestCase, make_server
+
+
+class StoreTestCase(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.server = make_server(self.lms)
+        self.store = LMSLibraryStore(os.path.join(self.home, 'library.db'))
+        self.addCleanup(self.store.close)
+
+
+class StoreSyncTests(StoreTestCase):
+
+    def test_sync_mirrors_library(self):
+        self.assertTrue(self.store.is_stale())
+        self.assertTrue(self.store.sync(self.server))
+        self.assertTrue(self.store.is_synced())
+        self.assertEqual(len(self.store.get_albums()), 4)
+        self.assertEqual(len(self.store.get_artists()), 3)
+        self.assertEqual([genre['genre'] for genre in self.store.get_genres()], ['Pop', 'Rock'])
+        self.assertEqual([album['album'] for album in self.store.get_artist_albums(2)], ['Debut', 'Homogenic'])
+        self.assertEqual([song['title'] for song in self.store.get_album_songs(11)], ['Homogenic track %d' % i for i in (1, 2, 3)])
+        self.assertEqual(self.store.get_song_infos_by_url('file:///music/104.mp3')['title'], 'Homogenic track 2')
+
+    def test_store_is_stale_after_rescan(self):
+        self.store.sync(self.server)
+        self.assertFalse(self.store.is_stale(self.server))
+        self.lms.lastscan = 2
+        self.assertTrue(self.store.is_stale(self.server))
+        self.assertTrue(self.store.is_stale(max_age=-1))
+
+    def test_failed_sync(self):
+        self.lms.replies['info total'] = None
+        self.assertFalse(self.store.sync(self.server))
+        self.assertFalse(self.store.is_synced())
+
+    def test_library_browses_synced_store(self):
+        library = self.make_library(use_graph=False)
+        library.sync_store(full=True)
+        library.server.telnet.sent = []
+        self.assertEqual(len(library.get_albums()), 4)
+        self.assertEqual(len(library.get_album_songs(12)), 3)
+        self.assertEqual([command for command in library.server.telnet.sent if not command.startswith('serverstatus')], [])
+
+
+class IncrementalSyncTests(StoreTestCase):
+
+    def setUp(self):
+        StoreTestCase.setUp(self)
+        self.store.sync(self.server)
+        self.server.telnet.sent = []
+
+    def rescan(self):
+        self.lms.lastscan += 1
+
+    def test_no_rescan(self):
+        self.lms.tracks[0].update({'title': 'Dancing Queen', 'lastUpdated': 5000})
+        changes = self.store.sync_incremental(self.server)
+        self.assertEqual(changes['tracks'], [])
+        self.assertEqual(self.server.telnet.sent, ['serverstatus 0 0'])
+
+    def test_nothing_changed(self):
+        self.rescan()
+        changes = self.store.sync_incremental(self.server)
+        self.assertEqual(changes['tracks'], [])
+        self.assertEqual(changes['deleted_tracks'], [])
+        self.assertNotIn('songinfo', ' '.join(self.server.telnet.sent))
+
+    def test_only_changed_tracks_are_requested(self):
+        self.lms.tracks[0].update({'title': 'Dancing Queen', 'lastUpdated': 5000})
+        self.rescan()
+        changes = self.store.sync_incremental(self.server)
+        self.assertEqual([track['id'] for track in changes['tracks']], ['100'])
+        self.assertEqual([command.split(' ')[3] for command in self.server.telnet.sent if command.startswith('songinfo')], ['track_id:100'])
+        self.assertEqual([album['id'] for album in changes['albums']], ['10'])
+        self.assertEqual(self.store.get_song_infos(100)['title'], 'Dancing Queen')
+
+    def test_deleted_album_tracks(self):
+        self.lms.tracks = [track for track in self.lms.tracks if track['album_id'] != 13]
+        self.lms.albums = [album for album in self.lms.albums if album[0] != 13]
+        self.rescan()
+        changes = self.store.sync_incremental(self.server)
+        self.assertEqual(sorted(changes['deleted_tracks']), ['109', '110', '111'])
+        self.assertEqual(changes['deleted_albums'], ['13'])
+        self.assertIsNone(self.store.get_song_infos(110))
+        self.assertEqual(len(self.store.get_albums()), 3)
+
+    def test_failed_sync_keeps_store(self):
+        self.lms.tracks[0].update({'title': 'Dancing Queen', 'lastUpdated': 5000})
+        self.lms.replies['songinfo'] = None
+        self.rescan()
+        self.assertIsNone(self.store.sync_incremental(self.server))
+        self.assertEqual(self.store.get_song_infos(100)['title'], 'Gold track 1')
+
+
+class RestartedLibraryTests(LibraryTestCase):
+
+    def test_server_fallback_after_restart_and_rescan(self):
+        self.make_library(use_graph=False).check_update()
+        #restart with an already synced store, then rescan server
+        library = self.make_library(use_graph=False)
+        library.check_update()
+        library.STORE_CHECK_INTERVAL = -1
+        self.lms.lastscan += 1
+        self.assertEqual(len(library.get_albums()), 4)
+        self.assertEqual(len(library.get_artists()), 3)
+        self.assertEqual(len(library.get_genres()), 2)
+        self.assertIn('albums 0 4 tags:lj', library.server.telnet.sent)
@@ -0,0 +1,111 @@
+import time
+import unittest
+
+from pylms.pylmslistview import LMSListView
+from tests.fakelms import LibraryTestCase
+
+
+class ListViewTests(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [{'id': i, 'textkey': 'ABCEF'[i // 5]} for i in range(25)]
+        self.fetches = []
+        self.view = LMSListView(self.fetch, 10, 50, lambda: [item['textkey'] for item in self.items])
+        self.addCleanup(self.view.stop)
+
+    def fetch(self, start, count):
+        self.fetches.append(start)
+        return len(self.items), self.items[start:start+count]
+
+    def wait_fetches(self, starts):
+        deadline = time.time() + 5
+        while not set(starts) <= set(self.fetches) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(set(starts) <= set(self.fetches))
+
+    def test_window_is_fetched_by_pages(self):
+        self.assertEqual([item['id'] for item in self.view.get_window(8, 12)], [8, 9, 10, 11])
+        self.assertEqual(self.fetches[:3], [0, 0, 10])
+        self.assertEqual(len(self.view), 25)
+
+    def test_next_pages_are_prefetched(self):
+        self.view.get_window(0, 5)
+        self.wait_fetches([10, 20])
+        fetches = len(self.fetches)
+        self.assertEqual([item['id'] for item in self.view.get_window(15, 25)], list(range(15, 25)))
+        self.assertEqual(len(self.fetches), fetches)
+
+    def test_indexes_and_slices(self):
+        self.assertEqual(self.view[3]['id'], 3)
+        self.assertEqual(self.view[-1]['id'], 24)
+        self.assertEqual([item['id'] for item in self.view[20:30:2]], [20, 22, 24])
+        with self.assertRaises(IndexError):
+            self.view[25]
+
+    def test_textkeys(self):
+        self.assertEqual(self.view.get_textkeys(), [('A', 0), ('B', 5), ('C', 10), ('E', 15), ('F', 20)])
+        self.assertEqual(self.view.find_textkey('e'), 15)
+        self.assertEqual(self.view.find_textkey('D'), 15)
+        self.assertIsNone(self.view.find_textkey('Z'))
+
+    def test_invalidate(self):
+        self.view.get_window(0, 5)
+        self.items = self.items[:3]
+        self.view.invalidate()
+        self.assertEqual(len(self.view), 3)
+        self.assertEqual(len(self.view.get_window(0, 10)), 3)
+
+    def test_idle_prefetch_thread_ends(self):
+        self.view.PREFETCH_IDLE_TIMEOUT = 0.05
+        self.view.get_window(0, 5)
+        self.wait_fetches([10, 20])
+        deadline = time.time() + 5
+        while self.view.is_prefetching() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.view.is_prefetching())
+
+    def test_context_manager_stops_prefetching(self):
+        with LMSListView(self.fetch, 10) as view:
+            pass
+        view.get_window(0, 5)
+        self.assertFalse(view.is_prefetching())
+        self.assertEqual(self.fetches, [0, 0])
+
+    def test_local_view_is_not_prefetched(self):
+        view = LMSListView(self.fetch, 10, local=True)
+        self.assertEqual([item['id'] for item in view.get_window(8, 12)], [8, 9, 10, 11])
+        self.assertFalse(view.is_prefetching())
+        view.get_window(8, 12)
+        self.assertEqual(self.fetches, [0, 0, 10, 0, 10])
+
+    def test_failed_fetch(self):
+        view = LMSListView(lambda start, count: None)
+        self.assertEqual(len(view), 0)
+        self.assertEqual(view.get_textkeys(), [])
+
+
+class LibraryListViewTests(LibraryTestCase):
+
+    def test_server_list_view(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        view = library.get_list_view('albums', artist_id=2, page_size=1)
+        self.addCleanup(view.stop)
+        self.assertEqual([album['album'] for album in view.get_window(0, 2)], ['Homogenic', 'Debut'])
+        self.assertEqual(view.find_textkey('d'), 1)
+
+    def test_local_list_view(self):
+        library = self.make_library()
+        library.sync_store(full=True)
+        library.server.telnet.sent = []
+        view = library.get_list_view('albums', page_size=2)
+        self.addCleanup(view.stop)
+        self.assertEqual(len(view), 4)
+        self.assertEqual(view.get_textkeys()[0], ('D', 0))
+        self.assertEqual(len(view.get_window(0, 2)), 2)
+        self.assertFalse(view.is_prefetching())
+        self.assertEqual([command for command in library.server.telnet.sent if not command.startswith('serverstatus')], [])
+
+    def test_unsupported_listing(self):
+        library = self.make_library(use_store=False)
+        with self.assertRaises(ValueError):
+            library.get_list_view('playlists')
@@ -0,0 +1,400 @@
+import time
+import unittest
+from unittest import mock
+
+from pylms.pylmsserver import LMSServerNotifications
+from pylms.pylmsplayer import Player, PlayerGroup
+from tests.fakelms import FakeLMS, FakeTelnet, make_server
+
+MAC = '00:04:20:00:00:01'
+MAC2 = '00:04:20:00:00:02'
+
+
+class PlayerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        self.server = make_server(self.lms)
+        self.player = Player(server=self.server, update=False, mac=MAC)
+        self.now = 1000.0
+        patcher = mock.patch('pylms.pylmsplayer.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count_sent(self, word):
+        return len([command for command in self.server.telnet.sent if word in command.split(' ')])
+
+
+class PlaybackClockTests(PlayerTestCase):
+
+    def test_position_is_extrapolated_between_syncs(self):
+        self.lms.status = {'mode': 'play', 'time': 10, 'rate': 1, 'duration': 200}
+        self.assertEqual(self.player.get_time_elapsed(), 10)
+        self.now += 3.5
+        self.assertEqual(self.player.get_time_elapsed(), 13.5)
+        self.assertEqual(self.count_sent('status'), 1)
+
+    def test_position_stops_at_track_duration(self):
+        self.lms.status = {'mode': 'play', 'time': 198, 'rate': 1, 'duration': 200}
+        self.player.get_time_elapsed()
+        self.now += 5
+        self.assertEqual(self.player.get_time_elapsed(), 200)
+
+    def test_paused_position_is_not_extrapolated(self):
+        self.lms.status = {'mode': 'pause', 'time': 42, 'duration': 200}
+        self.player.get_time_elapsed()
+        self.now += 5
+        self.assertEqual(self.player.get_time_elapsed(), 42)
+
+    def test_clock_is_resynced_after_interval(self):
+        self.lms.status = {'mode': 'play', 'time': 10, 'rate': 1}
+        self.player.get_time_elapsed()
+        self.now += Player.CLOCK_RESYNC_INTERVAL
+        self.player.get_time_elapsed()
+        self.assertEqual(self.count_sent('status'), 2)
+
+    def test_failed_sync_is_retried_after_delay(self):
+        self.lms.status = None
+        self.assertEqual(self.player.get_time_elapsed(), 0)
+        for i in range(10):
+            self.player.get_time_elapsed()
+        self.assertEqual(self.count_sent('status'), 1)
+        self.now += Player.CLOCK_RETRY_DELAY
+        self.player.get_time_elapsed()
+        self.assertEqual(self.count_sent('status'), 2)
+
+    def test_failed_resync_keeps_last_sample(self):
+        self.lms.status = {'mode': 'play', 'time': 10, 'rate': 1}
+        self.player.get_time_elapsed()
+        self.lms.status = None
+        self.now += Player.CLOCK_RESYNC_INTERVAL
+        self.assertEqual(self.player.get_time_elapsed(), 10 + Player.CLOCK_RESYNC_INTERVAL)
+        self.player.get_time_elapsed()
+        self.assertEqual(self.count_sent('status'), 2)
+
+    def test_notification_invalidates_clock(self):
+        self.lms.status = {'mode': 'play', 'time': 10, 'rate': 1}
+        self.player.get_time_elapsed()
+        self.lms.status = {'mode': 'play', 'time': 0, 'rate': 1}
+        self.player.process_notification([MAC, 'playlist', 'newsong', 'Title', '3'])
+        self.assertEqual(self.player.get_time_elapsed(), 0)
+
+
+class LazyInfosTests(PlayerTestCase):
+
+    def test_infos_are_loaded_on_first_access(self):
+        self.assertEqual(self.server.telnet.sent, [])
+        self.assertEqual(self.player.get_name(), 'Kitchen')
+        self.assertEqual(self.player.get_model(), 'squeezelite')
+        self.assertTrue(self.player.is_connected)
+        self.assertEqual(self.count_sent('players'), 1)
+
+    def test_player_by_index(self):
+        player = Player(server=self.server, index=1, update=False)
+        self.assertEqual(player.mac, MAC2)
+        self.assertEqual(player.name, 'Living Room')
+
+    def test_players_listing_needs_no_more_request(self):
+        players = self.server.get_players()
+        self.assertEqual([player.name for player in players], ['Kitchen', 'Living Room'])
+        self.assertEqual(self.count_sent('players'), 1)
+
+    def test_player_is_slotted(self):
+        self.assertFalse(hasattr(self.player, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.player.unknown = 1
+
+
+class PrefsCacheTests(PlayerTestCase):
+
+    def setUp(self):
+        PlayerTestCase.setUp(self)
+        self.prefs = {'volume': '40', 'plugin.alarm:enabled': '1'}
+        self.lms.replies['%s playerpref validate' % MAC] = lambda command: 'valid:%d' % (command.split(' ')[-1] != 'bad')
+        self.lms.replies['%s playerpref' % MAC] = self.playerpref
+        self.lms.replies['%s can' % MAC] = lambda command: '0' if 'power' in command else '1'
+
+    def playerpref(self, command):
+        name = command.split(' ')[2]
+        if command.endswith('?'):
+            return self.prefs.get(name, '')
+        self.prefs[name] = command.split(' ')[3]
+        return ''
+
+    def test_prefs_are_loaded_at_once_and_cached(self):
+        values = self.player.load_prefs(['volume', 'maxVolume'])
+        self.assertEqual(values, {'volume': '40', 'maxVolume': ''})
+        self.assertEqual(self.server.telnet.writes, 1)
+        self.assertEqual(self.player.get_pref_value('volume'), '40')
+        self.assertEqual(self.player.get_pref_value('enabled', 'plugin.alarm'), '1')
+        self.assertEqual(self.count_sent('playerpref'), 3)
+
+    def test_only_valid_prefs_are_set(self):
+        done = self.player.set_pref_values({'volume': '20', 'bass': 'bad'})
+        self.assertEqual(done, {'volume': True, 'bass': False})
+        self.assertEqual(self.prefs['volume'], '20')
+        self.assertNotIn('bass', self.prefs)
+        self.assertEqual(self.server.telnet.writes, 2)
+        self.assertEqual(self.player.get_pref_value('volume'), '20')
+        self.assertEqual(self.server.telnet.writes, 2)
+
+    def test_invalidated_pref_is_requested_again(self):
+        self.player.get_pref_value('volume')
+        self.prefs['volume'] = '70'
+        self.player.invalidate_prefs('volume')
+        self.assertEqual(self.player.get_pref_value('volume'), '70')
+
+    def test_permissions_are_checked_at_once_and_cached(self):
+        permissions = self.player.load_permissions(['play', 'power'])
+        self.assertEqual(permissions, {'play': True, 'power': False})
+        self.assertEqual(self.server.telnet.writes, 1)
+        self.assertTrue(self.player.has_permission('play'))
+        self.assertEqual(self.count_sent('can'), 2)
+        self.player.invalidate_permissions()
+        self.assertTrue(self.player.has_permission('play'))
+        self.assertEqual(self.count_sent('can'), 3)
+
+
+class PlaylistWindowTests(PlayerTestCase):
+
+    def test_playlist_is_requested_by_pages(self):
+        self.lms.playlist = list(range(100, 112))
+        items = list(self.player.iter_playlist(page_size=5))
+        self.assertEqual([item['id'] for item in items], self.lms.playlist)
+        self.assertEqual([item['position'] for item in items], list(range(12)))
+        self.assertEqual(self.count_sent('status'), 3)
+
+    def test_window(self):
+        self.lms.playlist = list(range(100, 112))
+        window = self.player.playlist_window(10, 5)
+        self.assertEqual([item['id'] for item in window], [110, 111])
+        self.assertEqual(window[0]['title'], 'Moon Pix track 2')
+
+    def test_failed_page_raises(self):
+        self.lms.playlist = list(range(100, 112))
+        self.lms.replies['%s status 5 ' % MAC] = None
+        with self.assertRaises(IOError):
+            list(self.player.iter_playlist(page_size=5))
+
+
+class FireAndForgetTests(PlayerTestCase):
+
+    def setUp(self):
+        PlayerTestCase.setUp(self)
+        self.player.fire_and_forget = True
+
+    def test_setter_updates_state_optimistically(self):
+        self.player.set_volume(40)
+        self.assertEqual(self.player.volume, 40)
+        self.assertEqual(self.server.telnet.sent, ['%s mixer volume 40' % MAC])
+        self.server.flush()
+        self.assertEqual(self.player.volume, 40)
+
+    def test_relative_setter_shifts_known_value(self):
+        self.player.volume = 98
+        self.player.volume_up(5)
+        self.assertEqual(self.player.volume, 100)
+
+    def test_relative_setter_keeps_unknown_value(self):
+        self.player.volume_up(5)
+        self.assertIsNone(self.player.volume)
+        self.player.bass = 10
+        self.player.bass_down(5)
+        self.assertEqual(self.player.bass, 5)
+
+    def test_failed_command_is_rolled_back(self):
+        self.lms.replies['%s mixer' % MAC] = None
+        self.player.volume = 20
+        self.player.set_volume(60)
+        self.server.flush()
+        self.assertEqual(self.player.volume, 20)
+
+
+class NotificationsRoutingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        self.server = make_server(self.lms)
+        self.players = self.server.get_players()
+
+    def listen(self, lines):
+        """run notifications thread loop over lines"""
+        received = []
+        notifications = make_server(self.lms, LMSServerNotifications, notifications_callback=received.append, registry=self.server)
+        telnet = FakeTelnet(self.lms)
+
+        def read_until(separator, timeout=None):
+            if not lines:
+                notifications.stop()
+                return b''
+            return lines.pop(0).encode('utf-8') + b'\n'
+        telnet.read_until = read_until
+        notifications.telnet = telnet
+        notifications.run()
+        return received
+
+    def test_notifications_are_routed_to_registry_players(self):
+        player = self.server.get_player(MAC)
+        player.mode = 'play'
+        player.update_status({'mode': 'play', 'time': '10'})
+        self.assertFalse(player.clock_needs_sync())
+        received = self.listen(['%s playlist pause 1' % MAC, '%s mixer volume 35' % MAC])
+        self.assertEqual(len(received), 2)
+        self.assertTrue(player.clock_needs_sync())
+        self.assertEqual(player.volume, 35)
+
+    def test_prefset_notifications_update_prefs_cache(self):
+        player = self.server.get_player(MAC)
+        self.listen(['%s prefset server volume 50' % MAC, '%s prefset plugin.alarm enabled 0' % MAC])
+        self.assertEqual(player.get_pref_value('volume'), '50')
+        self.assertEqual(player.get_pref_value('enabled', 'plugin.alarm'), '0')
+        self.assertNotIn('playerpref', ' '.join(self.server.telnet.sent))
+
+    def test_client_notifications_update_registry(self):
+        self.listen(['00:04:20:00:00:09 client new', '%s client forget' % MAC])
+        self.assertIsNotNone(self.server.get_player('00:04:20:00:00:09'))
+        self.assertNotIn(MAC, [player.mac for player in self.server.players])
+
+
+class CommandCoalescerTests(PlayerTestCase):
+
+    def setUp(self):
+        PlayerTestCase.setUp(self)
+        #adjustments are flushed explicitly
+        self.coalescer = self.player.enable_coalescing(60, 60)
+        self.addCleanup(self.player.disable_coalescing)
+
+    def test_known_value_adjustments_are_merged_in_absolute_command(self):
+        self.player.volume = 50
+        for i in range(4):
+            self.player.volume_up(5)
+        self.player.volume_down(5)
+        self.assertEqual(self.player.volume, 65)
+        self.assertEqual(self.server.telnet.sent, [])
+        self.coalescer.flush()
+        self.assertEqual(self.server.telnet.sent, ['%s mixer volume 65' % MAC])
+        self.assertEqual(self.coalescer.get_metrics(), {'adjustments': 5, 'commands': 1, 'coalesced': 4, 'pending': 0})
+
+    def test_adjustments_are_clamped_at_each_step(self):
+        self.player.volume = 95
+        self.player.volume_up(10)
+        self.player.volume_down(10)
+        self.coalescer.flush()
+        self.assertEqual(self.server.telnet.sent, ['%s mixer volume 90' % MAC])
+
+    def test_unknown_value_adjustments_are_merged_in_relative_command(self):
+        self.player.treble_up(5)
+        self.player.treble_up(5)
+        self.coalescer.flush()
+        self.assertEqual(self.server.telnet.sent, ['%s mixer treble +10' % MAC])
+        self.assertIsNone(self.player.treble)
+
+    def test_seeks_are_merged_from_current_position(self):
+        self.lms.status = {'mode': 'play', 'time': 100, 'rate': 1}
+        self.player.forward(10)
+        self.player.forward(10)
+        self.player.rewind(5)
+        self.coalescer.flush()
+        self.assertEqual(self.server.telnet.sent[-1], '%s time 115' % MAC)
+
+    def test_window_restarts_at_each_adjustment(self):
+        self.player.enable_coalescing(0.2, 1.0)
+        with mock.patch('pylms.pylmsplayer.threading.Timer') as timer:
+            self.player.volume_up(5)
+            self.now += 0.15
+            self.player.volume_up(5)
+            self.now += 0.7
+            self.player.volume_up(5)
+            self.now += 0.1
+            self.player.volume_up(5)
+        self.assertEqual([round(call[0][0], 3) for call in timer.call_args_list], [0.2, 0.2, 0.15, 0.05])
+        self.assertEqual(timer.return_value.cancel.call_count, 3)
+        self.assertEqual(self.server.telnet.sent, [])
+
+    def test_unsupported_control(self):
+        with self.assertRaises(ValueError):
+            self.coalescer.adjust('balance', 1)
+
+
+class DisplayQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = make_server()
+        self.player = Player(server=self.server, update=False, mac=MAC)
+        self.queue = self.player.enable_display_queue(0.3)
+        self.addCleanup(self.player.disable_display_queue)
+
+    def wait_sent(self, count):
+        deadline = time.time() + 5
+        while self.queue.sent < count and time.time() < deadline:
+            time.sleep(0.01)
+        self.server.flush()
+        return [command.split(' ')[2] for command in self.server.telnet.sent]
+
+    def test_pending_message_is_replaced_by_latest(self):
+        self.player.display('first')
+        self.assertEqual(self.wait_sent(1), ['first'])
+        for line in ('second', 'third', 'last'):
+            self.player.display(line)
+        self.assertEqual(self.wait_sent(2), ['first', 'last'])
+        self.assertEqual(self.queue.replaced, 2)
+
+    def test_messages_are_rate_limited(self):
+        self.player.display('first')
+        self.wait_sent(1)
+        started = time.time()
+        self.player.display('second')
+        self.wait_sent(2)
+        self.assertGreater(time.time() - started, 0.2)
+
+    def test_echoes_are_read_once_queue_drained(self):
+        self.player.display('first')
+        deadline = time.time() + 5
+        while (not self.queue.sent or self.server._pending) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.queue.sent, 1)
+        self.assertEqual(len(self.server._pending), 0)
+
+    def test_echoes_are_read_on_stop(self):
+        with mock.patch.object(self.server, 'flush') as flush:
+            self.player.disable_display_queue()
+            self.queue.join(5)
+        self.assertTrue(flush.called)
+
+    def test_disabled_queue_sends_directly(self):
+        self.player.disable_display_queue()
+        self.player.display('now')
+        self.assertEqual(self.server.telnet.sent, ['%s display now  3' % MAC])
+
+
+class PlayerGroupTests(PlayerTestCase):
+
+    def setUp(self):
+        PlayerTestCase.setUp(self)
+        self.other = Player(server=self.server, update=False, mac=MAC2)
+        self.group = PlayerGroup([self.player, self.other])
+
+    def test_commands_are_pipelined(self):
+        acks = self.group.set_volume(30)
+        self.assertEqual(acks, {MAC: True, MAC2: True})
+        self.assertEqual(self.server.telnet.writes, 1)
+        self.assertEqual(self.server.telnet.sent, ['%s mixer volume 30' % MAC, '%s mixer volume 30' % MAC2])
+        self.assertEqual([self.player.volume, self.other.volume], [30, 30])
+
+    def test_failed_player_is_not_updated(self):
+        self.lms.replies['%s power' % MAC2] = None
+        acks = self.group.on()
+        self.assertEqual(acks, {MAC: True, MAC2: False})
+        self.assertTrue(self.player.is_on)
+        self.assertIsNone(self.other.is_on)
+
+    def test_players_of_other_servers(self):
+        other_server = make_server(self.lms)
+        self.other.server = other_server
+        self.assertEqual(self.group.mute(), {MAC: True, MAC2: True})
+        self.assertEqual(self.server.telnet.sent, ['%s mixer muting 1' % MAC])
+        self.assertEqual(other_server.telnet.sent, ['%s mixer muting 1' % MAC2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from pylms.pylmsplaylist import LMSPlaylist
+from tests.fakelms import LibraryTestCase
+
+MAC = '00:04:20:00:00:01'
+
+
+class GetPlaylistTests(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.library = self.make_library(use_store=False, use_graph=False)
+        self.playlist = LMSPlaylist(self.library, '127.0.0.1')
+
+    def test_songs_infos_are_resolved(self):
+        self.lms.playlist = [100, 104, 110]
+        self.lms.playlist_index = 1
+        songs = self.playlist.get_playlist(MAC)
+        self.assertEqual([song['title'] for song in songs], ['Gold track 1', 'Homogenic track 2', 'Moon Pix track 2'])
+        self.assertEqual([song['current'] for song in songs], [False, True, False])
+
+    def test_duplicated_song_keeps_its_own_current_flag(self):
+        self.lms.playlist = [103, 104, 103]
+        self.lms.playlist_index = 0
+        songs = self.playlist.get_playlist(MAC)
+        self.assertEqual([song['current'] for song in songs], [True, False, False])
+        self.assertIsNot(songs[0], songs[2])
+
+    def test_remote_songs_are_resolved_by_url(self):
+        self.lms.playlist = [100, -5]
+        songs = self.playlist.get_playlist(MAC)
+        self.assertEqual([song['title'] for song in songs], ['Gold track 1', 'Remote 5'])
+
+
+class SongsInfosTests(LibraryTestCase):
+
+    def setUp(self):
+        LibraryTestCase.setUp(self)
+        self.library = self.make_library(use_store=False, use_graph=False)
+        self.telnet = self.library.server.telnet
+
+    def test_songs_are_requested_by_pipelined_batches(self):
+        self.library.PIPELINE_SIZE = 4
+        writes = self.telnet.writes
+        songs = self.library.get_songs_infos(list(range(100, 110)) + [999])
+        self.assertEqual(sorted(songs.keys()), list(range(100, 110)))
+        self.assertEqual(self.telnet.writes - writes, 3)
+
+    def test_songs_infos_are_cached(self):
+        self.library.get_songs_infos([100, 101])
+        sent = len(self.telnet.sent)
+        songs = self.library.get_songs_infos([101, 100])
+        self.assertEqual(len(self.telnet.sent), sent)
+        self.assertEqual(songs[100]['title'], 'Gold track 1')
+
+    def test_returned_infos_are_copies(self):
+        self.library.get_songs_infos([100])[100]['title'] = 'changed'
+        self.assertEqual(self.library.get_songs_infos([100])[100]['title'], 'Gold track 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+from pylms.pylmsplayer import Player
+from pylms.pylmspoller import LMSPoller
+from tests.fakelms import FakeLMS, make_server
+
+MAC = '00:04:20:00:00:01'
+MAC2 = '00:04:20:00:00:02'
+
+
+class PollerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        self.lms.status = {'mode': 'play', 'time': 10}
+        self.server = make_server(self.lms)
+        self.players = [Player(server=self.server, update=False, mac=mac) for mac in (MAC, MAC2)]
+        self.now = 1000.0
+        patcher = mock.patch('pylms.pylmspoller.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.poller = LMSPoller(self.server, self.players)
+        self.changes = []
+        self.poller.subscribe(lambda player, changed: self.changes.append((player.mac, changed)))
+
+    def test_due_players_are_polled_in_a_single_round_trip(self):
+        self.assertEqual(self.poller.poll(), 2)
+        self.assertEqual(self.server.telnet.writes, 1)
+        self.assertEqual(self.server.telnet.sent, ['%s status - 1' % MAC, '%s status - 1' % MAC2])
+        self.assertEqual(self.poller.poll(), 0)
+
+    def test_interval_follows_player_state(self):
+        self.poller.poll()
+        self.assertEqual(self.poller.next_poll_delay(), LMSPoller.INTERVAL_PLAYING)
+        self.now += LMSPoller.INTERVAL_PLAYING
+        self.lms.status = {'mode': 'stop'}
+        self.poller.poll()
+        self.now += LMSPoller.INTERVAL_PLAYING
+        self.assertEqual(self.poller.poll(), 0)
+        self.assertEqual(self.poller.next_poll_delay(), LMSPoller.INTERVAL_STOPPED - LMSPoller.INTERVAL_PLAYING)
+
+    def test_failed_status_is_polled_as_disconnected(self):
+        self.lms.status = None
+        self.poller.poll()
+        self.assertEqual(self.poller.next_poll_delay(), LMSPoller.INTERVAL_DISCONNECTED)
+
+    def test_subscribers_only_receive_changed_fields(self):
+        self.poller.remove_player(self.players[1])
+        self.poller.poll()
+        self.assertEqual(self.changes, [(MAC, {'player_name': 'Kitchen', 'mode': 'play', 'time': '10'})])
+        self.now += LMSPoller.INTERVAL_PLAYING
+        self.poller.poll()
+        self.assertEqual(len(self.changes), 1)
+        self.now += LMSPoller.INTERVAL_PLAYING
+        self.lms.status = {'mode': 'pause'}
+        self.poller.poll()
+        self.assertEqual(self.changes[-1], (MAC, {'mode': 'pause', 'time': None}))
+
+    def test_requests_budget(self):
+        self.poller.max_requests_per_second = 1
+        self.poller.poll()
+        self.assertEqual(len(self.server.telnet.sent), 1)
+        self.now += 1
+        self.assertEqual(self.poller.poll(), 1)
+
+    def test_unknown_state_interval(self):
+        with self.assertRaises(ValueError):
+            self.poller.set_interval('sleeping', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
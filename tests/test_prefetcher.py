@@ -0,0 +1,61 @@
+import unittest
+import time
+
+from pylms.pylmsprefetcher import LMSPrefetcher
+from tests.fakelms import LibraryTestCase
+
+
+class PrefetcherTests(LibraryTestCase):
+
+    def wait(self, prefetcher, requested):
+        deadline = time.time() + 5
+        while prefetcher.get_stats()['requested'] < requested and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+    def start(self, prefetcher):
+        prefetcher.start()
+        self.addCleanup(prefetcher.stop)
+
+    def test_first_hints_are_kept(self):
+        prefetcher = LMSPrefetcher('127.0.0.1', budget=1000)
+        commands = ['songs 0 200 album_id:%d tags:eJ' % id for id in range(LMSPrefetcher.MAX_PENDING + 4)]
+        prefetcher.prefetch(commands)
+        self.start(prefetcher)
+        self.wait(prefetcher, LMSPrefetcher.MAX_PENDING)
+        self.assertEqual([command in prefetcher.cache for command in commands],
+                         [True] * LMSPrefetcher.MAX_PENDING + [False] * 4)
+        self.assertEqual(prefetcher.get_stats()['cancelled'], 4)
+
+    def test_new_hints_cancel_pending_ones(self):
+        prefetcher = LMSPrefetcher('127.0.0.1', budget=1000)
+        prefetcher.prefetch(['albums 0 10 artist_id:1 tags:l'])
+        prefetcher.prefetch(['albums 0 10 artist_id:2 tags:l'])
+        self.start(prefetcher)
+        self.wait(prefetcher, 1)
+        self.assertNotIn('albums 0 10 artist_id:1 tags:l', prefetcher.cache)
+        self.assertEqual(prefetcher.get('albums 0 10 artist_id:2 tags:l')[1][0]['album'], 'Homogenic')
+
+    def test_invalidate_albums(self):
+        prefetcher = LMSPrefetcher('127.0.0.1')
+        prefetcher.cache.put('songs 0 200 album_id:1 tags:eJ', (0, [], False))
+        prefetcher.cache.put('songs 0 200 album_id:11 tags:eJ', (0, [], False))
+        prefetcher.invalidate(['1'])
+        self.assertEqual(prefetcher.cache.keys(), ['songs 0 200 album_id:11 tags:eJ'])
+
+    def test_library_uses_prefetched_results(self):
+        library = self.make_library(use_store=False, use_graph=False)
+        library.enable_prefetch(budget=1000)
+        self.addCleanup(library.disable_prefetch)
+        library.prefetch_album(11)
+        self.wait(library.prefetcher, 2)
+        sent = len(library.server.telnet.sent)
+        self.assertEqual(len(library.get_album_songs(11)), 3)
+        self.assertEqual(library.get_album(11)[0]['album'], 'Homogenic')
+        self.assertEqual(len(library.server.telnet.sent), sent)
+        library.get_album(11)[0]['album'] = 'changed'
+        self.assertEqual(library.get_album(11)[0]['album'], 'Homogenic')
+
+
+if __name__ == '__main__':
+    unittest.main()
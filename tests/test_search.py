@@ -0,0 +1,73 @@
+import unittest
+
+from pylms.pylmssearch import LMSSearchIndex
+
+
+class SearchIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LMSSearchIndex()
+        self.index.build(
+            artists=[{'id': 1, 'artist': 'Björk'}, {'id': 2, 'artist': 'The Beatles'}],
+            albums=[{'id': 10, 'album': 'Homogenic'}, {'id': 11, 'album': 'Abbey Road'}],
+            tracks=[{'id': 100, 'title': 'Jóga'}, {'id': 101, 'title': 'Come Together'}, {'id': 102, 'title': 'Bachelorette'}],
+        )
+
+    def ids(self, results):
+        return [(result['type'], result['id']) for result in results]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.ids(self.index.search('homo')), [('album', '10')])
+
+    def test_infix_search(self):
+        self.assertEqual(self.ids(self.index.search('gether')), [('track', '101')])
+
+    def test_diacritics_are_ignored(self):
+        self.assertEqual(self.ids(self.index.search('bjork')), [('artist', '1')])
+        self.assertEqual(self.ids(self.index.search('JOGA')), [('track', '100')])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.ids(self.index.search('abbey road')), [('album', '11')])
+        self.assertEqual(self.index.search('abbey together'), [])
+
+    def test_exact_match_ranks_first(self):
+        self.index.add('album', 12, 'Beat')
+        self.assertEqual(self.ids(self.index.search('beat'))[0], ('album', '12'))
+
+    def test_kinds_filter(self):
+        self.assertEqual(self.ids(self.index.search('b', kinds=['track'])), [('track', '102')])
+
+    def test_add_and_remove(self):
+        self.index.add('track', 103, 'Hunter')
+        self.assertEqual(self.ids(self.index.search('hunt')), [('track', '103')])
+        self.index.remove('track', 103)
+        self.assertEqual(self.index.search('hunt'), [])
+        self.assertEqual(len(self.index), 7)
+
+
+class SearchIndexCandidatesTests(unittest.TestCase):
+
+    def setUp(self):
+        #common prefix expanding to several tokens matching more than MAX_CANDIDATES tracks
+        self.index = LMSSearchIndex()
+        size = LMSSearchIndex.MAX_CANDIDATES // 4
+        tracks = [{'id': id, 'title': 'Lovely%d song' % (id // size)} for id in range(size * 10)]
+        tracks.append({'id': size * 10, 'title': 'Lovely9 zebra'})
+        self.index.build(albums=[{'id': 1, 'album': 'Lovely9'}], tracks=tracks)
+        self.zebra = str(size * 10)
+
+    def test_common_word_does_not_drop_matches(self):
+        results = self.index.search('lovel zeb')
+        self.assertEqual([result['id'] for result in results], [self.zebra])
+
+    def test_kinds_are_filtered_before_truncation(self):
+        results = self.index.search('lovel', kinds=['album'])
+        self.assertEqual([(result['type'], result['id']) for result in results], [('album', '1')])
+
+    def test_single_word_results_are_bounded(self):
+        results = self.index.search('lovel', limit=10)
+        self.assertEqual(len(results), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+
+from tests.fakelms import FakeLMS, FakeTelnet, make_server
+
+
+class PlayersRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        self.server = make_server(self.lms)
+
+    def count_sent(self, word):
+        return len([command for command in self.server.telnet.sent if command.startswith(word)])
+
+    def test_players_are_enumerated_once(self):
+        kitchen = self.server.get_player('00:04:20:00:00:01')
+        self.assertEqual(kitchen.name, 'Kitchen')
+        self.assertIs(self.server.get_player('KITCHEN'), kitchen)
+        self.assertEqual(self.server.get_player('Living Room').mac, '00:04:20:00:00:02')
+        self.assertEqual(self.count_sent('players'), 1)
+
+    def test_players_are_found_by_part_of_name(self):
+        self.server.get_players()
+        self.assertEqual(self.server.get_player('itch').mac, '00:04:20:00:00:01')
+        self.assertEqual(self.server.get_player('room').mac, '00:04:20:00:00:02')
+        self.assertIsNone(self.server.get_player('garage'))
+
+    def test_name_parts_follow_registry_changes(self):
+        self.server.get_players()
+        kitchen = self.server.get_player('kitchen')
+        self.server.process_notification([kitchen.mac, 'name', 'Garage'])
+        self.assertIs(self.server.get_player('gara'), kitchen)
+        self.assertIsNone(self.server.get_player('itch'))
+        self.server.process_notification([kitchen.mac, 'client', 'forget'])
+        self.assertIsNone(self.server.get_player('gara'))
+
+    def test_shared_name_parts_go_to_remaining_player(self):
+        self.server.get_players()
+        self.assertEqual(self.server.get_player('i').name, 'Kitchen')
+        self.server.unregister_player('00:04:20:00:00:01')
+        self.assertEqual(self.server.get_player('i').name, 'Living Room')
+        self.assertIsNone(self.server.get_player('itch'))
+
+    def test_new_client_is_indexed_by_name_once_loaded(self):
+        self.server.get_players()
+        self.lms.players.append(('00:04:20:00:00:03', 'Garage'))
+        self.server.telnet.sent = []
+        self.server.process_notification(['00:04:20:00:00:03', 'client', 'new'])
+        self.assertEqual(self.server.telnet.sent, [])
+        self.assertIsNone(self.server.get_player('garage'))
+        player = self.server.get_player('00:04:20:00:00:03')
+        self.assertEqual(player.name, 'Garage')
+        self.assertIs(self.server.get_player('gara'), player)
+
+    def test_players_instances_are_kept_on_refresh(self):
+        players = self.server.get_players()
+        self.assertEqual([id(player) for player in self.server.get_players()], [id(player) for player in players])
+
+    def test_disconnect_notification(self):
+        self.server.get_players()
+        self.server.process_notification(['00:04:20:00:00:02', 'client', 'disconnect'])
+        self.assertFalse(self.server.get_player('living').is_connected)
+
+
+class PipelinedRequestsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lms = FakeLMS()
+        self.server = make_server(self.lms)
+
+    def reconnect(self):
+        self.server.telnet = FakeTelnet(self.lms)
+        return self.server.telnet
+
+    def test_results_are_in_commands_order(self):
+        results = self.server.request_many(['info total genres ?', 'info total artists ?', 'info total albums ?'])
+        self.assertEqual(results, ['2', '3', '4'])
+        self.assertEqual(self.server.telnet.writes, 1)
+
+    def test_failed_reply_in_batch_resets_connection(self):
+        parse_response = self.server._parse_response
+        def parse_artists_fails(command, response, decode_output=True):
+            if 'artists' in command:
+                raise ValueError('invalid response')
+            return parse_response(command, response, decode_output)
+        with mock.patch.object(self.server, '_parse_response', parse_artists_fails):
+            results = self.server.request_many(['info total genres ?', 'info total artists ?', 'info total albums ?'])
+        self.assertEqual(results, ['2', None, None])
+        self.assertIsNone(self.server.telnet)
+        #next request must not get the unread reply of previous batch
+        with mock.patch.object(self.server, 'telnet_connect', self.reconnect):
+            self.assertEqual(self.server.request('info total songs ?'), '12')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import unittest
+import tempfile
+import shutil
+
+from pylms.pylmssnapshot import LMSLibrarySnapshot
+from tests.fakelms import LibraryTestCase
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.snapshot = LMSLibrarySnapshot(os.path.join(self.directory, 'library.snapshot'))
+        self.tables = {
+            'albums': [{'id': '1', 'album': 'Gold', 'year': '1992'}, {'id': '2', 'album': 'Début'}],
+            'genres': [],
+        }
+
+    def test_round_trip(self):
+        self.snapshot.save(42, self.tables)
+        self.assertEqual(self.snapshot.get_last_scan(), '42')
+        self.assertEqual(self.snapshot.load(), self.tables)
+        self.assertEqual(self.snapshot.load(42), self.tables)
+
+    def test_outdated_snapshot_is_rejected(self):
+        self.snapshot.save(42, self.tables)
+        self.assertIsNone(self.snapshot.load(43))
+
+    def test_missing_or_invalid_snapshot(self):
+        self.assertIsNone(self.snapshot.load())
+        self.assertIsNone(self.snapshot.get_last_scan())
+        with open(self.snapshot.path, 'wb') as f:
+            f.write(b'garbage')
+        self.assertIsNone(self.snapshot.load())
+
+
+class LibrarySnapshotTests(LibraryTestCase):
+
+    def test_library_graph_is_loaded_from_snapshot(self):
+        library = self.make_library(use_store=False)
+        self.assertTrue(library.save_snapshot())
+        other = self.make_library(use_store=False)
+        self.assertTrue(other.load_snapshot())
+        self.assertEqual(other.graph.get_listings(), library.graph.get_listings())
+
+    def test_snapshot_is_not_loaded_after_rescan(self):
+        library = self.make_library(use_store=False)
+        library.save_snapshot()
+        self.lms.lastscan = 2
+        self.assertFalse(self.make_library(use_store=False).load_snapshot())
@@ -0,0 +1,59 @@
+import os
+import unittest
+import tempfile
+import shutil
+
+from pylms.pylmstrackstore import LMSTrackStore
+from tests.fakelms import FakeLMS, LibraryTestCase
+
+
+class TrackStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.tracks = [dict([(key, str(value)) for key, value in track.items()]) for track in FakeLMS().tracks]
+        self.tracks[0]['title'] = 'Dancing Quéen'
+        self.path = os.path.join(directory, 'tracks.col')
+        LMSTrackStore(self.path).write(reversed(self.tracks), 7)
+        self.store = LMSTrackStore(self.path)
+        self.assertTrue(self.store.open())
+        self.addCleanup(self.store.close)
+
+    def test_tracks_are_sorted_by_id(self):
+        self.assertEqual(len(self.store), 12)
+        self.assertEqual(self.store.lastscan, '7')
+        self.assertEqual(list(self.store.get_column('id')), list(range(100, 112)))
+
+    def test_round_trip(self):
+        infos = self.store.get_by_id(100)
+        self.assertEqual(infos['title'], 'Dancing Quéen')
+        self.assertEqual((infos['album_id'], infos['year'], infos['duration']), (10, 1992, 201.0))
+        self.assertEqual(infos['url'], 'file:///music/100.mp3')
+        self.assertIsNone(self.store.get_by_id(99))
+
+    def test_lookups(self):
+        self.assertEqual([track['id'] for track in self.store.get_id_range(104, 106)], [104, 105, 106])
+        self.assertEqual(sorted([track['id'] for track in self.store.get_album_tracks(12)]), [106, 107, 108])
+        self.assertEqual(len(self.store.get_artist_tracks(2)), 6)
+        self.assertEqual(self.store.get_album_tracks(99), [])
+
+    def test_opened_store_keeps_previous_version(self):
+        LMSTrackStore(self.path).write(self.tracks[:2])
+        self.assertEqual(len(self.store), 12)
+        other = LMSTrackStore(self.path)
+        self.assertTrue(other.open())
+        self.addCleanup(other.close)
+        self.assertEqual(len(other), 2)
+
+
+class LibraryTrackStoreTests(LibraryTestCase):
+
+    def test_track_store_is_written_on_sync(self):
+        library = self.make_library()
+        self.assertIsNone(library.open_track_store())
+        library.sync_store(full=True)
+        store = library.open_track_store()
+        self.addCleanup(store.close)
+        self.assertEqual(len(store), 12)
+        self.assertEqual(store.get_by_id(111)['album'], 'Moon Pix')